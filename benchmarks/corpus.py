@@ -0,0 +1,270 @@
+"""
+Labeled corpus of synthetic bank / UPI SMS messages for the parsing benchmark.
+
+    python benchmarks/corpus.py --size 2000 --out corpus.jsonl
+
+Every entry carries the expected fields, so accuracy can be scored without a
+human in the loop. Generation is seeded, so the same size and seed always give
+the same corpus and results stay comparable between commits.
+
+Entries are split into 'dev' (the templates and vendors the regex patterns were
+written against) and 'heldout' (formats and vendors no pattern, dictionary entry
+or training row was written from). Report held-out numbers when claiming a gain;
+do not add patterns for the held-out templates, move them to dev and write new ones.
+"""
+import os
+import json
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRAINING_PATH = os.path.join(ROOT, "data", "category_training.csv")
+
+# --- 1. VENDORS ---
+# (name as it appears in the SMS, expected category)
+MERCHANTS = [
+    ("Swiggy", "Food"), ("ZOMATO LTD", "Food"), ("Dominos Pizza", "Food"), ("Starbucks India", "Food"),
+    ("Hotel Green Park Restaurant", "Food"), ("Sri Ganesh Sweets", "Food"), ("Keventers", "Food"),
+    ("BigBasket", "Groceries"), ("Blinkit", "Groceries"), ("Swiggy Instamart", "Groceries"),
+    ("Laxmi Kirana Stores", "Groceries"), ("DMart Ready", "Groceries"), ("Annapoorna Supermarket", "Groceries"),
+    ("Uber India", "Travel"), ("OLA CABS", "Travel"), ("IRCTC", "Travel"), ("Indian Oil Petrol Pump", "Travel"),
+    ("Shree Petroleum", "Travel"), ("Rapido Bike Taxi", "Travel"), ("MakeMyTrip", "Travel"),
+    ("Amazon Pay India", "Shopping"), ("Flipkart Internet", "Shopping"), ("Myntra Designs", "Shopping"),
+    ("Decathlon Sports", "Shopping"), ("Bata Shoe Store", "Shopping"), ("Croma Electronics", "Shopping"),
+    ("Netflix", "Entertainment"), ("Spotify India", "Entertainment"), ("BookMyShow", "Entertainment"),
+    ("PVR Cinemas", "Entertainment"), ("Star Cinemas Multiplex", "Entertainment"),
+    ("Airtel Payments", "Bills"), ("Jio Prepaid Recharge", "Bills"), ("Tata Power", "Bills"),
+    ("BESCOM Electricity", "Bills"), ("City Broadband Services", "Bills"),
+    ("Apollo Pharmacy", "Health"), ("Sai Medical Hall", "Health"), ("PharmEasy", "Health"),
+    ("Smile Dental Clinic", "Health"), ("Cult Fit", "Health"),
+    ("NoBroker Rent", "Rent"), ("Stanza Living", "Rent"),
+    ("Udemy", "Education"), ("Coursera", "Education"), ("Sunrise Public School", "Education"),
+    ("Zerodha Broking", "Investment"), ("Groww", "Investment"), ("Kotak MF", "Investment"),
+]
+# People: category depends on context, so it is not scored
+PEOPLE = ["Rahul Sharma", "Priya Nair", "Amit Kumar", "Sneha Reddy", "Vikram Singh", "Anjali Gupta",
+          "Mohammed Irfan", "Kavya Iyer", "Arjun Mehta", "Pooja Joshi"]
+EMPLOYERS = [("Initech Salary", "Salary"), ("Hooli Payroll", "Salary"), ("Acme Corp Payroll", "Salary")]
+
+HELDOUT_MERCHANTS = [
+    ("Nagarjuna Restaurant", "Food"), ("Cafe Amudham", "Food"), ("Chai Sutta Bar", "Food"),
+    ("Namdharis Fresh", "Groceries"), ("Zepto Marketplace", "Groceries"), ("Fresh Basket Mart", "Groceries"),
+    ("Namma Yatri", "Travel"), ("Redbus", "Travel"), ("Bharat Petroleum Outlet", "Travel"), ("Hanuman Fuels", "Travel"),
+    ("Lenskart Solutions", "Shopping"), ("Nykaa Fashion", "Shopping"), ("Reliance Trends", "Shopping"),
+    ("Souled Store", "Shopping"),
+    ("Disney Hotstar", "Entertainment"), ("INOX Leisure", "Entertainment"), ("SonyLIV", "Entertainment"),
+    ("Raj Cinema", "Entertainment"),
+    ("Vodafone Idea", "Bills"), ("Mahanagar Gas", "Bills"), ("ACT Fibernet", "Bills"), ("Tata Sky", "Bills"),
+    ("MedPlus Pharmacy", "Health"), ("Practo Consult", "Health"), ("Jeevan Clinic", "Health"),
+    ("Nestaway Homes", "Rent"), ("Zolo Stays", "Rent"), ("Sunshine PG", "Rent"),
+    ("Unacademy", "Education"), ("Vedantu Classes", "Education"), ("Brightminds Tuition", "Education"),
+    ("Upstox", "Investment"), ("Kuvera", "Investment"), ("Motilal Oswal", "Investment"),
+]
+HELDOUT_PEOPLE = ["Suresh Pillai", "Neha Kapoor", "Ravi Verma", "Divya Menon", "Karan Malhotra", "Fatima Sheikh"]
+HELDOUT_EMPLOYERS = [("Globex Payroll", "Salary"), ("Umbrella Corp Salary", "Salary")]
+
+# split -> (merchants, people, employers)
+VENDORS = {
+    "dev": (MERCHANTS, PEOPLE, EMPLOYERS),
+    "heldout": (HELDOUT_MERCHANTS, HELDOUT_PEOPLE, HELDOUT_EMPLOYERS),
+}
+
+# --- 2. TEMPLATES ---
+# 'counterparty' picks the vendor pool: merchant, person, any (merchant or person) or employer.
+TEMPLATES = [
+    {"name": "gpay_p2p_credit", "bank": "Google Pay", "type": "income", "method": "UPI", "counterparty": "person",
+     "text": "{vendor} paid you ₹{amount}."},
+    {"name": "boi_upi_debit", "bank": "Bank of India", "type": "expense", "method": "UPI", "counterparty": "any",
+     "text": "Rs.{amount} debited A/cXX{acct} and credited to {vendor} via UPI Ref No {ref} on {date}. "
+             "If not done by you, call 18001031906-BOI"},
+    {"name": "icici_card_purchase", "bank": "ICICI Bank", "type": "expense", "method": "Card", "counterparty": "merchant",
+     "text": "Transaction of INR {amount} at {vendor} on {date} on your ICICI Bank Credit Card ending {acct}."},
+    {"name": "generic_upi_debit", "bank": "HDFC Bank", "type": "expense", "method": "UPI", "counterparty": "any",
+     "text": "Paid Rs.{amount} to {vendor} from HDFC Bank a/c via UPI. Ref {ref}"},
+    {"name": "hdfc_upi_sent", "bank": "HDFC Bank", "type": "expense", "method": "UPI", "counterparty": "any",
+     "text": "Sent Rs.{amount}\nFrom HDFC Bank A/C *{acct}\nTo {vendor}\nOn {date}\nRef {ref}\n"
+             "Not You? Call 18002586161/SMS BLOCK UPI to 7308080808"},
+    {"name": "sbi_upi_debit", "bank": "State Bank of India", "type": "expense", "method": "UPI", "counterparty": "any",
+     "text": "Dear UPI user A/C X{acct} debited by {amount} on date {date} trf to {vendor} Refno {ref}. "
+             "If not u? call 1800111109. -SBI"},
+    {"name": "icici_upi_debit", "bank": "ICICI Bank", "type": "expense", "method": "UPI", "counterparty": "any",
+     "text": "ICICI Bank Acct XX{acct} debited for Rs {amount} on {date}; {vendor} credited. UPI:{ref}. "
+             "Call 18002662 for dispute."},
+    {"name": "axis_upi_debit", "bank": "Axis Bank", "type": "expense", "method": "UPI", "counterparty": "merchant",
+     "text": "INR {amount} debited\nA/c no. XX{acct}\n{date}\nUPI/P2M/{ref}/{vendor}\nNot you? SMS BLOCKUPI to 919951860002"},
+    {"name": "kotak_upi_sent", "bank": "Kotak Mahindra Bank", "type": "expense", "method": "UPI", "counterparty": "any",
+     "text": "Sent Rs.{amount} from Kotak Bank AC X{acct} to {vendor} on {date}.UPI Ref {ref}. Not you, kotak.com/fraud"},
+    {"name": "hdfc_card_spent", "bank": "HDFC Bank", "type": "expense", "method": "Card", "counterparty": "merchant",
+     "text": "Rs.{amount} spent on HDFC Bank Card x{acct} at {vendor} on {date}. Not You? Call 18002586161"},
+    {"name": "axis_card_spent", "bank": "Axis Bank", "type": "expense", "method": "Card", "counterparty": "merchant",
+     "text": "Spent INR {amount}\nAxis Bank Card no. XX{acct}\n{date}\n{vendor}\nAvl Lmt INR 48,250.00"},
+    {"name": "phonepe_received", "bank": "Kotak Mahindra Bank", "type": "income", "method": "UPI", "counterparty": "person",
+     "text": "Received Rs.{amount} from {vendor} in your Kotak Bank a/c via UPI. Ref {ref}"},
+    {"name": "pnb_neft_salary", "bank": "Punjab National Bank", "type": "income", "method": "Bank Account",
+     "counterparty": "employer",
+     "text": "Your A/c XX{acct} is credited with INR {amount} on {date} by NEFT from {vendor}. Avl Bal INR 1,02,345.00 -PNB"},
+    {"name": "icici_forex_card", "bank": "ICICI Bank", "type": "expense", "method": "Card", "counterparty": "merchant",
+     "currency": "USD",
+     "text": "USD {amount} spent using ICICI Bank Card XX{acct} on {date} on {vendor}. Avl Limit: INR 2,45,000.00."},
+    {"name": "yes_dr_statement", "bank": "Yes Bank", "type": "expense", "method": "UPI", "counterparty": "any",
+     "text": "A/c XX{acct} Rs {amount} Dr on {date} to {vendor} UPI Ref {ref}. Avl Bal Rs 12,345.67"},
+    {"name": "idbi_cr_statement", "bank": "IDBI Bank", "type": "income", "method": "Bank Account", "counterparty": "person",
+     "text": "A/c XX{acct} INR {amount} Cr on {date} from {vendor}. Avl Bal INR 54,321.00 -IDBI"},
+    {"name": "canara_imps_credit", "bank": "Canara Bank", "type": "income", "method": "Bank Account",
+     "counterparty": "person",
+     "text": "An amount of INR {amount} has been CREDITED to your account XXX{acct} on {date} from {vendor} via IMPS. "
+             "Canara Bank"},
+    # Held out until the generic patterns were written from them
+    {"name": "union_imps_debit", "bank": "Union Bank of India", "type": "expense", "method": "Bank Account",
+     "counterparty": "any",
+     "text": "Your a/c no. XXXXXXXX{acct} is debited for Rs.{amount} on {date} and a/c linked to {vendor} credited "
+             "(IMPS Ref no {ref}). -Union Bank of India"},
+    {"name": "bob_upi_debit", "bank": "Bank of Baroda", "type": "expense", "method": "UPI", "counterparty": "any",
+     "text": "Dear Customer, Rs.{amount} debited from A/c XX{acct} on {date} towards UPI/{ref}/{vendor}. "
+             "Not you? Call 18005700 -Bank of Baroda"},
+    {"name": "indusind_card_txn", "bank": "IndusInd Bank", "type": "expense", "method": "Card", "counterparty": "merchant",
+     "text": "Txn of Rs.{amount} done on IndusInd Card XX{acct} at {vendor} on {date}. Avl Lmt Rs 1,20,000.00"},
+    {"name": "federal_neft_salary", "bank": "Federal Bank", "type": "income", "method": "Bank Account",
+     "counterparty": "employer",
+     "text": "INR {amount} credited to your A/c XX{acct} on {date}. Info: NEFT-{vendor}. "
+             "Avl Bal INR 2,10,000.00 -Federal Bank"},
+    {"name": "au_upi_received", "bank": "AU Small Finance Bank", "type": "income", "method": "UPI",
+     "counterparty": "person",
+     "text": "You have received Rs. {amount} from {vendor} in A/c ending {acct}. UPI Ref {ref} - AU Small Finance Bank"},
+    {"name": "paytm_upi_paid", "bank": "Paytm Payments Bank", "type": "expense", "method": "UPI", "counterparty": "any",
+     "text": "Payment of Rs {amount} to {vendor} is successful. UPI Ref: {ref}. -Paytm Payments Bank"},
+    {"name": "sbi_card_eur", "bank": "SBI Card", "type": "expense", "method": "Card", "counterparty": "merchant",
+     "currency": "EUR",
+     "text": "Your SBI Card ending {acct} has been used for EUR {amount} at {vendor} on {date}."},
+]
+
+
+# Formats no regex pattern was written from
+HELDOUT_TEMPLATES = [
+    {"name": "kotak_card_thanks", "bank": "Kotak Mahindra Bank", "type": "expense", "method": "Card",
+     "counterparty": "merchant",
+     "text": "Thank you for using Kotak Credit Card xx{acct} for Rs.{amount} at {vendor} on {date}. "
+             "Call 18602662666 if not done by you."},
+    {"name": "hsbc_debit_payment", "bank": "HSBC", "type": "expense", "method": "Bank Account", "counterparty": "any",
+     "text": "Your HSBC a/c XXX{acct} is debited with INR {amount} on {date} for payment to {vendor}. "
+             "Avl bal INR 88,120.50"},
+    {"name": "amex_spent", "bank": "American Express", "type": "expense", "method": "Card", "counterparty": "merchant",
+     "text": "Alert: You've spent INR {amount} on your AMEX card ** {acct} at {vendor} on {date}."},
+    {"name": "idfc_upi_credit", "bank": "IDFC FIRST Bank", "type": "income", "method": "UPI", "counterparty": "person",
+     "text": "Your A/C XXXX{acct} has been credited with INR {amount} by {vendor} via UPI. Ref {ref} - IDFC FIRST Bank"},
+    {"name": "phonepe_money_sent", "bank": "PhonePe", "type": "expense", "method": "UPI", "counterparty": "any",
+     "text": "Money sent! ₹{amount} sent to {vendor} from your account XX{acct}. UPI Ref {ref}"},
+    {"name": "rbl_imps_deposit", "bank": "RBL Bank", "type": "income", "method": "Bank Account",
+     "counterparty": "employer",
+     "text": "INR {amount} has been deposited in your a/c XX{acct} from {vendor} on {date} by IMPS. -RBL Bank"},
+    {"name": "bandhan_card_gbp", "bank": "Bandhan Bank", "type": "expense", "method": "Card", "counterparty": "merchant",
+     "currency": "GBP",
+     "text": "GBP {amount} debited on card XX{acct} for purchase at {vendor} on {date}. -Bandhan Bank"},
+]
+SPLITS = [(template, "dev") for template in TEMPLATES] + [(template, "heldout") for template in HELDOUT_TEMPLATES]
+
+
+# --- 3. GENERATION ---
+def _amount(rng, counterparty):
+    if counterparty == "employer":
+        value = rng.randint(25000, 180000)
+    else:
+        value = rng.choice([rng.randint(10, 999), rng.randint(1000, 9999), rng.randint(10000, 60000)])
+    value += rng.choice([0, 0, rng.randint(1, 99) / 100])
+    return round(value, 2)
+
+
+def _indian_grouping(value):
+    """1234567.5 -> '12,34,567.50' (lakh/crore grouping)."""
+    whole, fraction = f"{value:.2f}".split(".")
+    head, tail = whole[:-3], whole[-3:]
+    groups = []
+    while len(head) > 2:
+        groups.insert(0, head[-2:])
+        head = head[:-2]
+    if head:
+        groups.insert(0, head)
+    return ",".join(groups + [tail]) + "." + fraction
+
+
+def _format_amount(rng, value):
+    if value >= 100000 and rng.random() < 0.5:
+        return _indian_grouping(value)
+    if value == int(value) and rng.random() < 0.3:
+        return f"{int(value):,}" if rng.random() < 0.5 else str(int(value))
+    return f"{value:,.2f}" if rng.random() < 0.6 else f"{value:.2f}"
+
+
+def _vendor(rng, counterparty, split):
+    merchants, people, employers = VENDORS[split]
+    if counterparty == "any":
+        counterparty = "merchant" if rng.random() < 0.7 else "person"
+    if counterparty == "merchant":
+        return rng.choice(merchants)
+    if counterparty == "employer":
+        return rng.choice(employers)
+    return rng.choice(people), None
+
+
+def _check_unseen(path=TRAINING_PATH):
+    """Scored vendors must not be rows the category model was trained on, or category accuracy is recall."""
+    with open(path, encoding="utf-8") as f:
+        trained = {line.rsplit(",", 1)[0].strip().lower() for line in f}
+    leaked = sorted(name for merchants, _, employers in VENDORS.values()
+                    for name, _ in merchants + employers if name.lower() in trained)
+    if leaked:
+        raise ValueError(f"Corpus vendors found in {path}: {', '.join(leaked)}")
+
+
+def generate_corpus(size=1000, seed=7):
+    """Returns 'size' labeled messages spread evenly over the dev and held-out templates."""
+    _check_unseen()
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(size):
+        template, split = SPLITS[i % len(SPLITS)]
+        vendor, category = _vendor(rng, template["counterparty"], split)
+        amount = _amount(rng, template["counterparty"])
+        message = template["text"].format(
+            vendor=vendor,
+            amount=_format_amount(rng, amount),
+            acct=f"{rng.randint(0, 9999):04d}",
+            ref=str(rng.randint(10 ** 11, 10 ** 12 - 1)),
+            date=f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-25",
+        )
+        corpus.append({
+            "message": message,
+            "template": template["name"],
+            "split": split,
+            "bank": template["bank"],
+            "expected": {
+                "amount": amount,
+                "currency": template.get("currency", "INR"),
+                "sender_name": vendor,
+                "payment_type": template["type"],
+                "payment_method": template["method"],
+                "category": category,
+            },
+        })
+    return corpus
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Writes the synthetic labeled corpus as JSON lines.")
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default="corpus.jsonl")
+    args = parser.parse_args()
+    with open(args.out, "w", encoding="utf-8") as f:
+        for entry in generate_corpus(args.size, args.seed):
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    print(f"Wrote {args.size} messages from {len(SPLITS)} templates ({len(HELDOUT_TEMPLATES)} held out) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Import-time benchmark and startup regression guard.
+
+    python benchmarks/import_time.py [--runs 5] [--max-ms 1500] [--out import.json]
+
+Imports main.py in fresh interpreters (python -X importtime) and reports the
+median wall time, the slowest modules and which heavy dependencies got loaded.
+Exits with status 1 when the median exceeds --max-ms or when a module from
+DEFERRED_MODULES is imported at startup, so it can run in CI.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must only load on first use (see core/startup.py), never while importing the app
+DEFERRED_MODULES = [
+    "langchain_google_genai", "langchain", "langchain_core", "langsmith",
+    "supabase", "numpy", "pandas", "matplotlib", "dateutil.parser", "uvicorn",
+]
+# Storage and queue touch only in-memory databases while measuring
+ENV = {"STORAGE_BACKEND": "sqlite", "SQLITE_PATH": ":memory:", "INTAKE_QUEUE_PATH": ":memory:"}
+PROBE = (
+    "import sys, time; started = time.perf_counter(); import main; "
+    "elapsed = time.perf_counter() - started; import json; "
+    "print(json.dumps({'ms': elapsed * 1000, 'modules': sorted(sys.modules)}))"
+)
+
+
+def _run_once():
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], cwd=ROOT, env=dict(os.environ, **ENV),
+                            capture_output=True, text=True, check=True)
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, total_us, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(total_us) / 1000
+    return probe, cumulative
+
+
+def run(runs=5, top=15):
+    timings, slowest = [], {}
+    modules = []
+    for _ in range(runs):
+        probe, cumulative = _run_once()
+        timings.append(probe["ms"])
+        modules = probe["modules"]
+        for name, ms in cumulative.items():
+            slowest[name] = min(ms, slowest.get(name, ms))  # Best of N filters out noisy runs
+    loaded = [name for name in DEFERRED_MODULES if name in modules]
+    return {
+        "python": sys.version.split()[0],
+        "runs": runs,
+        "import_main_ms": {"median": round(statistics.median(timings), 1), "min": round(min(timings), 1),
+                           "max": round(max(timings), 1)},
+        "modules_loaded": len(modules),
+        "deferred_modules_loaded": loaded,
+        "slowest_modules_ms": {name: round(ms, 1) for name, ms in
+                               sorted(slowest.items(), key=lambda item: item[1], reverse=True)[:top]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail when the median import takes longer.")
+    parser.add_argument("--out", help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args()
+
+    report = run(args.runs)
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    failures = []
+    if report["deferred_modules_loaded"]:
+        failures.append(f"imported at startup: {', '.join(report['deferred_modules_loaded'])}")
+    if args.max_ms is not None and report["import_main_ms"]["median"] > args.max_ms:
+        failures.append(f"median import {report['import_main_ms']['median']} ms > {args.max_ms} ms")
+    if failures:
+        print("❌ Startup regression: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
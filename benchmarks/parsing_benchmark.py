@@ -0,0 +1,238 @@
+"""
+Speed and accuracy benchmark for services/parsing_engine.py.
+
+    python benchmarks/parsing_benchmark.py [--size 2000] [--mode single|batch] [--out results.json]
+
+Runs the labeled synthetic corpus (benchmarks/corpus.py) through the parser
+with the LLM replaced by a deterministic offline stub, and prints one JSON
+document: throughput, latency percentiles, regex hit rate, LLM fallback rate
+and field-level accuracy, overall and per corpus split. The 'heldout' split is
+the one to quote: its templates and vendors were not used to write the parser.
+Save it per commit and diff to spot regressions.
+"""
+import io
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import contextlib
+from collections import Counter, defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import generate_corpus, load_corpus  # noqa: E402
+from services import parsing_engine  # noqa: E402
+
+FIELDS = ["amount", "currency", "sender_name", "payment_type", "payment_method", "category"]
+AMOUNT_PATTERN = re.compile(r"(?:₹|Rs\.?|INR)\s*([\d,]+(?:\.\d{1,2})?)", re.IGNORECASE)
+
+
+# --- 1. OFFLINE LLM STUB ---
+class StubLLM:
+    """
+    Stands in for the chat model from core.llm: extracts the first amount and returns
+    placeholders for everything else, after an optional simulated latency.
+    """
+    calls = 0
+    messages = 0
+    latency = 0.0
+
+    def __init__(self, model=None, **kwargs):
+        pass
+
+    def with_structured_output(self, schema):
+        return _StubStructured(schema)
+
+    @classmethod
+    def details(cls, message):
+        match = AMOUNT_PATTERN.search(message)
+        return {
+            "amount": float(match.group(1).replace(",", "")) if match else 0.0,
+            "sender_name": "Unknown",
+            "payment_method": "UPI",
+            "payment_type": "expense",
+            "category": "Uncategorized",
+        }
+
+
+class _StubStructured:
+    def __init__(self, schema):
+        self.schema = schema
+
+    def invoke(self, prompt):
+        StubLLM.calls += 1
+        if StubLLM.latency:
+            time.sleep(StubLLM.latency)
+        if self.schema is parsing_engine.TransactionDetailsList:
+            numbered = [(int(i), json.loads(m)) for i, m in re.findall(r'^(\d+)\. (".*")$', prompt, re.MULTILINE)]
+            StubLLM.messages += len(numbered)
+            return self.schema(transactions=[{"index": i, **StubLLM.details(m)} for i, m in numbered])
+        StubLLM.messages += 1
+        return self.schema(**StubLLM.details(prompt))
+
+
+# --- 2. SCORING ---
+def _field_correct(field, expected, actual):
+    if actual is None:
+        return False
+    if field == "amount":
+        return abs((actual.get("amount") or 0) - expected["amount"]) < 0.005
+    if field == "currency":
+        # Stored as sent; intake treats a missing currency as rupees
+        return (actual.get("currency") or "INR") == expected["currency"]
+    if field == "sender_name":
+        return str(actual.get("sender_name", "")).strip().lower() == expected["sender_name"].lower()
+    return str(actual.get(field, "")).lower() == str(expected[field]).lower()
+
+
+def _accuracy(entries, results):
+    correct, scored = Counter(), Counter()
+    for entry, result in zip(entries, results):
+        for field in FIELDS:
+            if entry["expected"][field] is None:
+                continue  # Not scorable (e.g. category of a person-to-person transfer)
+            scored[field] += 1
+            correct[field] += _field_correct(field, entry["expected"], result)
+    accuracy = {field: round(correct[field] / scored[field], 4) if scored[field] else None for field in FIELDS}
+    accuracy["all_fields"] = round(sum(correct.values()) / sum(scored.values()), 4) if scored else None
+    return accuracy
+
+
+def _split_report(entries, results, regex_results):
+    """Hit rates and accuracy for one corpus split."""
+    total = len(entries)
+    hits = [result is not None for result in regex_results]
+    low_confidence = sum(1 for result in regex_results
+                         if result and result["category_confidence"] < parsing_engine.MIN_CONFIDENCE)
+    regex_entries = [(entry, result) for entry, result, hit in zip(entries, results, hits) if hit]
+    return {
+        "messages": total,
+        "regex_hit_rate": round(sum(hits) / total, 4) if total else None,
+        "llm_category_rate": round(low_confidence / total, 4) if total else None,
+        "accuracy": {
+            "overall": _accuracy(entries, results),
+            "regex_path": _accuracy([e for e, _ in regex_entries], [r for _, r in regex_entries]),
+        },
+    }
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- 3. RUN ---
+def run(corpus, mode="single", batch_size=parsing_engine.LLM_BATCH_SIZE, llm_latency_ms=0.0):
+    parsing_engine.chat_model = StubLLM
+    # The stub is local, so the production rate limit would only measure sleeping
+    parsing_engine.llm_scheduler = parsing_engine.LLMBatchScheduler(requests_per_minute=0)
+    StubLLM.calls = StubLLM.messages = 0
+    StubLLM.latency = llm_latency_ms / 1000
+
+    messages = [entry["message"] for entry in corpus]
+    regex_results = [parsing_engine.parse_with_regex(message) for message in messages]
+    regex_hits = [result is not None for result in regex_results]
+    low_confidence = sum(1 for result in regex_results
+                         if result and result["category_confidence"] < parsing_engine.MIN_CONFIDENCE)
+
+    latencies, results = [], []
+    with contextlib.redirect_stdout(io.StringIO()):  # The engine logs every message
+        started = time.perf_counter()
+        if mode == "single":
+            for message in messages:
+                t0 = time.perf_counter()
+                results.append(parsing_engine.parse_transaction(message))
+                latencies.append(time.perf_counter() - t0)
+        else:
+            for i in range(0, len(messages), batch_size):
+                chunk = messages[i:i + batch_size]
+                t0 = time.perf_counter()
+                results.extend(parsing_engine.parse_transactions(chunk))
+                latencies.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - started
+
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    total = len(messages)
+    regex_entries = [(entry, result) for entry, result, hit in zip(corpus, results, regex_hits) if hit]
+
+    splits = defaultdict(list)
+    for entry, result, regex_result in zip(corpus, results, regex_results):
+        # Corpora written before the split existed are all dev
+        splits[entry.get("split", "dev")].append((entry, result, regex_result))
+
+    by_template = defaultdict(lambda: [0, 0])
+    for entry, hit in zip(corpus, regex_hits):
+        by_template[entry["template"]][0] += hit
+        by_template[entry["template"]][1] += 1
+
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "mode": mode,
+        "batch_size": batch_size if mode == "batch" else None,
+        "messages": total,
+        "templates": len(by_template),
+        "llm_latency_ms": llm_latency_ms,
+        "elapsed_seconds": round(elapsed, 4),
+        "messages_per_second": round(total / elapsed, 1) if elapsed else None,
+        # Per message in single mode, per batch in batch mode
+        "latency_ms": {
+            "p50": round(_percentile(latencies_ms, 50), 4) if latencies_ms else None,
+            "p90": round(_percentile(latencies_ms, 90), 4) if latencies_ms else None,
+            "p99": round(_percentile(latencies_ms, 99), 4) if latencies_ms else None,
+            "max": round(latencies_ms[-1], 4) if latencies_ms else None,
+        },
+        "regex_hit_rate": round(sum(regex_hits) / total, 4) if total else None,
+        # Messages the regex could not parse, and regex hits that still asked the LLM for a category
+        "llm_fallback_rate": round((total - sum(regex_hits)) / total, 4) if total else None,
+        "llm_category_rate": round(low_confidence / total, 4) if total else None,
+        "llm_calls": StubLLM.calls,
+        "llm_messages_sent": StubLLM.messages,
+        "parse_failures": sum(result is None for result in results),
+        "accuracy": {
+            "overall": _accuracy(corpus, results),
+            "regex_path": _accuracy([e for e, _ in regex_entries], [r for _, r in regex_entries]),
+        },
+        "splits": {name: _split_report(*zip(*rows)) for name, rows in sorted(splits.items())},
+        "regex_hit_rate_by_template": {name: round(hits / count, 4) for name, (hits, count) in sorted(by_template.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=2000, help="Messages to generate (ignored with --corpus).")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--corpus", help="JSON lines file written by benchmarks/corpus.py.")
+    parser.add_argument("--mode", choices=["single", "batch"], default="single")
+    parser.add_argument("--batch-size", type=int, default=parsing_engine.LLM_BATCH_SIZE)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated latency per stub LLM call.")
+    parser.add_argument("--out", help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else generate_corpus(args.size, args.seed)
+    report = run(corpus, args.mode, args.batch_size, args.llm_latency_ms)
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
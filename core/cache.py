@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict, defaultdict
+
+from core.setup import initialize_supabase
+
+# --- 1. CONFIGURATION ---
+# Hot tables that are read on nearly every request but change rarely.
+# TTLs bound staleness for writes that bypass the invalidation hooks (e.g. DB triggers, other workers).
+TABLE_TTLS = {
+    "limit": int(os.getenv("CACHE_TTL_LIMIT", "600")),
+    "summary": int(os.getenv("CACHE_TTL_SUMMARY", "60")),
+    "chat_history": int(os.getenv("CACHE_TTL_CHAT_HISTORY", "300")),
+}
+MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+
+
+# --- 2. BACKENDS ---
+class LRUBackend:
+    """In-process LRU with per-entry expiry. The default backend."""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns (found, value)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Redis-compatible backend (Redis, Valkey, KeyDB, Dragonfly...) shared by all workers.
+    Values are stored as JSON under a common prefix.
+    """
+
+    def __init__(self, url, prefix="finsight:"):
+        import redis  # Optional dependency, only needed when CACHE_BACKEND=redis
+        self.client = redis.Redis.from_url(url)
+        self.client.ping()
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return False, None
+        return True, json.loads(raw)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, json.dumps(value, default=str), ex=ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def size(self):
+        return None
+
+
+def _create_backend():
+    if os.getenv("CACHE_BACKEND", "lru").lower() == "redis":
+        url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        try:
+            backend = RedisBackend(url)
+            print(f"--- Table cache using Redis at {url} ---")
+            return backend
+        except Exception as e:
+            print(f"Redis cache unavailable ({e}), falling back to in-process LRU.")
+    return LRUBackend()
+
+
+# --- 3. READ-THROUGH TABLE CACHE ---
+class TableCache:
+    """
+    Read-through cache of per-user rows of the hot tables.
+    Readers call get_rows(); writers call invalidate() right after updating a row.
+    """
+
+    def __init__(self, backend, ttls=TABLE_TTLS):
+        self.backend = backend
+        self.ttls = ttls
+        self._stats = defaultdict(lambda: {"hits": 0, "misses": 0, "invalidations": 0})
+
+    @staticmethod
+    def _key(table, user_id):
+        return f"{table}:{user_id}"
+
+    def get_rows(self, table, user_id):
+        """Returns every row of 'table' for a user, loading it from Supabase on a miss."""
+        if table not in self.ttls:
+            raise ValueError(f"Table '{table}' is not cached.")
+        key = self._key(table, user_id)
+        try:
+            found, rows = self.backend.get(key)
+        except Exception as e:
+            print(f"Cache read failed for {key}: {e}")
+            found, rows = False, None
+        if found:
+            self._stats[table]["hits"] += 1
+            return rows
+
+        self._stats[table]["misses"] += 1
+        response = initialize_supabase().table(table).select("*").eq("user_id", user_id).execute()
+        rows = response.data or []
+        try:
+            self.backend.set(key, rows, self.ttls[table])
+        except Exception as e:
+            print(f"Cache write failed for {key}: {e}")
+        return rows
+
+    def get_row(self, table, user_id):
+        """Returns the single row a user has in 'table', or {}."""
+        rows = self.get_rows(table, user_id)
+        return rows[0] if rows else {}
+
+    def invalidate(self, table, user_id):
+        """Invalidation hook for writers of the cached tables."""
+        self._stats[table]["invalidations"] += 1
+        try:
+            self.backend.delete(self._key(table, user_id))
+        except Exception as e:
+            print(f"Cache invalidation failed for {table}:{user_id}: {e}")
+
+    def stats(self):
+        """Hit/miss metrics per table."""
+        tables = {}
+        for table in self.ttls:
+            counts = dict(self._stats[table])
+            lookups = counts["hits"] + counts["misses"]
+            counts["hit_rate"] = round(counts["hits"] / lookups, 4) if lookups else 0.0
+            counts["ttl_seconds"] = self.ttls[table]
+            tables[table] = counts
+        return {"backend": type(self.backend).__name__, "size": self.backend.size(), "tables": tables}
+
+
+# Shared instance used by routers and services
+table_cache = TableCache(_create_backend())
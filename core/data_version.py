@@ -0,0 +1,21 @@
+import threading
+from collections import defaultdict
+
+# Per-user data version stamps.
+# Every writer that changes a user's financial data (transactions, limits,
+# pending items) bumps the stamp, and every derived cache (chatbot context,
+# response cache, ...) keys its entries on it. A stale stamp means a stale entry.
+_lock = threading.Lock()
+_versions = defaultdict(int)
+
+
+def get_data_version(user_id) -> int:
+    """Returns the current data version for a user (0 if never bumped)."""
+    return _versions.get(str(user_id), 0)
+
+
+def bump_data_version(user_id) -> int:
+    """Marks a user's data as changed and returns the new version."""
+    with _lock:
+        _versions[str(user_id)] += 1
+        return _versions[str(user_id)]
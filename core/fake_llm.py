@@ -0,0 +1,82 @@
+import re
+import json
+import time
+import typing
+from typing import Any, List
+
+from pydantic import BaseModel
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from services.amount_tokenizer import find_transaction_amount
+
+# Offline chat model returned by core.llm.chat_model() when LLM_BACKEND=fake.
+
+# Values for string fields of structured output, by field name
+FAKE_FIELD_VALUES = {"payment_type": "expense", "payment_method": "UPI", "category": "Uncategorized"}
+NUMBERED_MESSAGE = re.compile(r'^(\d+)\. (".*")$', re.MULTILINE)
+
+
+def _prompt_text(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        return "\n".join(str(getattr(message, "content", message)) for message in value)
+    return str(getattr(value, "content", value))
+
+
+def _fake_instance(schema, text, index=None):
+    """Fills a pydantic schema from the message text: amounts from the tokenizer, fixed strings otherwise."""
+    values = {}
+    for name, field in schema.model_fields.items():
+        annotation = field.annotation
+        item_type = typing.get_args(annotation)[0] if typing.get_origin(annotation) in (list, List) else None
+        if item_type is not None and isinstance(item_type, type) and issubclass(item_type, BaseModel):
+            # Batched prompts number their messages: one item per numbered line
+            values[name] = [_fake_instance(item_type, json.loads(message), int(number))
+                            for number, message in NUMBERED_MESSAGE.findall(text)]
+        elif annotation is float:
+            amount = find_transaction_amount(text)
+            values[name] = amount.value if amount else 0.0
+        elif annotation is int:
+            values[name] = index if index is not None else 0
+        elif annotation is bool:
+            values[name] = False
+        else:
+            values[name] = FAKE_FIELD_VALUES.get(name, "Unknown")
+    return schema(**values)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline stand-in for ChatGoogleGenerativeAI with a configurable latency. Plain calls get
+    a short canned answer, structured output is filled from the prompt, and tool binding is
+    accepted but never used, so agents finish after one model call.
+    """
+    model: str = "fake"
+    latency_ms: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _sleep(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self._sleep()
+        question = str(messages[-1].content)[:80] if messages else ""
+        answer = f"(offline model) Here is what I found about: {question}"
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=answer))])
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def with_structured_output(self, schema, **kwargs):
+        def respond(prompt):
+            self._sleep()
+            return _fake_instance(schema, _prompt_text(prompt))
+        return RunnableLambda(respond)
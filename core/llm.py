@@ -0,0 +1,29 @@
+import os
+from typing import Optional
+
+from core.tracing import instrument_langchain
+
+# Every chat model in the app comes from chat_model(), so one setting swaps Gemini for a
+# local fake: LLM_BACKEND=fake answers instantly (or after LLM_FAKE_LATENCY_MS) without
+# network or API key, which is what the load tests and offline runs use.
+# LangChain and the Gemini SDK are imported on the first call, not when the app starts.
+
+# --- 1. CONFIGURATION ---
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()  # "gemini" or "fake"
+LLM_FAKE_LATENCY_MS = float(os.getenv("LLM_FAKE_LATENCY_MS", "0"))
+
+
+def chat_model(model: str, temperature: Optional[float] = None, **kwargs):
+    """Returns the configured chat model; extra kwargs (e.g. google_api_key) only apply to Gemini."""
+    instrument_langchain()  # Once per process; LangChain is loaded by now anyway
+    if LLM_BACKEND == "fake":
+        from core.fake_llm import FakeChatModel
+        return FakeChatModel(model=model, latency_ms=LLM_FAKE_LATENCY_MS)
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    return ChatGoogleGenerativeAI(model=model, **kwargs)
+
+
+def is_fake():
+    return LLM_BACKEND == "fake"
@@ -0,0 +1,241 @@
+import time
+import bisect
+import threading
+from functools import wraps
+from contextlib import contextmanager
+
+from core.tracing import start_span, end_span, route_template
+
+# In-process metrics, rendered in the Prometheus text format by GET /metrics.
+# Each worker process keeps its own numbers; scrape every worker (or run one).
+
+# --- 1. METRIC TYPES ---
+# Latency buckets in seconds, from sub-millisecond regex parsing up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed label set, one series per label combination."""
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for label_values, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, label_values, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, label_values, le)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, label_values)} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, label_values)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """A value read from a callback at scrape time (queue depth, cache size...)."""
+
+    def __init__(self, name, help_text, callback):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+
+    def render(self):
+        try:
+            value = float(self.callback())
+        except Exception as e:
+            print(f"Error reading gauge {self.name}: {e}")
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+# --- 2. REGISTRY ---
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, help_text, label_names, buckets)
+            return self._metrics[name]
+
+    def gauge(self, name, help_text, callback):
+        with self._lock:
+            self._metrics[name] = Gauge(name, help_text, callback)
+            return self._metrics[name]
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.histogram(
+    "finsight_http_request_duration_seconds", "HTTP request latency by route template.",
+    ("method", "route", "status"))
+STAGE_LATENCY = registry.histogram(
+    "finsight_stage_duration_seconds", "Latency of internal stages (regex_parse, llm_parse, db, aggregation).",
+    ("stage", "name"))
+
+
+# --- 3. STAGE TIMERS ---
+@contextmanager
+def stage_timer(stage, name="", **span_attributes):
+    """
+    Times the enclosed block as one observation of finsight_stage_duration_seconds,
+    and as a span when the current request is traced.
+    """
+    handle = start_span(f"{stage}.{name}" if name else stage, stage, **span_attributes)
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - started, stage, name)
+        end_span(handle, error)
+
+
+def timed(stage, name=None):
+    """Decorator form of stage_timer; 'name' defaults to the function name."""
+    def decorator(fn):
+        label = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage, label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# --- 4. DATABASE ROUND TRIPS ---
+OPERATIONS = {"select", "insert", "update", "upsert", "delete"}
+
+
+class _TimedQuery:
+    """Wraps a query builder so that .execute() is timed as a 'db' stage labeled with the table."""
+
+    def __init__(self, query, table, operation=None):
+        self._query = query
+        self._table = table
+        self._operation = operation
+
+    def execute(self, *args, **kwargs):
+        with stage_timer("db", self._table, operation=self._operation):
+            return self._query.execute(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        value = getattr(self._query, attr)
+        operation = self._operation or (attr if attr in OPERATIONS else None)
+        if hasattr(value, "execute"):
+            return _TimedQuery(value, self._table, operation)  # Builder properties such as .not_
+        if not callable(value):
+            return value
+
+        @wraps(value)
+        def chained(*args, **kwargs):
+            result = value(*args, **kwargs)
+            # Builder methods return the next builder; keep wrapping it
+            return _TimedQuery(result, self._table, operation) if hasattr(result, "execute") else result
+        return chained
+
+
+class InstrumentedClient:
+    """
+    Forwards everything to the real database client and times every query it builds.
+    The client comes from 'factory' on first use (or on connect()), so importing a
+    module that holds a handle costs nothing.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """Builds the underlying client now; called from the app lifespan."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def table(self, name):
+        return _TimedQuery(self.connect().table(name), name)
+
+    def __getattr__(self, attr):
+        return getattr(self.connect(), attr)
+
+
+# --- 5. ASGI MIDDLEWARE ---
+class MetricsMiddleware:
+    """
+    Records every HTTP request in finsight_http_request_duration_seconds, labeled with the
+    route template (e.g. /pending/{user_id}) rather than the raw path to keep cardinality low.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_LATENCY.observe(time.perf_counter() - started, scope.get("method", ""),
+                                    route_template(scope), str(status["code"]))
+
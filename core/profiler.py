@@ -0,0 +1,134 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+
+# Statistical profiler for the live process: a sampling loop reads every thread's
+# Python stack from sys._current_frames() at a fixed interval. Nothing is hooked into
+# the interpreter, so the cost is one stack walk per thread per tick and the rest of
+# the app runs at full speed between ticks.
+
+# --- 1. CONFIGURATION ---
+MAX_SECONDS = 60
+MIN_INTERVAL = 0.001
+# Leaf frames in these files mean the thread is parked (locks, queues, event loop select)
+IDLE_FILES = {"threading.py", "selectors.py", "queue.py", "selector_events.py"}
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+
+def _frame_label(code):
+    filename = code.co_filename
+    if filename.startswith(ROOT):
+        filename = os.path.relpath(filename, ROOT)
+    else:
+        filename = os.path.basename(filename)
+    name = getattr(code, "co_qualname", code.co_name)
+    # Function definition line, so every sample in the same function aggregates together
+    return f"{name} ({filename}:{code.co_firstlineno})"
+
+
+def _stack(frame):
+    """Root-first list of frame labels."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+# --- 2. SAMPLING ---
+class SamplingProfiler:
+    """Samples all threads for a while and aggregates identical stacks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def profile(self, seconds=10.0, interval=0.01, include_idle=False):
+        """
+        Blocks for 'seconds' while sampling every 'interval' seconds and returns a report:
+        collapsed stacks ("thread;outer;...;inner" -> count) plus summary numbers.
+        Only one profile runs at a time; a concurrent request raises ProfilerBusyError.
+        """
+        seconds = min(max(float(seconds), 0.1), MAX_SECONDS)
+        interval = max(float(interval), MIN_INTERVAL)
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already running.")
+        try:
+            return self._run(seconds, interval, include_idle)
+        finally:
+            self._lock.release()
+
+    def _run(self, seconds, interval, include_idle):
+        own_thread = threading.get_ident()
+        stacks = Counter()
+        ticks = idle = 0
+        sampling_time = 0.0
+        started = time.perf_counter()
+        deadline = started + seconds
+        next_tick = started
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            if now < next_tick:
+                time.sleep(next_tick - now)
+                continue
+            next_tick += interval
+            ticks += 1
+
+            tick_start = time.perf_counter()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                if not include_idle and os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+                    idle += 1
+                    continue
+                thread_name = names.get(thread_id, f"thread-{thread_id}")
+                stacks[";".join([thread_name] + _stack(frame))] += 1
+            sampling_time += time.perf_counter() - tick_start
+
+        elapsed = time.perf_counter() - started
+        return {
+            "seconds": round(elapsed, 3),
+            "interval_ms": round(interval * 1000, 3),
+            "ticks": ticks,
+            "samples": sum(stacks.values()),
+            "idle_samples_dropped": idle,
+            # Share of one core spent walking stacks, i.e. the profiler's own overhead
+            "sampling_overhead": round(sampling_time / elapsed, 5) if elapsed else None,
+            "stacks": stacks,
+        }
+
+
+def collapsed(report):
+    """The report's stacks in the collapsed format read by flamegraph.pl and speedscope."""
+    return "\n".join(f"{stack} {count}" for stack, count in report["stacks"].most_common()) + "\n"
+
+
+def top_functions(report, limit=25):
+    """Functions by self samples (leaf) and total samples (anywhere on the stack)."""
+    self_counts, total_counts = Counter(), Counter()
+    for stack, count in report["stacks"].items():
+        frames = stack.split(";")[1:]
+        if not frames:
+            continue
+        self_counts[frames[-1]] += count
+        for frame in set(frames):
+            total_counts[frame] += count
+    samples = report["samples"] or 1
+    return [
+        {"function": frame, "self": count, "self_pct": round(100 * count / samples, 2),
+         "total": total_counts[frame], "total_pct": round(100 * total_counts[frame] / samples, 2)}
+        for frame, count in self_counts.most_common(limit)
+    ]
+
+
+# Shared instance: one profile per process at a time
+profiler = SamplingProfiler()
@@ -1,14 +1,38 @@
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
-from supabase import create_client, Client
 
-def initialize_supabase():
-    """
-    Initializes Supabase client.
-    """
+from core.metrics import InstrumentedClient
+
+
+def _create_client():
     load_dotenv()
+    if os.getenv("STORAGE_BACKEND", "supabase").lower() == "sqlite":
+        from core.sqlite_client import SQLiteClient
+        path = os.getenv("SQLITE_PATH", "finsight.db")
+        print(f"--- Using local SQLite storage at {path} ---")
+        return SQLiteClient(path)
+
+    # Imported here: the supabase SDK is one of the slowest imports of the app
+    from supabase import create_client, Client
     url: str = os.getenv("SUPABASE_URL")
     key: str = os.getenv("SUPABASE_KEY")
     supabase: Client = create_client(url, key)
     return supabase
 
+
+@lru_cache(maxsize=1)
+def initialize_supabase():
+    """
+    Initializes Supabase client.
+    The client is created once per process and shared by every router and service,
+    so all of them reuse the same HTTP connection pool.
+
+    With STORAGE_BACKEND=sqlite an embedded SQLite client with the same query-builder
+    API is returned instead, so the whole app runs offline (file at SQLITE_PATH).
+    Either way every query's execute() is timed for /metrics.
+
+    The returned handle builds the client on first use; the app lifespan calls
+    connect() so that happens at startup rather than on the first request.
+    """
+    return InstrumentedClient(_create_client)
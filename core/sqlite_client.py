@@ -0,0 +1,415 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+# --- 1. SCHEMA ---
+# The application tables, mirroring the Supabase schema (see Docs/data.txt).
+# Column types drive value conversion: SQLite has no native bool, JSON or timestamp type.
+SCHEMA = {
+    "transaction": {
+        "primary_key": "transaction_id",
+        "columns": {
+            "transaction_id": "integer", "user_id": "text", "created_at": "timestamp", "day": "text",
+            "amount": "real", "sender_name": "text", "payment_method": "text", "payment_type": "text",
+            "category": "text", "message": "text", "anomaly": "bool", "idempotency_key": "text",
+            "refund_of": "integer", "currency": "text",
+        },
+        "indexes": [
+            ("user_id", "created_at"),
+            ("user_id", "payment_type", "created_at"),
+            ("created_at",),
+        ],
+        "unique": [("user_id", "idempotency_key")],
+    },
+    "limit": {
+        "primary_key": "id",
+        "columns": {"id": "integer", "user_id": "text", "daily": "real", "weekly": "real",
+                    "monthly": "real", "yearly": "real"},
+        "unique": [("user_id",)],
+    },
+    "pending": {
+        "primary_key": "pending_id",
+        "columns": {"pending_id": "integer", "user_id": "text", "created_at": "timestamp", "reason": "text",
+                    "amount": "real", "to_give": "bool", "other_user": "text"},
+        "indexes": [("user_id", "created_at"), ("user_id", "other_user")],
+    },
+    "summary": {
+        "primary_key": "user_id",
+        "columns": {"user_id": "text", **{f"{period}_{kind}": "real"
+                                          for period in ("day", "week", "month", "year")
+                                          for kind in ("out", "in", "cashflow")}},
+    },
+    "chat_history": {
+        "primary_key": "user_id",
+        "columns": {"user_id": "text", "chat_history": "json"},
+    },
+    "bill_reminder": {
+        "primary_key": "id",
+        "columns": {"id": "integer", "user_id": "text", "recipient": "text", "amount": "real", "frequency": "text",
+                    "last_paid": "text", "due_date": "text", "remind_on": "text", "claimed_at": "timestamp",
+                    "sent_at": "timestamp"},
+        "indexes": [("remind_on",)],
+        "unique": [("user_id", "recipient", "due_date")],
+    },
+    "highlights": {
+        "primary_key": "id",
+        "columns": {"id": "integer", "user_id": "text", "period": "text", "generated_at": "timestamp",
+                    "highlights": "json"},
+        "unique": [("user_id", "period")],
+    },
+}
+
+SQL_TYPES = {"integer": "INTEGER", "text": "TEXT", "real": "REAL", "bool": "INTEGER",
+             "json": "TEXT", "timestamp": "TEXT"}
+
+
+def _ddl():
+    """Returns (table statements, index statements); indexes run after missing columns are added."""
+    tables, indexes = [], []
+    for table, spec in SCHEMA.items():
+        columns = []
+        for name, kind in spec["columns"].items():
+            column = f'"{name}" {SQL_TYPES[kind]}'
+            if name == spec["primary_key"]:
+                column += " PRIMARY KEY AUTOINCREMENT" if kind == "integer" else " PRIMARY KEY"
+            columns.append(column)
+        tables.append(f'CREATE TABLE IF NOT EXISTS "{table}" ({", ".join(columns)})')
+        for unique in spec.get("unique", []):
+            indexes.append(f'CREATE UNIQUE INDEX IF NOT EXISTS "ux_{table}_{"_".join(unique)}" '
+                           f'ON "{table}" ({", ".join(unique)})')
+        for index in spec.get("indexes", []):
+            indexes.append(f'CREATE INDEX IF NOT EXISTS "ix_{table}_{"_".join(index)}" '
+                           f'ON "{table}" ({", ".join(index)})')
+    return tables, indexes
+
+
+def _add_missing_columns(conn):
+    """Brings files created by an older version up to SCHEMA (new columns are nullable)."""
+    for table, spec in SCHEMA.items():
+        existing = {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+        for name, kind in spec["columns"].items():
+            if name not in existing:
+                conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{name}" {SQL_TYPES[kind]}')
+
+
+# --- 2. VALUE CONVERSION ---
+def _normalize_timestamp(value):
+    """Stores timestamps as UTC ISO strings so they compare correctly as text."""
+    if not isinstance(value, (str, datetime)):
+        return value
+    try:
+        dt = datetime.fromisoformat(value) if isinstance(value, str) else value
+    except ValueError:
+        return value
+    if dt.tzinfo is None:
+        dt = dt.astimezone()  # Naive timestamps are local time, like datetime.now().isoformat()
+    return dt.astimezone(timezone.utc).isoformat()
+
+
+def _to_db(kind, value):
+    if value is None:
+        return None
+    if kind == "bool":
+        if isinstance(value, str):
+            return 1 if value.lower() in ("true", "t", "1") else 0
+        return 1 if value else 0
+    if kind == "json":
+        return json.dumps(value, default=str)
+    if kind == "timestamp":
+        return _normalize_timestamp(value)
+    return value
+
+
+def _from_db(kind, value):
+    if value is None:
+        return None
+    if kind == "bool":
+        return bool(value)
+    if kind == "json":
+        return json.loads(value)
+    return value
+
+
+class APIResponse:
+    """Same shape as the postgrest response objects: rows in .data."""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+# --- 3. QUERY BUILDER ---
+class SQLiteQuery:
+    """
+    Implements the subset of the supabase/postgrest query builder used across the code base:
+    select/insert/update/upsert/delete, eq/neq/gt/gte/lt/lte/in_/ilike/or_ filters,
+    order, limit, range, single, maybe_single and execute.
+    """
+
+    OPERATORS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<=", "ilike": "LIKE"}
+
+    def __init__(self, client, table):
+        if table not in SCHEMA:
+            raise ValueError(f"Unknown table '{table}'.")
+        self.client = client
+        self.table = table
+        self.spec = SCHEMA[table]
+        self.action = "select"
+        self.columns = None
+        self.payload = None
+        self.on_conflict = None
+        self.where = []  # (sql, params)
+        self.orders = []
+        self.limit_value = None
+        self.offset_value = None
+        self.single_mode = None
+
+    # --- Actions ---
+    def select(self, *columns, count=None):
+        names = [c.strip() for column in columns for c in column.split(",") if c.strip()]
+        self.columns = None if not names or names == ["*"] else names
+        return self
+
+    def insert(self, payload, **kwargs):
+        self.action, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict=None, **kwargs):
+        self.action, self.payload, self.on_conflict = "upsert", payload, on_conflict
+        return self
+
+    def update(self, payload, **kwargs):
+        self.action, self.payload = "update", payload
+        return self
+
+    def delete(self, **kwargs):
+        self.action = "delete"
+        return self
+
+    # --- Filters ---
+    def _column(self, column):
+        if column not in self.spec["columns"]:
+            raise ValueError(f"Unknown column '{column}' for table '{self.table}'.")
+        return column
+
+    def _condition(self, column, operator, value):
+        kind = self.spec["columns"][self._column(column)]
+        if operator == "in":
+            values = [_to_db(kind, v) for v in value]
+            if not values:
+                return "0", []
+            return f'"{column}" IN ({", ".join("?" for _ in values)})', values
+        if operator == "is":
+            return f'"{column}" IS NULL', []
+        if operator == "ilike":
+            value = str(value).replace("*", "%")
+        return f'"{column}" {self.OPERATORS[operator]} ?', [_to_db(kind, value)]
+
+    def _filter(self, column, operator, value):
+        self.where.append(self._condition(column, operator, value))
+        return self
+
+    def eq(self, column, value): return self._filter(column, "eq", value)
+    def neq(self, column, value): return self._filter(column, "neq", value)
+    def gt(self, column, value): return self._filter(column, "gt", value)
+    def gte(self, column, value): return self._filter(column, "gte", value)
+    def lt(self, column, value): return self._filter(column, "lt", value)
+    def lte(self, column, value): return self._filter(column, "lte", value)
+    def ilike(self, column, value): return self._filter(column, "ilike", value)
+    def in_(self, column, values): return self._filter(column, "in", list(values))
+    def is_(self, column, value): return self._filter(column, "is", value)  # Only 'null' is supported
+
+    def or_(self, filters: str):
+        """Supports PostgREST logic trees such as 'a.gt.1,and(a.eq.1,b.gt.2)'."""
+        sql, params = self._logic_tree(_parse_logic(filters), "OR")
+        self.where.append((sql, params))
+        return self
+
+    def _logic_tree(self, nodes, joiner):
+        parts, params = [], []
+        for node in nodes:
+            if node[0] in ("and", "or"):
+                sql, node_params = self._logic_tree(node[1], node[0].upper())
+            else:
+                column, operator, value = node
+                sql, node_params = self._condition(column, operator, value)
+            parts.append(f"({sql})")
+            params.extend(node_params)
+        return f" {joiner} ".join(parts), params
+
+    # --- Modifiers ---
+    def order(self, column, desc=False, nullsfirst=None, **kwargs):
+        # Without nullsfirst, SQLite puts NULLs first ascending while Postgres puts them last
+        nulls = "" if nullsfirst is None else (" NULLS FIRST" if nullsfirst else " NULLS LAST")
+        self.orders.append(f'"{self._column(column)}" {"DESC" if desc else "ASC"}{nulls}')
+        return self
+
+    def limit(self, count, **kwargs):
+        self.limit_value = count
+        return self
+
+    def range(self, start, end, **kwargs):
+        self.offset_value, self.limit_value = start, end - start + 1
+        return self
+
+    def single(self):
+        self.single_mode = "single"
+        return self
+
+    def maybe_single(self):
+        self.single_mode = "maybe"
+        return self
+
+    # --- Execution ---
+    def _where_sql(self):
+        if not self.where:
+            return "", []
+        params = [p for _, clause_params in self.where for p in clause_params]
+        return " WHERE " + " AND ".join(f"({sql})" for sql, _ in self.where), params
+
+    def _row(self, raw):
+        columns = self.spec["columns"]
+        row = {name: _from_db(columns[name], raw[name]) for name in raw.keys()}
+        if self.columns is not None:
+            row = {name: row.get(name) for name in self.columns}
+        return row
+
+    def _select_rows(self, conn):
+        where, params = self._where_sql()
+        sql = f'SELECT * FROM "{self.table}"{where}'
+        if self.orders:
+            sql += " ORDER BY " + ", ".join(self.orders)
+        if self.limit_value is not None:
+            sql += f" LIMIT {int(self.limit_value)}"
+            if self.offset_value:
+                sql += f" OFFSET {int(self.offset_value)}"
+        return [self._row(raw) for raw in conn.execute(sql, params).fetchall()]
+
+    def _prepare(self, record):
+        columns = self.spec["columns"]
+        record = dict(record)
+        if "created_at" in columns and record.get("created_at") is None:
+            record["created_at"] = datetime.now(timezone.utc).isoformat()
+        return {self._column(k): _to_db(columns[k], v) for k, v in record.items()}
+
+    def _write(self, conn, records):
+        key = self.spec["primary_key"]
+        conflict = self.on_conflict or key
+        written = []
+        for record in records:
+            record = self._prepare(record)
+            names = list(record)
+            column_list = ", ".join(f'"{name}"' for name in names)
+            placeholders = ", ".join("?" for _ in names)
+            sql = f'INSERT INTO "{self.table}" ({column_list}) VALUES ({placeholders})'
+            if self.action == "upsert":
+                updates = [n for n in names if n not in conflict.split(",")]
+                sql += f' ON CONFLICT ({conflict}) DO ' + (
+                    "UPDATE SET " + ", ".join(f'"{n}" = excluded."{n}"' for n in updates) if updates else "NOTHING")
+            cursor = conn.execute(sql, [record[n] for n in names])
+            if key in record:
+                lookup = record[key]
+            elif self.action == "upsert" and conflict != key:
+                lookup = None
+            else:
+                lookup = cursor.lastrowid
+            if lookup is not None:
+                raw = conn.execute(f'SELECT * FROM "{self.table}" WHERE "{key}" = ?', [lookup]).fetchone()
+            else:
+                first = conflict.split(",")[0].strip()
+                raw = conn.execute(f'SELECT * FROM "{self.table}" WHERE "{first}" = ?', [record[first]]).fetchone()
+            if raw is not None:
+                written.append(self._row(raw))
+        return written
+
+    def execute(self):
+        with self.client.lock:
+            conn = self.client.conn
+            with conn:
+                if self.action == "select":
+                    data = self._select_rows(conn)
+                elif self.action in ("insert", "upsert"):
+                    records = self.payload if isinstance(self.payload, list) else [self.payload]
+                    data = self._write(conn, records)
+                elif self.action == "update":
+                    values = {self._column(k): _to_db(self.spec["columns"][k], v) for k, v in self.payload.items()}
+                    where, params = self._where_sql()
+                    assignments = ", ".join(f'"{k}" = ?' for k in values)
+                    # RETURNING makes the update its own read, so a conditional update (e.g. a claim) is atomic
+                    data = [self._row(raw) for raw in conn.execute(
+                        f'UPDATE "{self.table}" SET {assignments}{where} RETURNING *',
+                        list(values.values()) + params).fetchall()]
+                else:
+                    data = self._select_rows(conn)
+                    where, params = self._where_sql()
+                    conn.execute(f'DELETE FROM "{self.table}"{where}', params)
+
+        if self.single_mode == "maybe":
+            return APIResponse(data[0] if data else None)
+        if self.single_mode == "single":
+            if len(data) != 1:
+                raise ValueError(f"Expected exactly one row from '{self.table}', got {len(data)}.")
+            return APIResponse(data[0])
+        return APIResponse(data)
+
+
+def _parse_logic(text):
+    """Parses 'col.op.value,and(col.op.value,...)' into nested (kind, children) / (col, op, value) nodes."""
+    nodes, i = [], 0
+    while i < len(text):
+        for group in ("and(", "or("):
+            if text.startswith(group, i):
+                depth, j = 1, i + len(group)
+                in_quotes = False
+                while depth:
+                    if text[j] == '"' and text[j - 1] != "\\":
+                        in_quotes = not in_quotes
+                    elif not in_quotes:
+                        depth += {"(": 1, ")": -1}.get(text[j], 0)
+                    j += 1
+                nodes.append((group[:-1], _parse_logic(text[i + len(group):j - 1])))
+                i = j
+                break
+        else:
+            column, operator, rest = text[i:].split(".", 2)
+            if rest.startswith('"'):
+                j = 1
+                while rest[j] != '"' or rest[j - 1] == "\\":
+                    j += 1
+                value, consumed = rest[1:j].replace('\\"', '"'), j + 1
+            else:
+                end = rest.find(",")
+                value, consumed = (rest, len(rest)) if end == -1 else (rest[:end], end)
+            nodes.append((column, operator, value))
+            i += len(column) + len(operator) + 2 + consumed
+        if i < len(text) and text[i] == ",":
+            i += 1
+    return nodes
+
+
+# --- 4. CLIENT ---
+class SQLiteClient:
+    """
+    Embedded drop-in for the Supabase client: `client.table(name)` returns a query builder
+    with the same chained API, backed by a local SQLite file with the right indexes.
+    """
+
+    def __init__(self, path="finsight.db"):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        tables, indexes = _ddl()
+        with self.conn:
+            for statement in tables:
+                self.conn.execute(statement)
+            _add_missing_columns(self.conn)
+            for statement in indexes:
+                self.conn.execute(statement)
+
+    def table(self, name):
+        return SQLiteQuery(self, name)
@@ -0,0 +1,60 @@
+import os
+import time
+import importlib
+import threading
+
+from core.setup import initialize_supabase
+from core.llm import chat_model, is_fake
+
+# Startup work that used to happen at import time. The database client is built in the
+# app lifespan; heavy SDKs load on first use unless STARTUP_PREWARM asks for them earlier:
+#   off        - nothing extra, the first chat/LLM request pays for the imports
+#   background - warm up in a thread after startup, the app takes traffic immediately
+#   blocking   - warm up before the app reports ready (for readiness-gated rollouts)
+
+# --- 1. CONFIGURATION ---
+STARTUP_PREWARM = os.getenv("STARTUP_PREWARM", "off").lower()
+PREWARM_MODULES = [
+    "langchain_core.language_models.chat_models",
+    "langchain_core.messages",
+    "langchain.agents",
+    "numpy",
+]
+
+
+def connect_clients():
+    """Builds the shared database client (it is otherwise built by the first query)."""
+    initialize_supabase().connect()
+
+
+# --- 2. PRE-WARM ---
+def prewarm():
+    """Imports the heavy modules and builds an LLM client, printing how long each step took."""
+    started = time.perf_counter()
+    modules = PREWARM_MODULES if is_fake() else PREWARM_MODULES + ["langchain_google_genai"]
+    for name in modules:
+        step = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"Pre-warm could not import {name}: {e}")
+            continue
+        print(f"   - Pre-warmed {name} in {(time.perf_counter() - step) * 1000:.0f} ms")
+    try:
+        chat_model("gemini-1.5-flash", temperature=0)  # SDK client setup, no request is sent
+    except Exception as e:
+        print(f"Pre-warm could not build the chat model: {e}")
+    print(f"--- Pre-warm finished in {(time.perf_counter() - started) * 1000:.0f} ms ---")
+
+
+def start_prewarm(mode=STARTUP_PREWARM):
+    """Runs prewarm() according to 'mode'; returns the thread in background mode."""
+    if mode == "blocking":
+        prewarm()
+    elif mode == "background":
+        thread = threading.Thread(target=prewarm, name="prewarm", daemon=True)
+        thread.start()
+        return thread
+    elif mode not in ("off", "", "0", "false"):
+        print(f"Unknown STARTUP_PREWARM '{mode}'; skipping pre-warm.")
+    return None
@@ -0,0 +1,17 @@
+from datetime import datetime
+
+
+def parse_datetime(value):
+    """
+    Parses a stored timestamp. Supabase and the SQLite backend both return ISO 8601
+    strings, which datetime.fromisoformat reads about 200x faster than dateutil; other
+    formats (hand-entered rows, legacy data) still fall back to dateutil, imported on
+    first need so it stays out of app startup.
+    """
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        from dateutil.parser import parse
+        return parse(value)
@@ -0,0 +1,330 @@
+import os
+import re
+import json
+import time
+import random
+import secrets
+import threading
+import contextvars
+from functools import wraps
+from contextlib import contextmanager
+
+# Span-based request tracing. A sampled request gets a root span in the ASGI middleware;
+# stage timers (db, llm_parse, aggregation...), LangChain calls and @traced functions
+# add child spans through a context variable, so no trace object is passed around.
+# Finished traces are written as one JSON line each to TRACE_EXPORT_PATH.
+# When a request is not sampled, every span point costs one context-variable lookup.
+
+# --- 1. CONFIGURATION ---
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))  # 0 = off, 1 = every request
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "traces.jsonl")
+# The export file is rotated to <path>.1 (replacing the previous one) once it reaches this size
+TRACE_EXPORT_MAX_BYTES = int(os.getenv("TRACE_EXPORT_MAX_BYTES", str(50 * 1024 * 1024)))
+# A caller's sampled 'traceparent' starts a trace only while tracing is on (TRACE_SAMPLE_RATE > 0),
+# unless this is set (e.g. behind a gateway that makes the sampling decision). Otherwise any
+# client could switch tracing on for its own requests.
+TRACE_TRUST_TRACEPARENT = os.getenv("TRACE_TRUST_TRACEPARENT", "false").lower() in ("1", "true", "yes")
+
+_current_span = contextvars.ContextVar("finsight_current_span", default=None)
+# W3C trace context header sent by an upstream caller: version-trace_id-parent_id-flags
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+# --- 2. SPANS ---
+class Trace:
+    """The spans of one sampled request or background job."""
+
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.spans = []  # list.append is atomic, so pool threads can add spans too
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "attributes", "start", "duration", "error")
+
+    def __init__(self, trace, name, kind, parent_id=None, attributes=None):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.start = time.time()
+        self.duration = None
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+def _open(span, activate=True):
+    span.trace.spans.append(span)
+    token = _current_span.set(span) if activate else None
+    return span, token, time.perf_counter()
+
+
+def start_span(name, kind="internal", activate=True, **attributes):
+    """
+    Opens a child of the current span and returns a handle for end_span, or None when
+    the current request is not traced. activate=False records the span without making
+    it the parent of later spans (for generators, whose context the consumer shares).
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    return _open(Span(parent.trace, name, kind, parent.span_id, attributes), activate)
+
+
+def end_span(handle, error=None):
+    """Closes a span opened by start_span; a None handle is ignored."""
+    if handle is None:
+        return
+    span, token, started = handle
+    span.duration = time.perf_counter() - started
+    if error is not None:
+        span.error = f"{type(error).__name__}: {error}"
+    if token is not None:
+        _current_span.reset(token)
+
+
+def current_trace_id():
+    span = _current_span.get()
+    return span.trace.trace_id if span else None
+
+
+@contextmanager
+def span(name, kind="internal", **attributes):
+    """Context-manager form of start_span/end_span; yields the Span or None."""
+    handle = start_span(name, kind, **attributes)
+    try:
+        yield handle[0] if handle else None
+    except BaseException as e:
+        end_span(handle, e)
+        raise
+    end_span(handle)
+
+
+def traced(name=None, kind="internal"):
+    """Decorator recording every call as a span; 'name' defaults to module.function."""
+    def decorator(fn):
+        label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            handle = start_span(label, kind)
+            if handle is None:
+                return fn(*args, **kwargs)
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                end_span(handle, e)
+                raise
+            end_span(handle)
+            return result
+        return wrapper
+    return decorator
+
+
+def propagate(fn):
+    """Wraps fn to run in the caller's trace context, e.g. before handing it to a thread pool."""
+    if _current_span.get() is None:
+        return fn
+    context = contextvars.copy_context()
+
+    @wraps(fn)
+    def run(*args, **kwargs):
+        # A context can only be entered by one thread at a time, so each call gets a copy
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+
+# --- 3. ROOT SPANS AND EXPORT ---
+class JsonFileExporter:
+    """Appends each finished trace to a JSON lines file, rotating it at 'max_bytes'."""
+
+    def __init__(self, path=TRACE_EXPORT_PATH, max_bytes=TRACE_EXPORT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._size = None  # Bytes in the file, from one stat and then counted as lines are written
+        self._lock = threading.Lock()
+
+    def _rotate_if_full(self, incoming):
+        if self._size is None:
+            self._size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if self.max_bytes <= 0 or self._size + incoming <= self.max_bytes:
+            return
+        # Other workers may have rotated already; only the file's real size counts
+        self._size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if self._size + incoming > self.max_bytes and self._size:
+            os.replace(self.path, self.path + ".1")
+            self._size = 0
+
+    def export(self, trace, root):
+        record = {
+            "trace_id": trace.trace_id,
+            "name": root.name,
+            "start": root.start,
+            "duration_ms": round(root.duration * 1000, 3),
+            "spans": [span.to_dict() for span in sorted(trace.spans, key=lambda s: s.start)],
+        }
+        line = (json.dumps(record, default=str) + "\n").encode("utf-8")
+        try:
+            with self._lock:
+                self._rotate_if_full(len(line))
+                with open(self.path, "ab") as f:
+                    f.write(line)
+                self._size += len(line)
+        except OSError as e:
+            print(f"Error exporting trace {trace.trace_id}: {e}")
+
+
+exporter = JsonFileExporter()
+
+
+def should_sample(rate=None):
+    rate = TRACE_SAMPLE_RATE if rate is None else rate
+    return rate > 0 and (rate >= 1 or random.random() < rate)
+
+
+@contextmanager
+def start_trace(name, kind="internal", trace_id=None, parent_id=None, sampled=None, **attributes):
+    """
+    Starts a new trace (or continues a remote one) with a root span and exports it at the end.
+    Unless 'sampled' is given, TRACE_SAMPLE_RATE decides; unsampled blocks yield None.
+    """
+    if not (should_sample() if sampled is None else sampled):
+        yield None
+        return
+    handle = _open(Span(Trace(trace_id), name, kind, parent_id, attributes))
+    root = handle[0]
+    error = None
+    try:
+        yield root
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        end_span(handle, error)
+        exporter.export(root.trace, root)
+
+
+# --- 4. ASGI MIDDLEWARE ---
+def route_template(scope):
+    """
+    The matched route's path template (e.g. /pending/{user_id}), or 'unmatched'. Routes of an
+    included router may only know their own part, so the literal prefix comes from the path.
+    """
+    route_path = getattr(scope.get("route"), "path", None)
+    if not route_path:
+        return "unmatched"
+    request_path = scope.get("path", "")
+    prefix_depth = request_path.count("/") - route_path.count("/")
+    if prefix_depth > 0:
+        prefix = "/".join(request_path.split("/")[:prefix_depth + 1])
+        return prefix if route_path == "/" else prefix + route_path
+    return route_path
+
+
+class TracingMiddleware:
+    """
+    Opens the root span of every sampled HTTP request. A sampled W3C 'traceparent' header
+    from the caller continues its trace while tracing is on (or TRACE_TRUST_TRACEPARENT is
+    set); the trace id is returned in 'x-trace-id'.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = parent_id = sampled = None
+        for key, value in scope.get("headers", ()):
+            if key == b"traceparent":
+                match = TRACEPARENT_PATTERN.match(value.decode("latin-1").strip().lower())
+                if match:
+                    trace_id, parent_id = match.group(1), match.group(2)
+                    if int(match.group(3), 16) & 1 and (TRACE_TRUST_TRACEPARENT or TRACE_SAMPLE_RATE > 0):
+                        sampled = True
+                break
+
+        method = scope.get("method", "")
+        with start_trace(f"{method} {scope.get('path', '')}", "server", trace_id, parent_id, sampled,
+                         method=method, path=scope.get("path", "")) as root:
+            if root is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    root.attributes["status"] = message["status"]
+                    message["headers"] = list(message.get("headers", [])) + \
+                        [(b"x-trace-id", root.trace.trace_id.encode())]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                root.name = f"{method} {route_template(scope)}"
+
+
+# --- 5. LANGCHAIN ---
+def instrument_langchain():
+    """
+    Patches LangChain chat models once so every invoke()/stream() becomes an 'llm' span.
+    This covers structured-output chains and agents, which call the model underneath.
+    """
+    try:
+        from langchain_core.language_models.chat_models import BaseChatModel
+    except ImportError:
+        return False
+    if getattr(BaseChatModel.invoke, "_traced", False):
+        return True
+    original_invoke, original_stream = BaseChatModel.invoke, BaseChatModel.stream
+
+    def _model(llm):
+        return getattr(llm, "model", None) or getattr(llm, "model_name", None) or type(llm).__name__
+
+    @wraps(original_invoke)
+    def invoke(self, *args, **kwargs):
+        handle = start_span("llm.invoke", "llm", model=_model(self))
+        if handle is None:
+            return original_invoke(self, *args, **kwargs)
+        try:
+            result = original_invoke(self, *args, **kwargs)
+        except BaseException as e:
+            end_span(handle, e)
+            raise
+        end_span(handle)
+        return result
+
+    @wraps(original_stream)
+    def stream(self, *args, **kwargs):
+        handle = start_span("llm.stream", "llm", activate=False, model=_model(self))
+        if handle is None:
+            yield from original_stream(self, *args, **kwargs)
+            return
+        try:
+            yield from original_stream(self, *args, **kwargs)
+        except GeneratorExit:
+            end_span(handle)  # The consumer stopped early
+            raise
+        except BaseException as e:
+            end_span(handle, e)
+            raise
+        end_span(handle)
+
+    invoke._traced = True
+    BaseChatModel.invoke, BaseChatModel.stream = invoke, stream
+    return True
@@ -0,0 +1,217 @@
+"""
+Offline load test for the FinSight API.
+
+    python loadtest/driver.py --start [--rps 50] [--duration 60] [--llm-latency-ms 800] [--out load.json]
+    python loadtest/driver.py --base-url http://127.0.0.1:8000 --rps 20   # against a running app
+
+With --start the driver launches the fake Supabase (loadtest/fake_supabase.py) and
+the app itself with LLM_BACKEND=fake, so nothing leaves the machine. It then replays
+a weighted mix of intake, prediction, recurring, alert, pending and chat calls
+at a fixed arrival rate (open loop: requests are sent on schedule even while
+earlier ones are still running) and prints per-route throughput, error counts and
+latency percentiles as JSON. Latency is measured from each request's scheduled
+send time, so queueing inside the client is not hidden.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from collections import defaultdict
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import generate_corpus  # noqa: E402
+from loadtest.fake_supabase import FAKE_KEY  # noqa: E402
+
+DEFAULT_MIX = "intake=25,intake_sync=5,prediction=15,cashflow=10,recurring=10,alert=5,pending=10,chat=20"
+CHAT_QUESTIONS = [
+    "How much did I spend on food this month?",     # Answered locally by the intent router
+    "What are my subscriptions?",
+    "How much do I owe people?",
+    "Any tips to save more on groceries?",          # Needs the model
+    "Why was my spending high last week?",
+    "Can I afford a new phone next month?",
+]
+
+
+# --- 1. SCENARIOS ---
+# Each returns (method, path, json body or None) for one request by 'user'.
+def _intake(rng, user, corpus, wait=False):
+    entry = rng.choice(corpus)
+    body = {"user_id": int(user), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S+05:30"), "raw_message": entry["message"]}
+    return "POST", "/intake/process" + ("?wait=true" if wait else ""), body
+
+
+SCENARIOS = {
+    "intake": lambda rng, user, corpus: _intake(rng, user, corpus),
+    "intake_sync": lambda rng, user, corpus: _intake(rng, user, corpus, wait=True),
+    "prediction": lambda rng, user, corpus: ("GET", f"/prediction/spending/{user}?timeframe=monthly", None),
+    "cashflow": lambda rng, user, corpus: ("GET", f"/prediction/cashflow/{user}?timeframe=monthly", None),
+    "recurring": lambda rng, user, corpus: ("GET", f"/recurring/{user}", None),
+    "alert": lambda rng, user, corpus: ("POST", "/alert/set_daily_alert", {"id": user, "limit": rng.randint(500, 5000)}),
+    "pending": lambda rng, user, corpus: ("GET", f"/pending/{user}", None),
+    "chat": lambda rng, user, corpus: ("POST", "/chatbot/chat", {"user_id": user, "message": rng.choice(CHAT_QUESTIONS)}),
+}
+
+
+def parse_mix(text):
+    mix = {}
+    for item in filter(None, text.split(",")):
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario '{name}'. Choose from: {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# --- 2. DRIVER ---
+def _percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _summary(latencies, statuses, errors, elapsed):
+    values = sorted(latencies)
+    summary = {
+        "requests": len(values) + errors,
+        "throughput_rps": round(len(values) / elapsed, 2) if elapsed else None,
+        "statuses": dict(sorted(statuses.items())),
+        "transport_errors": errors,
+    }
+    if values:
+        summary["latency_ms"] = {
+            "p50": round(_percentile(values, 50), 2), "p90": round(_percentile(values, 90), 2),
+            "p99": round(_percentile(values, 99), 2), "max": round(values[-1], 2),
+        }
+    return summary
+
+
+async def run_load(base_url, rps, duration, mix, users, seed=7, timeout=30.0, max_in_flight=500):
+    rng = random.Random(seed)
+    corpus = generate_corpus(500, seed)
+    names, weights = list(mix), list(mix.values())
+    latencies, statuses, errors = defaultdict(list), defaultdict(lambda: defaultdict(int)), defaultdict(int)
+    in_flight = asyncio.Semaphore(max_in_flight)
+
+    async def one(client, name, scheduled):
+        method, path, body = SCENARIOS[name](rng, str(rng.randint(1, users)), corpus)
+        async with in_flight:
+            try:
+                response = await client.request(method, path, json=body)
+                statuses[name][response.status_code] += 1
+                latencies[name].append((time.perf_counter() - scheduled) * 1000)
+            except httpx.HTTPError:
+                errors[name] += 1
+
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        tasks = []
+        started = time.perf_counter()
+        total = int(rps * duration)
+        for i in range(total):
+            scheduled = started + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one(client, rng.choices(names, weights)[0], scheduled)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    all_statuses = defaultdict(int)
+    for counts in statuses.values():
+        for status, count in counts.items():
+            all_statuses[status] += count
+    return {
+        "target_rps": rps,
+        "duration_seconds": round(elapsed, 2),
+        "users": users,
+        "mix": mix,
+        "overall": _summary(all_latencies, all_statuses, sum(errors.values()), elapsed),
+        "routes": {name: _summary(latencies[name], statuses[name], errors[name], elapsed) for name in names},
+    }
+
+
+# --- 3. LOCAL STACK ---
+def _wait_until_up(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Process for {url} exited with code {process.returncode}.")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.3)
+    raise SystemExit(f"{url} did not come up within {timeout}s.")
+
+
+def start_stack(args, workdir):
+    """Starts the fake Supabase and the app (fake LLM) as subprocesses; returns (processes, base_url)."""
+    supabase_url = f"http://127.0.0.1:{args.supabase_port}"
+    fake_db = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "loadtest", "fake_supabase.py"), "--port", str(args.supabase_port),
+         "--users", str(args.users)], cwd=ROOT)
+    _wait_until_up(f"{supabase_url}/rest/v1/limit?limit=1", fake_db)
+
+    env = dict(os.environ,
+               STORAGE_BACKEND="supabase", SUPABASE_URL=supabase_url, SUPABASE_KEY=FAKE_KEY,
+               LLM_BACKEND="fake", LLM_FAKE_LATENCY_MS=str(args.llm_latency_ms),
+               INTAKE_QUEUE_PATH=os.path.join(workdir, "intake_queue.db"))
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.app_port),
+         "--log-level", "warning", "--workers", str(args.workers)], cwd=ROOT, env=env)
+    base_url = f"http://127.0.0.1:{args.app_port}"
+    try:
+        _wait_until_up(f"{base_url}/metrics", app)
+    except SystemExit:
+        fake_db.terminate()
+        raise
+    return [app, fake_db], base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--start", action="store_true", help="Start the fake Supabase and the app locally.")
+    parser.add_argument("--rps", type=float, default=20.0)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load.")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Scenario weights, default: {DEFAULT_MIX}")
+    parser.add_argument("--users", type=int, default=50, help="Requests pick user ids 1..N (seeded by --start).")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0, help="Fake LLM latency (with --start).")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers (with --start).")
+    parser.add_argument("--app-port", type=int, default=8765)
+    parser.add_argument("--supabase-port", type=int, default=54321)
+    parser.add_argument("--out", help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args()
+
+    processes, base_url = [], args.base_url
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            if args.start:
+                processes, base_url = start_stack(args, workdir)
+            report = asyncio.run(run_load(base_url, args.rps, args.duration, parse_mix(args.mix), args.users, args.seed))
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait(10)
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
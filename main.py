@@ -1,29 +1,64 @@
-import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.responses import RedirectResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import RedirectResponse, PlainTextResponse
 
-from core.setup import initialize_supabase
-from routers import alert, prediction, intake, recurring, chatbot
+from routers import alert, prediction, intake, recurring, chatbot, pending, assistant, supa, sync, admin, insights
+from routers import charts, bills
+from services.intake_queue import intake_queue, intake_workers
+from services.charts import chart_service
+from core.metrics import MetricsMiddleware, registry
+from core.tracing import TracingMiddleware
+from core.startup import connect_clients, start_prewarm
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clients are built here rather than at import time, so importing the app stays fast
+    try:
+        await run_in_threadpool(connect_clients)
+    except Exception as e:
+        print(f"❌ Database client initialization failed: {e}")
+        raise
+    # Optional: load LangChain / Gemini before the first chat request (STARTUP_PREWARM)
+    await run_in_threadpool(start_prewarm)
+    # Background workers drain the intake queue for the lifetime of the app
+    await run_in_threadpool(intake_queue.connect)
+    intake_workers.start()
+    yield
+    intake_workers.stop()
+    chart_service.shutdown()
 
-db = initialize_supabase()
-# The db object is imported from core.setup where it is initialized.
-# If db is None, it means initialization failed, and we should exit.
-if not db:
-    print("❌ Firebase initialization failed. Exiting application.")
-    exit(1)
 
 app = FastAPI(
     title="FinSight API",
     description="API for smart expense tracking and financial insights.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Compress larger responses (sync batches, exports) for low-bandwidth clients
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+# Per-route latency histograms, exposed on /metrics (added last so it also times compression)
+app.add_middleware(MetricsMiddleware)
+# Root spans of sampled requests (TRACE_SAMPLE_RATE); Gemini calls become child spans (core/llm.py)
+app.add_middleware(TracingMiddleware)
+
 # Include all the application routers
 app.include_router(alert.alert_router, prefix="/alert")
 app.include_router(prediction.router, prefix="/prediction")
 app.include_router(intake.router, prefix="/intake")
 app.include_router(recurring.router, prefix="/recurring")
 app.include_router(chatbot.router, prefix="/chatbot")
+app.include_router(pending.router, prefix="/pending")
+app.include_router(assistant.router, prefix="/assistant")
+app.include_router(supa.router, prefix="/supa", tags=["Data"])
+app.include_router(sync.router, prefix="/sync")
+app.include_router(insights.router, prefix="/insights")
+app.include_router(charts.router, prefix="/charts")
+app.include_router(bills.router, prefix="/bills")
+app.include_router(admin.router, prefix="/admin")
 
  
 @app.get("/")
@@ -31,5 +66,13 @@ async def root():
     """Redirects the root path to the API documentation."""
     return RedirectResponse(url="/docs")
 
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Request and stage latency histograms in the Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
+    import uvicorn  # Not needed when a server imports the app
     uvicorn.run(app, host="0.0.0.0", port=8000)
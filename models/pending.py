@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+from typing import Literal, List, Optional
+
+class PendingItem(BaseModel):
+    description: str
+    amount: float
+    type: Literal["payable", "receivable"]
+    person_name: str
+
+class PendingItemCreate(PendingItem):
+    UserID: str
+
+class PendingBulkCreate(BaseModel):
+    UserID: str
+    items: List[PendingItem] = Field(min_length=1, max_length=500)
+
+class PendingSettle(BaseModel):
+    item_ids: Optional[List[str]] = None
+    person_name: Optional[str] = None
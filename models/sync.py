@@ -0,0 +1,13 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class SyncChange(BaseModel):
+    idempotency_key: str = Field(min_length=1, max_length=128)  # Generated on the device, e.g. a UUID
+    timestamp: str
+    raw_message: str
+
+class SyncRequest(BaseModel):
+    user_id: int
+    cursor: Optional[str] = None  # Returned by the previous sync; omit on first sync
+    changes: List[SyncChange] = Field(default_factory=list, max_length=500)
+    limit: int = Field(default=500, ge=1, le=1000)  # Max server changes returned in one response
@@ -0,0 +1,72 @@
+import os
+import hmac
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+from core.profiler import profiler, ProfilerBusyError, MAX_SECONDS, collapsed, top_functions
+from services.bills import claim_due_reminders, ack_reminders
+
+router = APIRouter(tags=["Admin"])
+
+
+class ReminderAck(BaseModel):
+    reminder_ids: List[int]
+
+
+def _check_admin(token: Optional[str]):
+    """Admin endpoints are disabled unless ADMIN_TOKEN is set, and then require it in X-Admin-Token."""
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token or not hmac.compare_digest(token.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+
+@router.get("/profile", include_in_schema=False)
+async def profile(seconds: float = Query(10.0, gt=0, le=MAX_SECONDS),
+                  interval_ms: float = Query(10.0, ge=1, le=1000),
+                  format: str = Query("collapsed", pattern="^(collapsed|json)$"),
+                  include_idle: bool = False,
+                  x_admin_token: Optional[str] = Header(None)):
+    """
+    Samples every thread of this worker process for 'seconds' and returns the result.
+    format=collapsed gives flamegraph-ready text (flamegraph.pl, speedscope);
+    format=json gives the top functions by self and total samples.
+    Parked threads (locks, queues, the idle event loop) are left out unless include_idle=true.
+    """
+    _check_admin(x_admin_token)
+    try:
+        report = await run_in_threadpool(profiler.profile, seconds, interval_ms / 1000, include_idle)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if format == "collapsed":
+        return PlainTextResponse(collapsed(report))
+    summary = {key: value for key, value in report.items() if key != "stacks"}
+    summary["top_functions"] = top_functions(report)
+    return summary
+
+
+@router.post("/bills/reminders", include_in_schema=False)
+async def due_bill_reminders(x_admin_token: Optional[str] = Header(None)):
+    """
+    For the notifier: returns every bill reminder that is due now and claims it, so no
+    other worker returns it meanwhile. Ack delivered ones with POST /bills/reminders/ack;
+    unacked reminders are returned again after BILL_REMINDER_ACK_SECONDS. Reminders are
+    scheduled by scripts/schedule_bill_reminders.py.
+    """
+    _check_admin(x_admin_token)
+    reminders = await run_in_threadpool(claim_due_reminders)
+    return {"count": len(reminders), "reminders": reminders}
+
+
+@router.post("/bills/reminders/ack", include_in_schema=False)
+async def ack_bill_reminders(ack: ReminderAck, x_admin_token: Optional[str] = Header(None)):
+    """For the notifier: marks the delivered reminders (by reminder_id) sent."""
+    _check_admin(x_admin_token)
+    acked = await run_in_threadpool(ack_reminders, ack.reminder_ids)
+    return {"acked": acked}
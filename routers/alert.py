@@ -4,6 +4,8 @@ from fastapi import APIRouter
 
 from models.alert import Alert
 from core.setup import initialize_supabase
+from core.cache import table_cache
+from services.financial_context import invalidate_financial_context
 
 alert_router = APIRouter()
 DB = initialize_supabase()
@@ -20,6 +22,8 @@ async def set_daily_alert(alert: Alert):
     )
     if(len(response.data) > 0):
         DB.table("limit").update({"daily": limit}).eq("id", id).execute()
+        table_cache.invalidate("limit", id)
+        invalidate_financial_context(id)
         return {"message": "Daily alert set successfully."}
     return {"message": "User ID does not exist"}
 
@@ -35,6 +39,8 @@ async def set_weekly_alert(alert: Alert):
     )
     if(len(response.data) > 0):
         DB.table("limit").update({"weekly": limit}).eq("id", id).execute()
+        table_cache.invalidate("limit", id)
+        invalidate_financial_context(id)
         return {"message": "Weekly alert set successfully."}
     return {"message": "User ID does not exist"}
 
@@ -50,6 +56,8 @@ async def set_monthly_alert(alert: Alert):
     )
     if(len(response.data) > 0):
         DB.table("limit").update({"monthly": limit}).eq("id", id).execute()
+        table_cache.invalidate("limit", id)
+        invalidate_financial_context(id)
         return {"message": "Monthly alert set successfully."}
     return {"message": "User ID does not exist"}
 
@@ -65,5 +73,7 @@ async def set_yearly_alert(alert: Alert):
     )
     if(len(response.data) > 0):
         DB.table("limit").update({"yearly": limit}).eq("id", id).execute()
+        table_cache.invalidate("limit", id)
+        invalidate_financial_context(id)
         return {"message": "Yearly alert set successfully."}
     return {"message": "User ID does not exist"}
\ No newline at end of file
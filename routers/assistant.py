@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from services import ai as ai_service
+
+router = APIRouter(tags=["AI Assistant"])
+
+class AgentChatRequest(BaseModel):
+    UserID: str
+    query: str
+
+@router.post("/chat")
+async def handle_chat(request: AgentChatRequest):
+    """
+    Main endpoint to handle user queries for the financial agent.
+    """
+    try:
+        response = await run_in_threadpool(ai_service.get_agent_response, request.UserID, request.query)
+        return {"response": response}
+    except Exception as e:
+        print(f"An error occurred during agent execution: {e}")
+        raise HTTPException(status_code=500, detail="An error occurred while processing your request.")
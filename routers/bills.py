@@ -0,0 +1,18 @@
+from fastapi import APIRouter, HTTPException, Query
+from services.bills import bill_calendar
+
+router = APIRouter(tags=["Bills"])
+
+
+@router.get("/{user_id}")
+def upcoming_bills(user_id: str, days: int = Query(30, ge=1, le=366)):
+    """
+    Bills due in the next 'days' days, soonest first, projected from the user's detected
+    subscriptions. Bills up to a week overdue are included with overdue=true.
+    """
+    try:
+        bills = bill_calendar.bills_due(user_id, days)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+    return {"user_id": user_id, "days": days, "total": round(sum(bill["amount"] for bill in bills), 2),
+            "bills": bills}
@@ -0,0 +1,31 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi.responses import Response
+
+from services.charts import chart_service, CHARTS, CHART_CACHE_TTL_SECONDS
+from services.chart_renderer import FORMATS
+
+router = APIRouter(tags=["Charts"])
+
+
+@router.get("/{chart}/{user_id}")
+async def get_chart(chart: str, user_id: str, format: str = Query("png", pattern="^(png|svg)$"),
+                    if_none_match: Optional[str] = Header(None)):
+    """
+    Renders a chart as an image: 'categories' (pie of the last 30 days),
+    'daily_trend' (last 7 days) or 'monthly_trend' (last 12 months plus next month's prediction).
+    Images are cached until the user's data changes; the ETag lets clients skip unchanged downloads.
+    """
+    if chart not in CHARTS:
+        raise HTTPException(status_code=404, detail=f"Unknown chart. Use {', '.join(CHARTS)}.")
+    try:
+        image, etag = await chart_service.get_chart(user_id, chart, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={CHART_CACHE_TTL_SECONDS}"}
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=image, media_type=FORMATS[format], headers=headers)
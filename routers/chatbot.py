@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from services import chatbot as chatbot_service
+from services.response_cache import response_cache
 
 router = APIRouter()
 
@@ -15,3 +16,9 @@ def chat(request: ChatRequest):
         return {"response": response}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/cache/stats")
+def cache_stats():
+    """Returns hit-rate metrics of the chatbot response cache."""
+    return response_cache.stats()
@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from services.spending_cube import spending_cube, GRANULARITIES
+from services.highlights import get_highlights
+
+router = APIRouter(tags=["Insights"])
+
+# Default range per granularity when 'start' is omitted
+DEFAULT_START = {
+    "day": lambda today: today - timedelta(days=29),
+    "week": lambda today: today - timedelta(days=today.weekday() + 7 * 11),  # This week and the 11 before it
+    "month": lambda today: today.replace(month=1, day=1),  # This year
+}
+
+
+@router.get("/spending/{user_id}")
+def spending_by_category(user_id: str, granularity: str = "month", start: Optional[date] = None,
+                         end: Optional[date] = None, category: Optional[List[str]] = Query(None)):
+    """
+    Spending per category and day / week / month, e.g. Food per month this year:
+    /insights/spending/1?granularity=month&category=Food
+    Defaults: the last 30 days by day, the last 12 weeks by week, this year by month.
+    """
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"Invalid granularity. Use {', '.join(GRANULARITIES)}.")
+    end = end or date.today()
+    start = start or DEFAULT_START[granularity](end)
+    try:
+        return {"user_id": user_id, **spending_cube.slice(user_id, start, end, granularity, category)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+
+@router.get("/top-categories/{user_id}")
+def top_categories(user_id: str, days: int = Query(30, ge=1, le=366), limit: int = Query(5, ge=1, le=50)):
+    """The categories the user spent most on in the last 'days' days, with their share of the total."""
+    end = date.today()
+    try:
+        categories = spending_cube.top_categories(user_id, end - timedelta(days=days - 1), end, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+    return {"user_id": user_id, "days": days, "categories": categories}
+
+
+@router.get("/highlights/{user_id}")
+def highlights(user_id: str, period: Optional[str] = Query(None, pattern=r"^\d{4}(-\d{2})?$"),
+               kind: Optional[str] = Query(None, pattern="^(year|month)$")):
+    """
+    Wrapped-style highlights for a year (period=2025) or a month (period=2025-03), or the
+    most recently generated ones (kind=year or kind=month to pick one of the two).
+    Served from the batch results of scripts/generate_highlights.py.
+    """
+    try:
+        result = get_highlights(user_id, period, kind)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+    if result is None:
+        raise HTTPException(status_code=404, detail="No highlights have been generated for this period yet.")
+    return {"user_id": user_id, **result}
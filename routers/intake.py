@@ -1,17 +1,20 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header, Response
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel  # Assuming TransactionData is a Pydantic model
-from datetime import datetime
+from typing import Optional
 
 # Import the parsing function
 from services.parsing_engine import parse_transaction
+from services import intake as intake_service
+from services.intake_queue import intake_queue, QueueFullError
 
 # Import the Supabase DB client
 try:
-    from core.setup import initialize_firebase
+    from core.setup import initialize_supabase
 
-    db = initialize_firebase()
+    db = initialize_supabase()
 except ImportError:
-    print("Error: Could not import 'initialize_firebase' from 'core.setup'.")
+    print("Error: Could not import 'initialize_supabase' from 'core.setup'.")
     db = None
 except Exception as e:
     print(f"Error initializing database: {e}")
@@ -30,14 +33,31 @@ router = APIRouter()
 
 
 @router.post("/process", tags=["Intake"])
-async def process_raw_transaction(data: TransactionData):
+async def process_raw_transaction(data: TransactionData, response: Response, wait: bool = False,
+                                  idempotency_key: Optional[str] = Header(None)):
     """
-    Receives raw transaction data, calls the parsing service,
-    and saves the formatted data to the Supabase database.
+    Accepts a raw transaction message. By default the message is queued and a
+    202 with its job id is returned; background workers parse and store it.
+    Pass ?wait=true to parse and save synchronously and get the stored row back.
+    Retries carrying the same Idempotency-Key header never create a duplicate row.
     """
     if not db:
         raise HTTPException(status_code=500, detail="Database client is not initialized")
 
+    if not wait:
+        try:
+            job_id = await run_in_threadpool(
+                intake_queue.enqueue, data.user_id, data.timestamp, data.raw_message, idempotency_key)
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+        response.status_code = 202
+        return {"status": "queued", "job_id": job_id}
+
+    if idempotency_key:
+        existing = intake_service.find_existing(data.user_id, [idempotency_key])
+        if idempotency_key in existing:
+            return existing[idempotency_key]
+
     # 1. Parse the raw message using the parsing service
     parsed_details = parse_transaction(data.raw_message)
 
@@ -46,36 +66,15 @@ async def process_raw_transaction(data: TransactionData):
 
     # 2. Format the data for Supabase
     try:
-        dt_object = datetime.fromisoformat(data.timestamp)
-    except (ValueError, TypeError):
-        raise HTTPException(status_code=400, detail=f"Invalid timestamp format: {data.timestamp}")
-
-    # Assemble the final dictionary to match your 'transaction' table schema
-    final_data = {
-        "user_id": data.user_id,
-        "created_at": data.timestamp,  # Use the full ISO string
-        "day": dt_object.strftime("%A"),  # e.g., "Monday"
-        "amount": parsed_details.get("amount"),
-        "sender_name": parsed_details.get("sender_name"),
-        "payment_method": parsed_details.get("payment_method"),
-        "payment_type": parsed_details.get("payment_type"),
-        "category": parsed_details.get("category"),
-        "message": parsed_details.get("message"),  # This comes from parse_transaction
-        "anomaly": False  # Set a default value
-    }
+        final_data = intake_service.build_transaction_row(
+            data.user_id, data.timestamp, parsed_details, idempotency_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     # 3. Insert into Supabase 'transaction' table
     try:
-        response = db.table('transaction').insert(final_data).execute()
-
-        if not response.data:
-            # This might happen if RLS fails, but .insert() usually errors
-            raise Exception("No data returned from Supabase after insert.")
-
-        print(f"✅ DB Write: Successfully wrote transaction for UserID '{data.user_id}'.")
-
         # Return the newly created transaction record from the DB
-        return response.data[0]
+        return intake_service.record_transactions(data.user_id, [final_data])[0]
 
     except Exception as e:
         print(f"❌ DB Write Error: {e}")
@@ -83,6 +82,26 @@ async def process_raw_transaction(data: TransactionData):
         raise HTTPException(status_code=500, detail=f"Data parsed but failed to save to database: {str(e)}")
 
 
+@router.get("/jobs/{job_id}", tags=["Intake"])
+async def get_job_status(job_id: int):
+    """
+    Status of a queued message. Jobs are removed once stored, so a job that is
+    no longer in the queue is reported as 'done'; an id that was never issued is a 404.
+    """
+    job = await run_in_threadpool(intake_queue.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No intake job {job_id}")
+    if job["status"] == "done":
+        return {"job_id": job_id, "status": "done"}
+    return {"job_id": job_id, "status": job["status"], "attempts": job["attempts"], "error": job["error"]}
+
+
+@router.get("/queue/stats", tags=["Intake"])
+async def queue_stats():
+    """Queue depth, lag and throughput counters."""
+    return await run_in_threadpool(intake_queue.stats)
+
+
 @router.get("/test", tags=["Intake"])
 async def test_endpoint():
-    return {"message": "Intake endpoint is working"}
\ No newline at end of file
+    return {"message": "Intake endpoint is working"}
@@ -0,0 +1,87 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+
+from models.pending import PendingItemCreate, PendingBulkCreate, PendingSettle
+from services import pendings as pending_service
+
+router = APIRouter(tags=["Pending Payments"])
+
+
+@router.post("/", status_code=201)
+async def add_pending_item(item: PendingItemCreate):
+    """
+    Adds a new pending transaction for a user.
+    'type' should be 'payable' (you owe) or 'receivable' (you are owed).
+    """
+    try:
+        new_id = await run_in_threadpool(
+            pending_service.add_pending_item,
+            item.UserID, item.description, item.amount, item.type, item.person_name,
+        )
+        return {"status": "success", "id": new_id}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to add pending item: {e}")
+
+
+@router.post("/bulk", status_code=201)
+async def add_pending_items(request: PendingBulkCreate):
+    """
+    Adds several pending transactions for a user in a single database round trip.
+    """
+    items = [(item.description, item.amount, item.type, item.person_name) for item in request.items]
+    try:
+        new_ids = await run_in_threadpool(pending_service.add_pending_items, request.UserID, items)
+        return {"status": "success", "ids": new_ids}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to add pending items: {e}")
+
+
+@router.get("/{user_id}")
+async def get_pending_items(user_id: str, limit: int = Query(100, ge=1, le=pending_service.MAX_PAGE_SIZE),
+                            offset: int = Query(0, ge=0), person_name: str = None):
+    """
+    Retrieves one page of pending items for a given UserID, newest first.
+    Optionally filtered to a single counterparty.
+    """
+    try:
+        return await run_in_threadpool(pending_service.get_pending_items, user_id, limit, offset, person_name)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve items: {e}")
+
+
+@router.get("/{user_id}/balances")
+async def get_pending_balances(user_id: str):
+    """
+    Returns the net balance with every counterparty and the totals to give and to take.
+    """
+    try:
+        return await run_in_threadpool(pending_service.get_pending_balances, user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve balances: {e}")
+
+
+@router.post("/{user_id}/settle")
+async def settle_pending_items(user_id: str, request: PendingSettle):
+    """
+    Settles several pending items in one round trip, by ID or for a whole counterparty.
+    """
+    if not request.item_ids and not request.person_name:
+        raise HTTPException(status_code=400, detail="Either item_ids or person_name must be provided.")
+    try:
+        settled = await run_in_threadpool(
+            pending_service.settle_pending_items, user_id, request.item_ids, request.person_name)
+        return {"success": True, "settled": settled}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to settle items: {e}")
+
+
+@router.delete("/{user_id}/{item_id}")
+async def delete_pending_item(user_id: str, item_id: str):
+    """
+    Deletes a specific pending item by its ID.
+    """
+    try:
+        await run_in_threadpool(pending_service.delete_pending_item, user_id, item_id)
+        return {"success": True, "message": f"Item {item_id} deleted successfully."}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to delete item: {e}")
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException
-from services.recurring_detector import detect_recurring
+from services.recurring_detector import detect_recurring, detect_income_streams
 
 router = APIRouter(tags=["Recurring Payments"])
 
@@ -16,3 +16,17 @@ def get_user_recurrings(user_id: str):
     except Exception as e:
         # For any unexpected errors in the detection logic
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+
+@router.get("/income/{user_id}")
+def get_user_income_streams(user_id: str):
+    """
+    Detects periodic income streams (e.g. salary) for a given user, with the date the next one is expected.
+    """
+    try:
+        streams = detect_income_streams(user_id)
+        if not streams:
+            return {"message": "No income streams detected."}
+        return streams
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
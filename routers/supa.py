@@ -1,26 +1,53 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
 from models.supa import *
 from core.setup import initialize_supabase
+from core.cache import table_cache
+from services import query as query_service
 
 router = APIRouter()
 DB = initialize_supabase()
 
 ### transaction, limit, chat_history, pending, summary
 
-# read all
-@router.get("/read_all/{table_name}")
-async def read_all(table_name: str):
-    response = (
-        DB.table(table_name)
-        .select("*")
-        .execute()
-    )
-    return response.data
+def _parse(table_name: str, request: Request):
+    try:
+        return query_service.parse_query(table_name, request.query_params.multi_items())
+    except query_service.QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# read (paginated)
+@router.get("/read/{table_name}")
+async def read(table_name: str, request: Request):
+    """
+    Reads one page of a whitelisted table with PostgREST-style parameters, e.g.
+    /read/transaction?select=amount,category&user_id=eq.1&amount=gte.100&amount=lte.500&order=created_at.desc&limit=50
+    Pass the returned next_cursor as ?cursor= to fetch the next page.
+    """
+    spec = _parse(table_name, request)
+    return await run_in_threadpool(query_service.fetch_page, spec)
+
+# export (streamed)
+@router.get("/export/{table_name}")
+async def export(table_name: str, request: Request):
+    """
+    Streams every matching row of a whitelisted table as NDJSON using keyset pagination,
+    so large exports run in constant memory. Accepts the same parameters as /read.
+    """
+    spec = _parse(table_name, request)
+    return StreamingResponse(query_service.stream_ndjson(spec), media_type="application/x-ndjson")
+
+# cache metrics
+@router.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss metrics of the read-through cache for limit, summary and chat_history."""
+    return table_cache.stats()
 
 # read one 
 @router.get("/read_one/transaction")
-async def read_one_transaction(transaction: TransactionReadOne):
+async def read_one_transaction(transaction: TransactionReadOne = Depends()):
     user_id = transaction.user_id
     transaction_id = transaction.transaction_id
     if (user_id is None) and (transaction_id is None):
@@ -52,20 +79,14 @@ async def read_one_transaction(transaction: TransactionReadOne):
         return response.data
     
 @router.get("/read_one/limit")
-async def read_one_limit(limit: LimitReadOne):
+async def read_one_limit(limit: LimitReadOne = Depends()):
     if limit.user_id is None:
         return {"ERROR": "user_id must be provided."}
     user_id = limit.user_id
-    response = (
-        DB.table("limit")
-        .select("*")
-        .eq("user_id", user_id)
-        .execute()
-    )
-    return response.data
+    return table_cache.get_rows("limit", user_id)
 
 @router.get("/read_one/pending")
-async def read_one_pending(pending: PendingReadOne):
+async def read_one_pending(pending: PendingReadOne = Depends()):
     user_id = pending.user_id
     pending_id = pending.pending_id
     if (user_id is None) and (pending_id is None):
@@ -97,30 +118,18 @@ async def read_one_pending(pending: PendingReadOne):
         return response.data
     
 @router.get("/read_one/summary")
-async def read_one_summary(summary: SummaryReadOne):
+async def read_one_summary(summary: SummaryReadOne = Depends()):
     if summary.user_id is None:
         return {"ERROR": "user_id must be provided."}
     user_id = summary.user_id
-    response = (
-        DB.table("summary")
-        .select("*")
-        .eq("user_id", user_id)
-        .execute()
-    )
-    return response.data
+    return table_cache.get_rows("summary", user_id)
 
 @router.get("/read_one/chat_history")
-async def read_one_chat_history(chat_history: ChatHistoryReadOne):
+async def read_one_chat_history(chat_history: ChatHistoryReadOne = Depends()):
     if chat_history.user_id is None:
         return {"ERROR": "user_id must be provided."}
     user_id = chat_history.user_id
-    response = (
-        DB.table("chat_history")
-        .select("*")
-        .eq("user_id", user_id)
-        .execute()
-    )
-    return response.data
+    return table_cache.get_rows("chat_history", user_id)
 
 # insert
 
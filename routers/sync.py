@@ -0,0 +1,67 @@
+import zlib
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+
+from models.sync import SyncRequest
+from services import sync as sync_service
+from services.query import QueryError
+from services.parsing_engine import LLMRateLimitError
+
+router = APIRouter(tags=["Sync"])
+
+MAX_BODY_BYTES = 5 * 1024 * 1024  # Decompressed size limit
+WBITS = {"gzip": 16 + zlib.MAX_WBITS, "deflate": zlib.MAX_WBITS}  # gzip and zlib containers
+
+
+def _decode_body(body: bytes, encoding: str):
+    """
+    Accepts gzip / deflate compressed request bodies from low-bandwidth clients.
+    Output is capped at MAX_BODY_BYTES while decompressing, so a small compressed
+    body cannot expand into gigabytes in memory.
+    """
+    encoding = (encoding or "identity").lower()
+    if encoding == "identity":
+        decoded = body
+    elif encoding in WBITS:
+        decompressor = zlib.decompressobj(wbits=WBITS[encoding])
+        try:
+            decoded = decompressor.decompress(body, MAX_BODY_BYTES + 1)
+        except zlib.error as e:
+            raise HTTPException(status_code=400, detail=f"Could not decompress request body: {e}")
+        if len(decoded) <= MAX_BODY_BYTES and not decompressor.eof:
+            raise HTTPException(status_code=400, detail="Could not decompress request body: truncated data")
+    else:
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {encoding}")
+    if len(decoded) > MAX_BODY_BYTES:
+        raise HTTPException(status_code=413, detail="Sync batch too large.")
+    return decoded
+
+
+@router.post("/")
+async def sync(request: Request):
+    """
+    Offline-first sync in a single round trip.
+    The body (optionally gzip/deflate compressed, see Content-Encoding) carries the client's
+    pending messages, each with a client-generated idempotency_key, and the cursor from the
+    previous sync. The response lists accepted / duplicate / rejected keys and every server-side
+    transaction after the cursor, plus the new cursor. Responses are gzip-compressed when the
+    client sends Accept-Encoding: gzip.
+    """
+    body = _decode_body(await request.body(), request.headers.get("content-encoding"))
+    try:
+        sync_request = SyncRequest.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+
+    try:
+        return await run_in_threadpool(sync_service.sync, sync_request)
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LLMRateLimitError as e:
+        # Nothing was stored; the client retries the same batch later
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "60"})
+    except Exception as e:
+        print(f"❌ Sync Error: {e}")
+        raise HTTPException(status_code=500, detail=f"Sync failed: {str(e)}")
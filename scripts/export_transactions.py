@@ -0,0 +1,38 @@
+"""
+Exports the 'transaction' table into the Parquet archive read by the batch jobs.
+
+    python scripts/export_transactions.py [--refresh-months 2] [--path archive/transactions]
+
+Each run appends the transactions added since the previous one (tracked by
+transaction_id in <path>/_watermark.json). --refresh-months N also rewrites the
+last N months in full, which picks up edited and deleted rows; run it e.g. nightly
+and a plain export hourly. Needs pyarrow (pip install pyarrow). Jobs read the archive
+with BATCH_TRANSACTION_SOURCE=archive (see services/transaction_archive.py).
+"""
+import os
+import sys
+import json
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from services.transaction_archive import TransactionArchive, ARCHIVE_PATH  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=ARCHIVE_PATH, help=f"Dataset directory (default: {ARCHIVE_PATH}).")
+    parser.add_argument("--refresh-months", type=int, default=0,
+                        help="Also rewrite this many recent months, including the current one.")
+    args = parser.parse_args()
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        parser.error("pyarrow is required for the archive: pip install pyarrow")
+    print(json.dumps(TransactionArchive(args.path).export(args.refresh_months), indent=2))
+
+
+if __name__ == "__main__":
+    main()
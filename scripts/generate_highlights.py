@@ -0,0 +1,40 @@
+"""
+Generates the Wrapped-style highlights served by GET /insights/highlights/{user_id}.
+
+    python scripts/generate_highlights.py [--period 2025 | --period 2025-03] [--workers 8] [--source archive]
+
+Reads every transaction of the period once into a columnar snapshot, computes each
+user's highlights with pandas group-bys split across worker processes, and upserts
+one row per user into the 'highlights' table (see services/highlights.py). Without
+--period it generates last month. Run it from a scheduler after each month and year.
+"""
+import os
+import sys
+import json
+import argparse
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from services.highlights import generate_highlights, parse_period, HIGHLIGHTS_WORKERS  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--period", default=(date.today().replace(day=1) - timedelta(days=1)).strftime("%Y-%m"),
+                        help="A year (2025) or a month (2025-03); defaults to last month.")
+    parser.add_argument("--workers", type=int, default=HIGHLIGHTS_WORKERS, help="Worker processes (default: all cores).")
+    parser.add_argument("--source", choices=["api", "archive"], default=None,
+                        help="Read transactions from the API or the Parquet archive (default: BATCH_TRANSACTION_SOURCE).")
+    args = parser.parse_args()
+
+    try:
+        parse_period(args.period)
+    except ValueError as e:
+        parser.error(str(e))
+    print(json.dumps(generate_highlights(args.period, args.workers, args.source), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Schedules the bill reminders served by POST /admin/bills/reminders.
+
+    python scripts/schedule_bill_reminders.py [--source archive]
+
+Detects every user's subscriptions, projects each bill's next due date and upserts one
+row per (user, recipient, due date) into the 'bill_reminder' table (see services/bills.py),
+due BILL_REMINDER_LEAD_DAYS before the bill. Reminders already sent are kept, unsent ones
+for bills that moved are replaced. Run it from a scheduler a few times a day.
+"""
+import os
+import sys
+import json
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from services.bills import schedule_reminders  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=["api", "archive"], default=None,
+                        help="Read transactions from the API or the Parquet archive (default: BATCH_TRANSACTION_SOURCE).")
+    args = parser.parse_args()
+    print(json.dumps(schedule_reminders(args.source), indent=2))
+
+
+if __name__ == "__main__":
+    main()
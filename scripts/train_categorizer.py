@@ -0,0 +1,107 @@
+"""
+Trains the local category classifier used by services/categorizer.py.
+
+    python scripts/train_categorizer.py [--data data/category_training.csv] [--out data/category_model.json]
+
+The model is TF-IDF over word unigrams and character trigrams followed by a
+multinomial logistic regression, trained with plain SGD so no ML dependency is
+needed. Training examples are the labeled CSV plus every vendor in the
+categorizer's dictionary. Re-run after editing either and commit the JSON.
+"""
+import os
+import sys
+import csv
+import json
+import math
+import random
+import argparse
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from services.categorizer import VENDOR_CATEGORIES, extract_features  # noqa: E402
+
+EPOCHS = 40
+LEARNING_RATE = 0.5
+L2 = 1e-4
+MIN_WEIGHT = 1e-3  # Smaller weights are dropped from the shipped file
+
+
+def load_examples(path):
+    examples = [(name, category) for name, category in VENDOR_CATEGORIES.items()]
+    with open(path, newline="", encoding="utf-8") as f:
+        examples.extend((row["text"], row["category"]) for row in csv.DictReader(f))
+    return examples
+
+
+def vectorize(features, idf):
+    counts = Counter(feature for feature in features if feature in idf)
+    vector = {feature: count * idf[feature] for feature, count in counts.items()}
+    norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+    return {feature: value / norm for feature, value in vector.items()}
+
+
+def train(examples, seed=13):
+    classes = sorted({category for _, category in examples})
+    index = {category: i for i, category in enumerate(classes)}
+    documents = [extract_features(text) for text, _ in examples]
+
+    document_frequency = Counter(feature for features in documents for feature in set(features))
+    total = len(documents)
+    idf = {feature: math.log((1 + total) / (1 + df)) + 1 for feature, df in document_frequency.items()}
+
+    data = [(vectorize(features, idf), index[category]) for features, (_, category) in zip(documents, examples)]
+    weights = {feature: [0.0] * len(classes) for feature in idf}
+    bias = [0.0] * len(classes)
+
+    rng = random.Random(seed)
+    for epoch in range(EPOCHS):
+        rng.shuffle(data)
+        rate = LEARNING_RATE / (1 + epoch * 0.1)
+        loss = 0.0
+        for vector, label in data:
+            scores = list(bias)
+            for feature, value in vector.items():
+                for i, weight in enumerate(weights[feature]):
+                    scores[i] += weight * value
+            top = max(scores)
+            exps = [math.exp(score - top) for score in scores]
+            norm = sum(exps)
+            probs = [e / norm for e in exps]
+            loss -= math.log(max(probs[label], 1e-12))
+
+            for i in range(len(classes)):
+                gradient = probs[i] - (1.0 if i == label else 0.0)
+                bias[i] -= rate * gradient
+                for feature, value in vector.items():
+                    weights[feature][i] -= rate * (gradient * value + L2 * weights[feature][i])
+        if epoch % 10 == 0 or epoch == EPOCHS - 1:
+            print(f"epoch {epoch:3d}  loss {loss / len(data):.4f}")
+
+    pruned = {feature: [round(w, 4) for w in row] for feature, row in weights.items()
+              if max(abs(w) for w in row) >= MIN_WEIGHT}
+    return {
+        "classes": classes,
+        "idf": {feature: round(value, 4) for feature, value in idf.items() if feature in pruned},
+        "weights": pruned,
+        "bias": [round(b, 4) for b in bias],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=os.path.join(ROOT, "data", "category_training.csv"))
+    parser.add_argument("--out", default=os.path.join(ROOT, "data", "category_model.json"))
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    print(f"Training on {len(examples)} examples...")
+    model = train(examples)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(model, f, separators=(",", ":"), sort_keys=True)
+    print(f"Wrote {len(model['weights'])} features x {len(model['classes'])} classes to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
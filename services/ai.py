@@ -1,35 +1,18 @@
-from flask import Flask, request, jsonify
 from dotenv import load_dotenv
 import os
-from supabase import create_client, Client  # Replaced Firebase
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain.tools import Tool
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.messages import HumanMessage, AIMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
 from datetime import datetime
+from core.setup import initialize_supabase
+from core.llm import chat_model, is_fake
+from core.cache import table_cache
+from core.tracing import traced
+from services.financial_context import get_financial_context_text
 
 # --- CONFIGURATION & SETUP ---
 load_dotenv()
 
-# 1a. Supabase Initialization (Replaced Firebase)
-try:
-    supabase_url = os.getenv("SUPABASE_URL")
-    supabase_key = os.getenv("SUPABASE_KEY")
-    if not supabase_url or not supabase_key:
-        raise ValueError("SUPABASE_URL or SUPABASE_KEY environment variables not set.")
-
-    # Use 'db' as variable name to minimize changes
-    db: Client = create_client(supabase_url, supabase_key)
-    print("--- Supabase Initialized Successfully ---")
-except Exception as e:
-    print(f"Supabase initialization failed: {e}\nPlease ensure your .env file is present and valid.")
-    db = None
-
-# 1b. LangChain (Gemini) Initialization
-api_key = os.getenv("GOOGLE_API_KEY")
-if not api_key:
-    raise ValueError("GOOGLE_API_KEY environment variable not set.")
+# 1a. Supabase Initialization
+# Shared client initialized once for the whole FastAPI process
+db = initialize_supabase()
 
 # --- GLOBAL AGENT EXECUTOR ---
 agent_executor = None
@@ -103,10 +86,19 @@ def initialize_agent():
     if agent_initialized:
         return
 
+    # 1b. LangChain (Gemini) configuration is checked on first use so a missing key
+    # only disables the agent instead of failing the whole API at import time
+    if not os.getenv("GOOGLE_API_KEY") and not is_fake():
+        raise ValueError("GOOGLE_API_KEY environment variable not set.")
+
     print("--- Initializing Financial Agent ---")
+    # LangChain's agent stack takes a while to import, so it loads with the agent
+    from langchain.agents import AgentExecutor, create_tool_calling_agent
+    from langchain.tools import Tool
+    from langchain_core.prompts import ChatPromptTemplate
 
     # 1. Initialize LLM
-    llm = ChatGoogleGenerativeAI(model="gemini-1.0-pro", temperature=0.3)
+    llm = chat_model("gemini-1.0-pro", temperature=0.3)
 
     # 2. Create Tools
     financial_tool = Tool(
@@ -124,10 +116,11 @@ def initialize_agent():
         [
             ("system",
              "You are a friendly and helpful AI Financial Assistant. Your primary goal is to answer questions about the user's spending and income by analyzing their transaction data. "
-             "You MUST use the 'financial_data_retriever' tool to get the user's transaction history. The user's ID is provided with each request. "
-             "Do NOT answer questions about their personal finances from your own general knowledge. If the tool returns no data, inform the user that you couldn't find any transactions for them."),
+             "A compact snapshot of the user's finances (category totals, top vendors, limits, recurring bills, pending balances) is provided with each request. "
+             "Answer from that snapshot whenever it is enough, and only use the 'financial_data_retriever' tool when you need individual transactions. The user's ID is provided with each request. "
+             "Do NOT answer questions about their personal finances from your own general knowledge. If neither the snapshot nor the tool has data, inform the user that you couldn't find any transactions for them."),
             ("placeholder", "{chat_history}"),
-            ("human", "{input}\n\nUser ID: {user_id}"),  # Pass user_id directly in the prompt
+            ("human", "{input}\n\nUser ID: {user_id}\n\nFinancial snapshot:\n{financial_context}"),  # Pass user_id and snapshot directly in the prompt
             ("placeholder", "{agent_scratchpad}"),
         ]
     )
@@ -145,11 +138,9 @@ def get_chat_history(user_id: str):
     """Fetches chat history from the 'chat_history' table in Supabase."""
     if not db: return []
     try:
-        response = db.table("chat_history").select("chat_history").eq("user_id", user_id).execute()
-        if response.data:
-            # Your schema has 'chat_history' as the json column
-            return response.data[0].get('chat_history', [])
-        return []
+        row = table_cache.get_row("chat_history", user_id)
+        # Your schema has 'chat_history' as the json column; copy it so callers can append safely
+        return list(row.get('chat_history') or [])
     except Exception as e:
         print(f"Error getting chat history: {e}")
         return []
@@ -168,31 +159,25 @@ def update_chat_history(user_id: str, query: str, response: str):
             "user_id": user_id,
             "chat_history": history
         }).execute()
+        table_cache.invalidate("chat_history", user_id)
     except Exception as e:
         print(f"Error updating chat history: {e}")
 
 
-# --- FLASK APPLICATION ---
-app = Flask(__name__)
+# --- AGENT ENTRY POINT ---
 
-
-@app.route('/chat', methods=['POST'])
-def handle_chat():
+@traced()
+def get_agent_response(user_id: str, query: str) -> str:
     """
-    Main endpoint to handle user queries for the financial chatbot.
-    Expects JSON: {"UserID", "query"}
+    Answers a user query with the financial agent and stores the exchange in chat history.
+    Raises on agent failures so the router can map them to HTTP errors.
     """
     initialize_agent()  # Ensure agent is ready on first request
 
     if not agent_executor:
-        return jsonify({"error": "AI agent is not available."}), 500
-
-    data = request.get_json()
-    if not data or "UserID" not in data or "query" not in data:
-        return jsonify({"error": "Missing 'UserID' or 'query' in request body"}), 400
+        raise RuntimeError("AI agent is not available.")
 
-    user_id = data["UserID"]
-    query = data["query"]
+    from langchain_core.messages import HumanMessage, AIMessage
 
     raw_history = get_chat_history(user_id)
     chat_history = []
@@ -200,18 +185,11 @@ def handle_chat():
         if record.get("human"): chat_history.append(HumanMessage(content=record["human"]))
         if record.get("ai"): chat_history.append(AIMessage(content=record["ai"]))
 
-    try:
-        # Invoke the agent, passing the user_id for the tool to use
-        response = agent_executor.invoke({"input": query, "chat_history": chat_history, "user_id": user_id})
-        ai_response = response["output"]
-
-        update_chat_history(user_id, query, ai_response)
-
-        return jsonify({"response": ai_response})
-    except Exception as e:
-        print(f"An error occurred during agent execution: {e}")
-        return jsonify({"error": "An error occurred while processing your request."}), 500
+    # Invoke the agent, passing the user_id for the tool to use
+    response = agent_executor.invoke({"input": query, "chat_history": chat_history, "user_id": user_id,
+                                      "financial_context": get_financial_context_text(user_id)})
+    ai_response = response["output"]
 
+    update_chat_history(user_id, query, ai_response)
 
-if __name__ == '__main__':
-    app.run(debug=True, port=5002)  # Running on port 5002 to avoid other services
\ No newline at end of file
+    return ai_response
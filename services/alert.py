@@ -1,8 +1,11 @@
 from core.setup import initialize_supabase
+from core.cache import table_cache
+from core.tracing import traced
 
 db = initialize_supabase()
 
 
+@traced()
 def limit_checker(user_id):
     # db is assumed to be your global Supabase client
     alert_msg = ""
@@ -10,23 +13,16 @@ def limit_checker(user_id):
     sum_data = {}
 
     try:
-        # 1. Fetch all limits for the user in one query
-        # We use maybe_single() to safely get one row or None
-        limit_res = db.table('limit').select('daily', 'weekly', 'monthly', 'yearly') \
-            .eq('user_id', user_id).maybe_single().execute()
-        if limit_res.data:
-            limit_data = limit_res.data
+        # 1. Fetch all limits for the user (read-through cache, one query on a miss)
+        limit_data = table_cache.get_row('limit', user_id)
 
     except Exception as e:
         print(f"Error fetching limits from Supabase for user {user_id}: {e}")
 
     try:
-        # 2. Fetch all summary expense data for the user in one query
+        # 2. Fetch all summary expense data for the user (read-through cache, one query on a miss)
         # We map the old "sum" fields to your new schema's "_out" fields
-        sum_res = db.table('summary').select('day_out', 'week_out', 'month_out', 'year_out') \
-            .eq('user_id', user_id).maybe_single().execute()
-        if sum_res.data:
-            sum_data = sum_res.data
+        sum_data = table_cache.get_row('summary', user_id)
 
     except Exception as e:
         print(f"Error fetching sums from Supabase for user {user_id}: {e}")
@@ -0,0 +1,141 @@
+import re
+from typing import NamedTuple, Optional
+
+# --- 1. CURRENCIES ---
+DEFAULT_CURRENCY = "INR"
+CURRENCY_ALIASES = {
+    "₹": "INR", "rs": "INR", "rs.": "INR", "inr": "INR",
+    "$": "USD", "us$": "USD", "usd": "USD",
+    "€": "EUR", "eur": "EUR",
+    "£": "GBP", "gbp": "GBP",
+    "aed": "AED", "sgd": "SGD", "cad": "CAD", "aud": "AUD", "jpy": "JPY", "¥": "JPY", "chf": "CHF",
+}
+
+# Words that decide how a nearby number is read
+AMOUNT_CUES = {"by", "of", "for", "amt", "amount"}          # Bare numbers after these are amounts
+BALANCE_CUES = {"bal", "balance", "avl", "avbl", "lmt", "limit"}  # Amounts after these are not the transaction
+DIRECTIONS = {"cr": "credit", "dr": "debit"}
+
+# --- 2. SINGLE-PASS TOKENIZER ---
+# One scan that only stops at currency markers, numbers and the few cue words above;
+# everything else is skipped by the regex engine itself.
+_CODES = "|".join(sorted((re.escape(code) for code in CURRENCY_ALIASES if len(code) > 1), key=len, reverse=True))
+_SYMBOLS = "".join(re.escape(code) for code in CURRENCY_ALIASES if len(code) == 1)
+_CUES = "|".join(sorted(AMOUNT_CUES | BALANCE_CUES | set(DIRECTIONS), key=len, reverse=True))
+TOKEN_PATTERN = re.compile(
+    rf"(?P<cur>[{_SYMBOLS}]|(?<![A-Za-z])(?:{_CODES})(?![A-Za-z]))"
+    r"|(?P<num>(?<![A-Za-z\d,])\d[\d,]*(?:\.\d+)?)"
+    rf"|(?P<cue>\b(?:{_CUES})\b)",
+    re.IGNORECASE,
+)
+
+
+class Amount(NamedTuple):
+    value: float
+    currency: Optional[str]      # None when the message did not say
+    direction: Optional[str]     # 'credit' / 'debit' from a Cr/Dr suffix
+    is_balance: bool             # Available balance / limit rather than the transaction itself
+    start: int                   # Span covering the currency marker and the number
+    end: int
+
+
+def tokenize(text: str):
+    """Yields (kind, value, start, end) for every currency marker, number and cue word."""
+    for match in TOKEN_PATTERN.finditer(text):
+        kind = match.lastgroup
+        yield kind, match.group(kind).lower() if kind != "num" else match.group(kind), match.start(), match.end()
+
+
+def _parse_number(raw: str):
+    """'1,02,345.50' (lakh grouping) and '102,345.50' both give 102345.5."""
+    try:
+        return float(raw.replace(",", ""))
+    except ValueError:
+        return None
+
+
+def _adjacent(text, end, start, allowed=" \t\n."):
+    return all(ch in allowed for ch in text[end:start])
+
+
+def iter_amounts(text: str):
+    """
+    Yields every amount in the message in order. A number counts as an amount when a
+    currency marker sits right before or after it, or when it follows a cue like 'by'.
+    Tokens are pulled lazily, so stopping at the first amount skips the rest of the scan.
+    """
+    text = text or ""
+    stream = tokenize(text)
+    tokens = []
+
+    def token_at(index):
+        while len(tokens) <= index:
+            token = next(stream, None)
+            if token is None:
+                return None
+            tokens.append(token)
+        return tokens[index] if index >= 0 else None
+
+    i = 0
+    while (token := token_at(i)) is not None:
+        kind, raw, start, end = token
+        i += 1
+        if kind != "num":
+            continue
+        value = _parse_number(raw)
+        if value is None:
+            continue
+        prev, nxt = token_at(i - 2), token_at(i)
+
+        currency, span_start, span_end, following = None, start, end, i
+        if prev and prev[0] == "cur" and _adjacent(text, prev[3], start):
+            currency, span_start = CURRENCY_ALIASES[prev[1]], prev[2]
+        elif nxt and nxt[0] == "cur" and _adjacent(text, end, nxt[2], " \t"):
+            currency, span_end, following = CURRENCY_ALIASES[nxt[1]], nxt[3], i + 1
+        elif not (prev and prev[0] == "cue" and prev[1] in AMOUNT_CUES and _adjacent(text, prev[3], start, " \t")):
+            continue  # Account numbers, dates, references...
+
+        direction = None
+        suffix = token_at(following)
+        if suffix and suffix[0] == "cue" and suffix[1] in DIRECTIONS and _adjacent(text, span_end, suffix[2], " \t"):
+            direction = DIRECTIONS[suffix[1]]
+
+        # A balance cue among the two tokens before the currency marker
+        before = [token for token in tokens[max(0, i - 4):i - 1] if token[2] < span_start]
+        is_balance = any(token[0] == "cue" and token[1] in BALANCE_CUES for token in before[-2:]) \
+            and span_start - before[-1][3] < 15
+        yield Amount(value, currency, direction, is_balance, span_start, span_end)
+
+
+def extract_amounts(text: str):
+    return list(iter_amounts(text))
+
+
+def find_transaction_amount(text: str):
+    """The first amount that is not a balance or limit, or None."""
+    return next((amount for amount in iter_amounts(text) if not amount.is_balance), None)
+
+
+def mask_amount(text: str, placeholder: str = "<AMT>"):
+    """
+    Replaces the transaction amount with 'placeholder' so patterns can match the
+    message shape without knowing currencies or number formats.
+    Returns (masked_text, Amount) or (text, None).
+    """
+    amount = find_transaction_amount(text)
+    if amount is None:
+        return text, None
+    return text[:amount.start] + placeholder + text[amount.end:], amount
+
+
+def strip_amounts(text: str):
+    """Removes amounts along with their currency markers, e.g. from vendor names captured too greedily."""
+    spans = [(amount.start, amount.end) for amount in extract_amounts(text or "")]
+    if not spans:
+        return text or ""
+    parts, last = [], 0
+    for start, end in spans:
+        parts.append(text[last:start])
+        last = end
+    parts.append(text[last:])
+    return " ".join("".join(parts).split())
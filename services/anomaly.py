@@ -1,28 +1,32 @@
 import os
-import numpy as np
 from collections import defaultdict
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from dateutil.parser import parse as parse_datetime
+from core.timestamps import parse_datetime
 from core.setup import initialize_supabase
+from services.transaction_archive import transaction_archive, use_archive
 
 # --- 2. Data Fetching ---
 
-def fetch_transactions(db: Client):
+def fetch_transactions(db, source=None):
     """
     Fetches all documents from the 'transaction' table.
 
     Args:
         db: The initialized Supabase client.
+        source: "archive" reads the Parquet archive instead of the API
+            (defaults to BATCH_TRANSACTION_SOURCE, see services/transaction_archive.py).
 
     Returns:
         list: A list of transaction dictionaries, or an empty list if an error occurs or table is empty.
     """
     try:
-        # Select all columns from the 'transaction' table
-        response = db.table('transaction').select('*').execute()
-
-        transactions = response.data
+        if use_archive(source):
+            # Columnar, memory-mapped scan instead of every row as JSON through PostgREST
+            transactions = transaction_archive.read_transactions()
+        else:
+            # Select all columns from the 'transaction' table
+            response = db.table('transaction').select('*').execute()
+            transactions = response.data
 
         if not transactions:
             print("⚠️ Warning: No documents found in 'transaction' table.")
@@ -63,6 +67,8 @@ def detect_amount_anomalies_by_category(transactions):
         category = tx.get('category', 'Uncategorized')
         categorized_transactions[category].append(tx)
 
+    import numpy as np  # Deferred to the first analysis to keep app startup fast
+
     anomaly_ids = set()
 
     # Perform IQR analysis on each category
@@ -121,7 +127,7 @@ def detect_time_anomalies(transactions):
     return anomaly_ids
 
 
-def main():
+def main(source=None):
     """
     Main function to run the anomaly detection process.
     """
@@ -133,7 +139,7 @@ def main():
         print("\n--- Halting execution due to Supabase connection error. ---")
         return
 
-    transactions = fetch_transactions(db)
+    transactions = fetch_transactions(db, source)
 
     if not transactions:
         print("\n--- Halting execution as there are no transactions to analyze. ---")
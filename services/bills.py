@@ -0,0 +1,237 @@
+import os
+import time
+import bisect
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+from core.setup import initialize_supabase
+from core.timestamps import parse_datetime
+from services.recurring_detector import detect_recurring
+from services.transaction_archive import transaction_archive, use_archive
+
+# --- 1. SUPABASE INITIALIZATION ---
+db = initialize_supabase()
+
+BILL_REMINDER_LEAD_DAYS = int(os.getenv("BILL_REMINDER_LEAD_DAYS", "2"))  # Remind this many days before the due date
+BILL_REMINDER_ACK_SECONDS = int(os.getenv("BILL_REMINDER_ACK_SECONDS", "900"))  # Unacked claims are handed out again after this
+BILL_OVERDUE_DAYS = 7  # Bills this late are kept as overdue; later than that they were probably cancelled
+# Detection scans a user's whole history, so the per-user calendar is kept per worker process
+# and refreshed periodically; intake marks a user for a refresh when they pay something.
+BILLS_TTL_SECONDS = 6 * 60 * 60
+STORE_BATCH_SIZE = 500
+USER_PAGE_SIZE = 1000  # PostgREST's default max rows per request
+
+
+def _project(recurring, today):
+    """A detect_recurring entry -> bill dict, or None if it looks cancelled."""
+    due = date.fromisoformat(recurring["next_due"])
+    if due < today - timedelta(days=BILL_OVERDUE_DAYS):
+        return None
+    return {
+        "recipient": recurring["recipient"],
+        "amount": recurring["amount"],
+        "frequency": recurring["frequency"],
+        "last_paid": recurring["last_paid"],
+        "due_date": due,
+        "remind_on": max(due - timedelta(days=BILL_REMINDER_LEAD_DAYS), today),
+    }
+
+
+def _public(user, bill, today):
+    return {
+        "user_id": user,
+        "recipient": bill["recipient"],
+        "amount": bill["amount"],
+        "frequency": bill["frequency"],
+        "last_paid": bill["last_paid"],
+        "due_date": bill["due_date"].isoformat(),
+        "days_left": (bill["due_date"] - today).days,
+        "overdue": bill["due_date"] < today,
+    }
+
+
+def user_bills(user_id, source='api'):
+    """The user's current bills (one per detected subscription that is not cancelled)."""
+    today = date.today()
+    bills = (_project(recurring, today) for recurring in detect_recurring(user_id, source=source))
+    return [bill for bill in bills if bill is not None]
+
+
+# --- 2. PER-USER CALENDAR ---
+class BillCalendar:
+    """
+    Upcoming bills of the users served by this process, kept sorted by due date per
+    user, so "due in the next N days" is a bisect (O(log n + k)). A user's bills are
+    loaded on first use and reloaded after BILLS_TTL_SECONDS or once intake marks
+    them stale.
+    """
+
+    def __init__(self):
+        self._bills = {}  # user_id -> {recipient: bill}
+        self._by_due = {}  # user_id -> sorted [(due_date, recipient)]
+        self._loaded_at = {}
+        self._stale = set()
+        self._lock = threading.Lock()
+
+    def _load(self, user):
+        bills = {bill["recipient"]: bill for bill in user_bills(user)}
+        with self._lock:
+            self._bills[user] = bills
+            self._by_due[user] = sorted((bill["due_date"], name) for name, bill in bills.items())
+            self._loaded_at[user] = time.monotonic()
+            self._stale.discard(user)
+
+    def _ensure_loaded(self, user):
+        loaded_at = self._loaded_at.get(user)
+        if loaded_at is None or user in self._stale or time.monotonic() - loaded_at > BILLS_TTL_SECONDS:
+            self._load(user)
+
+    def bills_due(self, user_id, days=30):
+        """Bills due in the next 'days' days (plus recently overdue ones), soonest first."""
+        user = str(user_id)
+        self._ensure_loaded(user)
+        today = date.today()
+        with self._lock:
+            index = self._by_due.get(user, [])
+            first = bisect.bisect_left(index, (today - timedelta(days=BILL_OVERDUE_DAYS),))
+            last = bisect.bisect_right(index, (today + timedelta(days=days), "\U0010ffff"))
+            bills = self._bills[user]
+            return [_public(user, bills[name], today) for _, name in index[first:last]]
+
+    def mark_stale(self, user_id):
+        """Intake hook: the user paid something, so their next due dates may have moved."""
+        user = str(user_id)
+        with self._lock:
+            if user in self._bills:
+                self._stale.add(user)
+
+
+# Shared instance used by the bills router and intake
+bill_calendar = BillCalendar()
+
+
+# --- 3. REMINDERS ---
+# Reminders live in the 'bill_reminder' table, indexed by reminder date, so every worker
+# (and the notifier) sees one store: scripts/schedule_bill_reminders.py fills it for all
+# users in a batch. POST /admin/bills/reminders claims the due rows with one conditional
+# UPDATE, so concurrent callers never get the same reminder, and the notifier acks the ones
+# it delivered. A claim that is not acked within BILL_REMINDER_ACK_SECONDS is handed out
+# again, so delivery is at-least-once: a notifier that dies mid-batch loses nothing.
+def _all_users(source=None):
+    """Every user with transactions: from the archive's user_id column, or a keyset scan of user_ids in pages."""
+    if use_archive(source):
+        import pyarrow.compute as pc
+        return sorted(pc.unique(transaction_archive.read_table(columns=["user_id"]).column("user_id")).to_pylist())
+    users, last = [], ""
+    while True:
+        # PostgREST has no SELECT DISTINCT: read a page of the user_id index, keep its distinct
+        # values, and continue after the page's last user (skipping the rest of their rows)
+        response = db.table('transaction').select('user_id').gt('user_id', last) \
+            .order('user_id').limit(USER_PAGE_SIZE).execute()
+        if not response.data:
+            return users
+        for row in response.data:
+            user = str(row['user_id'])
+            if user != last:
+                users.append(user)
+                last = user
+
+
+def schedule_reminders(source=None):
+    """
+    Batch job: detects every user's bills and upserts one reminder per (user, recipient,
+    due date). Unsent reminders whose bill moved (paid early) or disappeared are deleted;
+    sent ones are kept until their due date is long past, so they are never sent again.
+    source=None follows BATCH_TRANSACTION_SOURCE. Returns run statistics.
+    """
+    started = time.perf_counter()
+    today = date.today()
+    users = _all_users(source)
+    rows, failed = [], 0
+    for user in users:
+        try:
+            bills = user_bills(user, source=source)
+        except Exception as e:
+            print(f"❌ Bills: could not load user {user}: {e}")
+            failed += 1
+            continue
+        current = {(bill["recipient"], bill["due_date"].isoformat()) for bill in bills}
+        pending = db.table('bill_reminder').select('id, recipient, due_date') \
+            .eq('user_id', user).is_('sent_at', 'null').execute().data or []
+        outdated = [row['id'] for row in pending if (row['recipient'], row['due_date']) not in current]
+        if outdated:
+            db.table('bill_reminder').delete().in_('id', outdated).execute()
+        rows += [{"user_id": user, "recipient": bill["recipient"], "amount": bill["amount"],
+                  "frequency": bill["frequency"], "last_paid": bill["last_paid"],
+                  "due_date": bill["due_date"].isoformat(), "remind_on": bill["remind_on"].isoformat()}
+                 for bill in bills]
+    for i in range(0, len(rows), STORE_BATCH_SIZE):
+        # sent_at is not in the payload, so reminders already sent stay sent
+        db.table('bill_reminder').upsert(rows[i:i + STORE_BATCH_SIZE], on_conflict='user_id,recipient,due_date').execute()
+    cutoff = (today - timedelta(days=BILL_OVERDUE_DAYS)).isoformat()
+    db.table('bill_reminder').delete().lt('due_date', cutoff).execute()
+    print(f"✅ Bills: {len(rows)} reminders scheduled for {len(users)} users")
+    return {"users": len(users), "failed": failed, "reminders": len(rows),
+            "seconds": round(time.perf_counter() - started, 2)}
+
+
+def _last_payments(user, reminders):
+    """{recipient: local date of the latest payment} for payments made after the reminders' last_paid."""
+    first = min(date.fromisoformat(row['last_paid']) for row in reminders) + timedelta(days=1)
+    response = db.table('transaction').select('sender_name, created_at') \
+        .eq('user_id', user).eq('payment_type', 'expense') \
+        .in_('sender_name', sorted({row['recipient'] for row in reminders})) \
+        .gte('created_at', datetime.combine(first, datetime.min.time()).astimezone().isoformat()) \
+        .execute()
+    latest = {}
+    for row in response.data or []:
+        paid_at = parse_datetime(row['created_at'])
+        paid_on = (paid_at if paid_at.tzinfo else paid_at.astimezone()).astimezone().date()
+        latest[row['sender_name']] = max(paid_on, latest.get(row['sender_name'], paid_on))
+    return latest
+
+
+def claim_due_reminders(today=None):
+    """
+    Claims every unsent reminder due by 'today' and returns the ones the notifier should
+    deliver, each with its reminder_id. The claim is a single conditional UPDATE, so
+    concurrent callers never get the same reminder; rows stay unsent until ack_reminders()
+    and are claimed again once their claim is BILL_REMINDER_ACK_SECONDS old. Reminders for
+    bills paid since they were scheduled are deleted instead of returned.
+    """
+    today = today or date.today()
+    now = datetime.now(timezone.utc)
+    expired = (now - timedelta(seconds=BILL_REMINDER_ACK_SECONDS)).isoformat()
+    claimed = db.table('bill_reminder').update({'claimed_at': now.isoformat()}) \
+        .lte('remind_on', today.isoformat()).is_('sent_at', 'null') \
+        .or_(f'claimed_at.is.null,claimed_at.lt."{expired}"').execute().data or []
+    by_user = {}
+    for row in claimed:
+        by_user.setdefault(str(row['user_id']), []).append(row)
+    due, paid = [], []
+    for user, reminders in by_user.items():
+        latest = _last_payments(user, reminders)
+        for row in reminders:
+            if row['recipient'] in latest and latest[row['recipient']] > date.fromisoformat(row['last_paid']):
+                paid.append(row['id'])  # Paid early, after the reminder was scheduled
+                continue
+            bill = {**row, "due_date": date.fromisoformat(row['due_date'])}
+            due.append({"reminder_id": row['id'], **_public(user, bill, today)})
+    if paid:
+        db.table('bill_reminder').delete().in_('id', paid).execute()
+    if claimed:
+        print(f"🔔 Bills: {len(due)} reminders claimed ({len(claimed) - len(due)} already paid)")
+    due.sort(key=lambda bill: (bill["due_date"], bill["user_id"]))
+    return due
+
+
+def ack_reminders(reminder_ids):
+    """Marks delivered reminders sent, so they are never claimed again. Returns how many were newly marked."""
+    ids = sorted({int(reminder_id) for reminder_id in reminder_ids})
+    if not ids:
+        return 0
+    acked = db.table('bill_reminder').update({'sent_at': datetime.now(timezone.utc).isoformat()}) \
+        .in_('id', ids).is_('sent_at', 'null').execute().data or []
+    if len(acked) < len(ids):
+        print(f"⚠️ Bills: {len(ids) - len(acked)} acked reminders were unknown or already sent")
+    return len(acked)
@@ -0,0 +1,214 @@
+import os
+import re
+import json
+import math
+
+from services.amount_tokenizer import strip_amounts
+
+# --- 1. CONFIGURATION ---
+MODEL_PATH = os.getenv(
+    "CATEGORY_MODEL_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "category_model.json"))
+# Below this confidence the caller should ask the LLM for a category instead
+MIN_CONFIDENCE = float(os.getenv("CATEGORY_MIN_CONFIDENCE", "0.6"))
+UNCATEGORIZED = "Uncategorized"
+
+# --- 2. VENDOR DICTIONARY ---
+# Normalized vendor name (or name prefix) -> category. Longer prefixes win,
+# so "swiggy instamart" is Groceries while any other "swiggy ..." is Food.
+VENDOR_CATEGORIES = {
+    # Food
+    "swiggy": "Food", "zomato": "Food", "dominos": "Food", "mcdonalds": "Food", "kfc": "Food",
+    "pizza hut": "Food", "burger king": "Food", "starbucks": "Food", "cafe coffee day": "Food",
+    "haldirams": "Food", "subway": "Food", "chaayos": "Food", "eatsure": "Food", "faasos": "Food",
+    # Groceries
+    "bigbasket": "Groceries", "blinkit": "Groceries", "zepto": "Groceries", "swiggy instamart": "Groceries",
+    "dmart": "Groceries", "avenue supermarts": "Groceries", "jiomart": "Groceries", "more retail": "Groceries",
+    "reliance fresh": "Groceries", "reliance smart": "Groceries", "spencers": "Groceries", "nature s basket": "Groceries",
+    "amazon fresh": "Groceries", "flipkart minutes": "Groceries",
+    # Travel
+    "uber": "Travel", "ola": "Travel", "ola cabs": "Travel", "rapido": "Travel", "irctc": "Travel",
+    "makemytrip": "Travel", "goibibo": "Travel", "redbus": "Travel", "indigo": "Travel", "air india": "Travel",
+    "vistara": "Travel", "akasa air": "Travel", "cleartrip": "Travel", "yatra": "Travel", "indian oil": "Travel",
+    "iocl": "Travel", "bharat petroleum": "Travel", "bpcl": "Travel", "hpcl": "Travel", "hindustan petroleum": "Travel",
+    "shell": "Travel", "fastag": "Travel", "metro rail": "Travel", "delhi metro": "Travel", "namma metro": "Travel",
+    # Shopping
+    "amazon": "Shopping", "amazon pay": "Shopping", "flipkart": "Shopping", "myntra": "Shopping", "ajio": "Shopping",
+    "nykaa": "Shopping", "meesho": "Shopping", "tata cliq": "Shopping", "croma": "Shopping", "reliance digital": "Shopping",
+    "decathlon": "Shopping", "ikea": "Shopping", "lenskart": "Shopping", "h m": "Shopping", "zara": "Shopping",
+    "westside": "Shopping", "pantaloons": "Shopping", "shoppers stop": "Shopping", "lifestyle": "Shopping",
+    # Entertainment
+    "netflix": "Entertainment", "spotify": "Entertainment", "hotstar": "Entertainment", "disney hotstar": "Entertainment",
+    "bookmyshow": "Entertainment", "pvr": "Entertainment", "inox": "Entertainment", "youtube premium": "Entertainment",
+    "sonyliv": "Entertainment", "zee5": "Entertainment", "jiocinema": "Entertainment", "prime video": "Entertainment",
+    "apple media services": "Entertainment", "steam": "Entertainment", "playstation": "Entertainment",
+    # Bills
+    "airtel": "Bills", "jio": "Bills", "reliance jio": "Bills", "vodafone idea": "Bills", "bsnl": "Bills",
+    "tata power": "Bills", "adani electricity": "Bills", "bescom": "Bills", "msedcl": "Bills", "bses": "Bills",
+    "tata play": "Bills", "act fibernet": "Bills", "hathway": "Bills", "mahanagar gas": "Bills", "indane": "Bills",
+    "bharat gas": "Bills", "google one": "Bills", "icloud": "Bills", "lic": "Bills",
+    # Health
+    "apollo pharmacy": "Health", "apollo": "Health", "pharmeasy": "Health", "netmeds": "Health", "1mg": "Health",
+    "tata 1mg": "Health", "medplus": "Health", "practo": "Health", "cult fit": "Health", "cultfit": "Health",
+    "fortis": "Health", "max healthcare": "Health", "manipal hospitals": "Health",
+    # Rent
+    "nobroker": "Rent", "nestaway": "Rent", "housing com": "Rent", "zolo": "Rent", "stanza living": "Rent",
+    # Education
+    "byjus": "Education", "unacademy": "Education", "coursera": "Education", "udemy": "Education",
+    "vedantu": "Education", "upgrad": "Education", "physics wallah": "Education",
+    # Investment
+    "zerodha": "Investment", "groww": "Investment", "upstox": "Investment", "kuvera": "Investment",
+    "coin by zerodha": "Investment", "indian clearing corporation": "Investment", "nps trust": "Investment",
+    "angel one": "Investment", "paytm money": "Investment",
+}
+
+# Words that say nothing about the vendor (legal suffixes, payment handles)
+STOPWORDS = {"pvt", "private", "ltd", "limited", "llp", "inc", "india", "in", "the", "co", "technologies",
+             "services", "retail", "online", "payments", "upi", "paytm", "ybl", "okaxis", "oksbi", "okhdfcbank",
+             "okicici", "axl", "ibl", "apl"}
+
+
+def normalize_vendor(name: str):
+    """Lower-cases, strips amounts, UPI handles and punctuation, and drops legal suffixes."""
+    text = strip_amounts(name or "").lower()
+    text = re.sub(r"@\w+", " ", text)             # "swiggy@ybl" -> "swiggy"
+    text = re.sub(r"[^a-z0-9]+", " ", text)
+    words = [word for word in text.split() if word not in STOPWORDS]
+    return " ".join(words)
+
+
+# --- 3. PREFIX TRIE ---
+class VendorTrie:
+    """Word-level trie over normalized vendor names; returns the longest known prefix."""
+
+    def __init__(self, entries=None):
+        self.root = {}
+        for name, category in (entries or {}).items():
+            self.add(name, category)
+
+    def add(self, name, category):
+        node = self.root
+        for word in normalize_vendor(name).split():
+            node = node.setdefault(word, {})
+        node[None] = category
+
+    def longest_prefix(self, normalized: str):
+        """Returns (category, matched_word_count) for the longest matching prefix, or (None, 0)."""
+        node, best, depth = self.root, (None, 0), 0
+        for word in normalized.split():
+            node = node.get(word)
+            if node is None:
+                break
+            depth += 1
+            if None in node:
+                best = (node[None], depth)
+        return best
+
+
+# --- 4. LOCAL TEXT CLASSIFIER ---
+def extract_features(text: str):
+    """Word unigrams plus character trigrams; shared with the offline training script."""
+    features = []
+    for word in normalize_vendor(text).split():
+        features.append(f"w:{word}")
+        padded = f"<{word}>"
+        features.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return features
+
+
+class CategoryModel:
+    """
+    TF-IDF + multinomial logistic regression, trained offline by
+    scripts/train_categorizer.py and shipped as a JSON file of weights.
+    """
+
+    def __init__(self, classes, idf, weights, bias):
+        self.classes = classes
+        self.idf = idf
+        self.weights = weights
+        self.bias = bias
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["classes"], data["idf"], data["weights"], data["bias"])
+
+    def predict(self, text: str):
+        """Returns (category, probability) for the most likely class."""
+        counts = {}
+        for feature in extract_features(text):
+            if feature in self.idf:
+                counts[feature] = counts.get(feature, 0) + 1
+        if not counts:
+            return UNCATEGORIZED, 0.0
+        vector = {feature: count * self.idf[feature] for feature, count in counts.items()}
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+
+        scores = list(self.bias)
+        for feature, value in vector.items():
+            weights = self.weights.get(feature)
+            if weights:
+                value /= norm
+                for i, weight in enumerate(weights):
+                    scores[i] += weight * value
+        top = max(scores)
+        exps = [math.exp(score - top) for score in scores]
+        best = scores.index(top)
+        return self.classes[best], exps[best] / sum(exps)
+
+
+# --- 5. CATEGORIZER ---
+class Categorizer:
+    """
+    Two-tier categorizer: exact and prefix vendor lookups first, then the local
+    classifier. Returns (category, confidence) where confidence is in [0, 1].
+    A prefix hit is only as confident as the share of the name it covers, so a
+    brand word followed by other words ("Uber Eats", "Apollo Tyres") is left to
+    the LLM unless the classifier reads the rest of the name the same way.
+    """
+
+    def __init__(self, vendors=VENDOR_CATEGORIES, model=None):
+        self.exact = {normalize_vendor(name): category for name, category in vendors.items()}
+        self.trie = VendorTrie(vendors)
+        self.model = model
+
+    def categorize(self, vendor: str):
+        normalized = normalize_vendor(vendor)
+        if normalized in self.exact:
+            return self.exact[normalized], 1.0
+        category, matched = self.trie.longest_prefix(normalized)
+        if category:
+            # Store and order numbers ("Swiggy 558812") don't make a name ambiguous
+            words = [word for word in normalized.split() if not word.isdigit()]
+            confidence = 0.95 * matched / max(len(words), matched)
+            if confidence >= MIN_CONFIDENCE or self.model is None:
+                return category, confidence
+            # The classifier knows the brand word too, so only the rest of the name
+            # is fresh evidence: "uber trip" is Travel, "uber eats" is left to the LLM
+            predicted, probability = self.model.predict(" ".join(normalized.split()[matched:]))
+            if predicted == category:
+                return category, max(confidence, probability)
+            return category, confidence
+        if self.model is not None:
+            return self.model.predict(vendor or "")
+        return UNCATEGORIZED, 0.0
+
+
+def _load_default():
+    model = None
+    try:
+        model = CategoryModel.load()
+    except FileNotFoundError:
+        print(f"Category model not found at {MODEL_PATH}; using the vendor dictionary only.")
+    except (ValueError, KeyError) as e:
+        print(f"Error loading category model: {e}")
+    return Categorizer(model=model)
+
+
+# Shared instance used by the parsing engine
+categorizer = _load_default()
+
+
+def categorize(vendor: str):
+    return categorizer.categorize(vendor)
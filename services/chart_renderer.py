@@ -0,0 +1,71 @@
+import io
+
+# Chart drawing for services/charts.py. This module runs inside the chart process pool,
+# so it imports nothing from the app: each worker loads matplotlib (Agg backend, no
+# display) once and then only turns plain data into image bytes.
+
+FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+FIGURE_SIZE = (6, 4)  # Inches; at 100 dpi a 600x400 PNG, readable on small phone screens
+DPI = 100
+PALETTE = "deep"
+
+
+def warm_up():
+    """Pool initializer: imports the plotting stack before the first job arrives."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+    import seaborn as sns
+    sns.set_theme(style="whitegrid", palette=PALETTE)
+
+
+def _category_pie(ax, data):
+    import seaborn as sns
+    labels = [item["label"] for item in data["slices"]]
+    values = [item["amount"] for item in data["slices"]]
+    ax.pie(values, labels=labels, autopct="%1.0f%%", startangle=90, counterclock=False,
+           colors=sns.color_palette(PALETTE, len(values)), wedgeprops={"linewidth": 1, "edgecolor": "white"})
+    ax.axis("equal")
+
+
+def _trend_line(ax, data):
+    labels = [point["label"] for point in data["points"]]
+    values = [point["amount"] for point in data["points"]]
+    ax.plot(labels, values, marker="o", linewidth=2, label="Spent")
+    forecast = data.get("forecast")
+    if forecast:
+        # Dashed segment from the last actual point to the predicted one
+        ax.plot([labels[-1], forecast["label"]], [values[-1], forecast["amount"]], linestyle="--", marker="o",
+                linewidth=2, label="Predicted")
+        ax.legend(loc="upper left")
+    ax.set_ylabel("Amount (₹)")
+    ax.set_ylim(bottom=0)
+    ax.tick_params(axis="x", labelrotation=45)
+
+
+DRAWERS = {"pie": _category_pie, "line": _trend_line}
+
+
+def render(data, fmt):
+    """Draws one chart ({'kind', 'title', ...} from services/charts.py) and returns PNG or SVG bytes."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    # Same data, same bytes: the ETag is a hash of the image, so SVG ids must not be random
+    matplotlib.rcParams["svg.hashsalt"] = "charts"
+
+    fig, ax = plt.subplots(figsize=FIGURE_SIZE, dpi=DPI)
+    try:
+        if data.get("empty"):
+            ax.text(0.5, 0.5, "No spending yet", ha="center", va="center", fontsize=14)
+            ax.axis("off")
+        else:
+            DRAWERS[data["kind"]](ax, data)
+        ax.set_title(data["title"])
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        # No creation date in the file, for the same reason
+        fig.savefig(buffer, format=fmt, dpi=DPI, metadata={"Date": None} if fmt == "svg" else None)
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)  # Figures are kept alive by pyplot until closed
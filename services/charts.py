@@ -0,0 +1,149 @@
+import os
+import asyncio
+import hashlib
+import threading
+import multiprocessing
+from datetime import date, datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi.concurrency import run_in_threadpool
+
+from core.cache import LRUBackend
+from core.data_version import get_data_version
+from core.metrics import stage_timer
+from services.chart_renderer import FORMATS, render, warm_up
+from services.prediction import get_daily_spending_trend, get_monthly_spending_trend, get_spending_prediction
+from services.spending_cube import spending_cube
+
+# Server-rendered charts for clients that cannot draw them from raw data. The data is
+# gathered in the web process; drawing happens in a pool of worker processes so a
+# render never holds the GIL of the process serving requests. Rendered images are
+# cached by (user, chart, format, data version, day): any write to the user's data bumps
+# the version, and trend charts roll over at midnight. The ETag is a hash of the image
+# itself, since the data version is per process and does not see other workers' writes.
+
+# --- 1. CONFIGURATION ---
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "2"))
+CHART_CACHE_TTL_SECONDS = int(os.getenv("CHART_CACHE_TTL_SECONDS", "600"))  # Bounds drift from other workers' writes
+CHART_CACHE_MAX_ENTRIES = int(os.getenv("CHART_CACHE_MAX_ENTRIES", "512"))
+PIE_SLICES = 5  # Larger categories get a slice each, the rest is "Other"
+PIE_DAYS = 30
+
+
+# --- 2. CHART DATA ---
+def _category_pie(user_id):
+    end = date.today()
+    categories = spending_cube.top_categories(user_id, end - timedelta(days=PIE_DAYS - 1), end, limit=50)
+    slices = [{"label": item["category"], "amount": item["amount"]} for item in categories[:PIE_SLICES]]
+    other = sum(item["amount"] for item in categories[PIE_SLICES:])
+    if other > 0:
+        slices.append({"label": "Other", "amount": round(other, 2)})
+    return {"kind": "pie", "title": f"Spending by category, last {PIE_DAYS} days", "slices": slices,
+            "empty": not slices}
+
+
+def _daily_trend(user_id):
+    trend = get_daily_spending_trend(user_id)
+    if "message" in trend:
+        raise RuntimeError(trend["message"])
+    points = [{"label": datetime.strptime(day, "%Y-%m-%d").strftime("%a %d"), "amount": amount}
+              for day, amount in sorted(trend["daily_spending_trend"].items())]
+    return {"kind": "line", "title": "Daily spending, last 7 days", "points": points,
+            "empty": not any(point["amount"] for point in points)}
+
+
+def _monthly_trend(user_id):
+    trend = get_monthly_spending_trend(user_id)
+    if "message" in trend:
+        raise RuntimeError(trend["message"])
+    points = [{"label": month, "amount": amount} for month, amount in sorted(trend["monthly_spending_trend"].items())]
+    data = {"kind": "line", "title": "Monthly spending", "points": points,
+            "empty": not any(point["amount"] for point in points)}
+    prediction = get_spending_prediction(user_id, "monthly")
+    if "predicted_expense" in prediction:  # Users with too little history just get no forecast
+        next_month = (date.today().replace(day=28) + timedelta(days=4)).strftime("%Y-%m")
+        data["forecast"] = {"label": next_month, "amount": prediction["predicted_expense"]}
+    return data
+
+
+CHARTS = {
+    "categories": _category_pie,
+    "daily_trend": _daily_trend,
+    "monthly_trend": _monthly_trend,
+}
+
+
+# --- 3. RENDER POOL & CACHE ---
+class ChartService:
+    """
+    Renders charts in a process pool (started on first use) and caches the images.
+    Workers are spawned rather than forked, so they do not inherit the app's threads.
+    """
+
+    def __init__(self, workers=CHART_WORKERS):
+        self.workers = workers
+        self.cache = LRUBackend(max_entries=CHART_CACHE_MAX_ENTRIES)
+        self._pool = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _reset_pool(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _render(self, data, fmt):
+        for attempt in range(2):
+            pool = self._get_pool()
+            try:
+                return await asyncio.wrap_future(pool.submit(render, data, fmt))
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool and retry once
+                print("❌ Chart render pool broke, restarting it")
+                self._reset_pool(pool)
+                if attempt:
+                    raise
+
+    @staticmethod
+    def cache_key(user_id, chart, fmt):
+        return f"{user_id}:{chart}:{fmt}:{get_data_version(user_id)}:{date.today().isoformat()}"
+
+    async def get_chart(self, user_id, chart, fmt="png"):
+        """Returns (image bytes, etag). Raises ValueError for an unknown chart or format."""
+        if chart not in CHARTS:
+            raise ValueError(f"Unknown chart '{chart}'. Use {', '.join(CHARTS)}.")
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format '{fmt}'. Use {', '.join(FORMATS)}.")
+        key = self.cache_key(str(user_id), chart, fmt)
+        found, cached = self.cache.get(key)
+        if found:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        data = await run_in_threadpool(CHARTS[chart], user_id)
+        with stage_timer("render", chart, format=fmt):
+            image = await self._render(data, fmt)
+        etag = '"' + hashlib.sha1(image).hexdigest()[:16] + '"'
+        self.cache.set(key, (image, etag), CHART_CACHE_TTL_SECONDS)
+        return image, etag
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Shared instance used by the charts router; the app lifespan shuts its pool down
+chart_service = ChartService()
@@ -1,16 +1,46 @@
 import os
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from core.setup import initialize_supabase
+from core.llm import chat_model
+from core.cache import table_cache
+from core.tracing import traced
+from services.financial_context import get_financial_context_text
+from services.response_cache import response_cache
+from services.intent_router import route_intent
 # --- 1. Supabase Initialization ---
 # This replaces the get_firestore_client() service
 load_dotenv()
-db = initialize_supabase
+db = initialize_supabase()
 
 
+def _fetch_chat_history(user_id: str):
+    """Fetches the stored list of {role, content} messages for a user."""
+    # This replaces the Firebase get() logic
+    try:
+        row = table_cache.get_row("chat_history", user_id)
+        # 'chat_history' is the JSON column in your Supabase schema; copy it so callers can append safely
+        return list(row.get("chat_history") or [])
+    except Exception as e:
+        print(f"Error fetching chat history from Supabase: {e}")
+        return []
+
+
+def _save_chat_history(user_id: str, messages_to_save: list):
+    """Saves the last 20 messages (10 pairs) for a user."""
+    # This replaces the Firebase set() logic
+    try:
+        # Use upsert to create or update the record for this user_id
+        db.table("chat_history").upsert({
+            "user_id": user_id,
+            "chat_history": messages_to_save[-20:]  # Store the list in the 'chat_history' JSON column
+        }).execute()
+        table_cache.invalidate("chat_history", user_id)
+    except Exception as e:
+        print(f"Error saving chat history to Supabase: {e}")
+        # Note: We still return the response even if saving fails
+
 
+@traced()
 def get_chatbot_response(user_id: str, message: str):
     """
     Handles the chatbot conversation logic using Supabase for chat history.
@@ -18,20 +48,21 @@ def get_chatbot_response(user_id: str, message: str):
     if not db:
         return "Error: Supabase client is not initialized. Please check credentials."
 
-    llm = ChatGoogleGenerativeAI(model="gemini-pro", google_api_key=os.getenv("GEMINI_API_KEY"))
+    messages_dict = _fetch_chat_history(user_id)
 
-    # --- Fetch Chat History from Supabase ---
-    # This replaces the Firebase get() logic
-    try:
-        response = db.table("chat_history").select("chat_history").eq("user_id", user_id).execute()
-        if response.data:
-            # 'chat_history' is the JSON column in your Supabase schema
-            messages_dict = response.data[0].get("chat_history", [])
-        else:
-            messages_dict = []
-    except Exception as e:
-        print(f"Error fetching chat history from Supabase: {e}")
-        messages_dict = []
+    # --- Answer structured questions locally, then repeated ones from the response cache ---
+    local_answer = route_intent(user_id, message)
+    if local_answer is None:
+        local_answer = response_cache.get(user_id, message)
+    if local_answer is not None:
+        messages_dict.append({"role": "user", "content": message})
+        messages_dict.append({"role": "assistant", "content": local_answer})
+        _save_chat_history(user_id, messages_dict)
+        return local_answer
+
+    from langchain_core.messages import SystemMessage, HumanMessage, AIMessage  # Loaded with the model
+
+    llm = chat_model("gemini-pro", google_api_key=os.getenv("GEMINI_API_KEY"))
 
     # Convert list of dicts to LangChain message objects
     messages = []
@@ -78,6 +109,14 @@ You have access to the following information about the user's financial data:
 
 **Your role is to answer questions and provide guidance related to these features and data. If a user asks a question that is not related to their finances or the FinSight app, you must politely decline and steer the conversation back to your purpose. For example, if they ask about the weather or a movie, you should say something like: 'I am a financial assistant and can only answer questions about your finances and the FinSight app. How can I help you with your spending today?'"""),
     ]
+
+    # Inject the precomputed financial snapshot so the model can answer without fetching raw rows
+    try:
+        snapshot = get_financial_context_text(user_id)
+        prompt.append(SystemMessage(content=f"Current financial snapshot for this user:\n{snapshot}"))
+    except Exception as e:
+        print(f"Error building financial context: {e}")
+
     prompt.extend(messages)
 
     response = llm.invoke(prompt)
@@ -88,7 +127,6 @@ You have access to the following information about the user's financial data:
     # --- End of Core Logic ---
 
     # --- Save Updated Chat History to Supabase ---
-    # This replaces the Firebase set() logic
 
     # Convert LangChain objects back to a list of dicts
     messages_to_save = []
@@ -98,17 +136,7 @@ You have access to the following information about the user's financial data:
         elif isinstance(msg, AIMessage):
             messages_to_save.append({"role": "assistant", "content": msg.content})
 
-    # Keep only the last 20 messages (10 pairs)
-    messages_to_save = messages_to_save[-20:]
-
-    try:
-        # Use upsert to create or update the record for this user_id
-        db.table("chat_history").upsert({
-            "user_id": user_id,
-            "chat_history": messages_to_save  # Store the list in the 'chat_history' JSON column
-        }).execute()
-    except Exception as e:
-        print(f"Error saving chat history to Supabase: {e}")
-        # Note: We still return the response even if saving fails
+    _save_chat_history(user_id, messages_to_save)
+    response_cache.put(user_id, message, response.content)
 
     return response.content
\ No newline at end of file
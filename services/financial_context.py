@@ -0,0 +1,160 @@
+import time
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from core.setup import initialize_supabase
+from core.data_version import get_data_version, bump_data_version
+from core.cache import table_cache
+from core.metrics import timed
+from services.recurring_detector import detect_recurring
+from services.pending_ledger import pending_ledger
+
+# --- 1. SUPABASE INITIALIZATION ---
+db = initialize_supabase()
+
+LOOKBACK_DAYS = 30  # Window used for category and vendor totals
+TOP_N = 5  # Number of categories / vendors kept in the snapshot
+CONTEXT_TTL_SECONDS = 15 * 60  # Rebuild at least this often (summary rows roll over daily)
+SUMMARY_COLUMNS = ", ".join(f"{period}_{kind}" for period in ("day", "week", "month", "year")
+                            for kind in ("out", "in", "cashflow"))
+SUMMARY_PROMPT_FIELDS = ("day_out", "week_out", "month_out", "year_out", "month_in", "month_cashflow")
+
+# user_id -> (data_version, built_at, context)
+_CONTEXT_CACHE = {}
+_cache_lock = threading.Lock()
+
+
+# --- 2. AGGREGATE BUILDERS ---
+def _transaction_aggregates(user_id):
+    """Category totals, top vendors and in/out totals for the lookback window in one query."""
+    since = (datetime.now() - timedelta(days=LOOKBACK_DAYS)).isoformat()
+    response = db.table('transaction').select('amount, payment_type, category, sender_name') \
+        .eq('user_id', user_id) \
+        .gte('created_at', since) \
+        .execute()
+
+    category_totals = defaultdict(float)
+    vendor_totals = defaultdict(float)
+    total_in = 0.0
+    total_out = 0.0
+    for tx in response.data or []:
+        amount = tx.get('amount') or 0
+        if tx.get('payment_type') == 'income':
+            total_in += amount
+            continue
+        total_out += amount
+        category_totals[tx.get('category') or 'Uncategorized'] += amount
+        vendor_totals[tx.get('sender_name') or 'Unknown'] += amount
+
+    def top(totals):
+        ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:TOP_N]
+        return {name: round(amount, 2) for name, amount in ranked}
+
+    return {
+        "income": round(total_in, 2),
+        "expense": round(total_out, 2),
+        "categories": top(category_totals),
+        "vendors": top(vendor_totals),
+    }
+
+
+def _single_row(table, columns, user_id):
+    """Reads one row for a user through the table cache, keeping only the given columns ({} if missing)."""
+    row = table_cache.get_row(table, user_id)
+    return {column.strip(): row[column.strip()] for column in columns.split(",") if column.strip() in row}
+
+
+def _pending_balances(user_id):
+    """Totals of money the user has to give and to take, from the materialized pending ledger."""
+    balances = pending_ledger.summary(user_id)
+    return {"to_give": balances["to_give"], "to_take": balances["to_take"]}
+
+
+@timed("aggregation")
+def build_financial_context(user_id):
+    """
+    Builds a compact financial snapshot for a user.
+    Each section is fetched independently so one failing table does not drop the rest.
+    """
+    context = {"lookback_days": LOOKBACK_DAYS}
+    sections = {
+        "transactions": lambda: _transaction_aggregates(user_id),
+        "limits": lambda: _single_row('limit', 'daily, weekly, monthly, yearly', user_id),
+        "summary": lambda: _single_row('summary', SUMMARY_COLUMNS, user_id),
+        "recurring": lambda: detect_recurring(user_id),
+        "pending": lambda: _pending_balances(user_id),
+    }
+    for name, builder in sections.items():
+        try:
+            context[name] = builder()
+        except Exception as e:
+            print(f"Error building '{name}' context for user {user_id}: {e}")
+            context[name] = None
+    return context
+
+
+# --- 3. CACHED ACCESS & INVALIDATION ---
+def get_financial_context(user_id):
+    """
+    Returns the cached snapshot for a user, rebuilding it when the user's data
+    version changed or the entry is older than CONTEXT_TTL_SECONDS.
+    """
+    key = str(user_id)
+    version = get_data_version(user_id)
+    cached = _CONTEXT_CACHE.get(key)
+    if cached and cached[0] == version and time.monotonic() - cached[1] < CONTEXT_TTL_SECONDS:
+        return cached[2]
+
+    context = build_financial_context(user_id)
+    with _cache_lock:
+        _CONTEXT_CACHE[key] = (version, time.monotonic(), context)
+    return context
+
+
+def invalidate_financial_context(user_id):
+    """Called by writers (intake, alerts, pending items) whenever a user's data changes."""
+    bump_data_version(user_id)
+    with _cache_lock:
+        _CONTEXT_CACHE.pop(str(user_id), None)
+
+
+# --- 4. PROMPT FORMATTING ---
+def format_financial_context(context):
+    """Renders a snapshot as a short, token-friendly block of text for the LLM prompt."""
+    lines = []
+
+    tx = context.get("transactions")
+    if tx:
+        lines.append(f"Last {context['lookback_days']} days: income ₹{tx['income']}, expenses ₹{tx['expense']}")
+        if tx["categories"]:
+            lines.append("Top categories: " + ", ".join(f"{k} ₹{v}" for k, v in tx["categories"].items()))
+        if tx["vendors"]:
+            lines.append("Top vendors: " + ", ".join(f"{k} ₹{v}" for k, v in tx["vendors"].items()))
+
+    summary = context.get("summary")
+    if summary:
+        lines.append("Spent so far: " + ", ".join(
+            f"{k} ₹{summary[k]}" for k in SUMMARY_PROMPT_FIELDS if summary.get(k) is not None))
+
+    limits = context.get("limits")
+    if limits:
+        lines.append("Limits: " + ", ".join(f"{k} ₹{v}" for k, v in limits.items() if v))
+
+    recurring = context.get("recurring")
+    if recurring:
+        lines.append("Recurring bills: " + ", ".join(
+            f"{r['recipient']} ~₹{r['amount']} {r['frequency']}" for r in recurring))
+
+    pending = context.get("pending")
+    if pending:
+        lines.append(f"Pending: to give ₹{pending['to_give']}, to take ₹{pending['to_take']}")
+
+    if not lines:
+        return "No financial data available for this user yet."
+    return "\n".join(lines)
+
+
+def get_financial_context_text(user_id):
+    """Convenience wrapper returning the formatted snapshot for prompt injection."""
+    return format_financial_context(get_financial_context(user_id))
@@ -0,0 +1,251 @@
+import os
+import json
+import time
+from datetime import date, datetime, timedelta, timezone
+from concurrent.futures import ProcessPoolExecutor
+
+from core.setup import initialize_supabase
+from services.transaction_archive import transaction_archive, use_archive
+
+# "Wrapped"-style highlights (top vendors and categories, peak day, streaks, biggest
+# purchases) are computed for every user at once by a batch job
+# (scripts/generate_highlights.py) and stored in the 'highlights' table, so the endpoint
+# serves precomputed JSON instead of scanning a year of transactions per request.
+# pandas is imported by the pipeline only, never by the app.
+
+# --- 1. SUPABASE INITIALIZATION ---
+db = initialize_supabase()
+
+SNAPSHOT_COLUMNS = ["transaction_id", "user_id", "created_at", "amount", "sender_name", "payment_type", "category"]
+SNAPSHOT_PAGE_SIZE = 1000  # PostgREST returns at most 1000 rows per request by default
+STORE_BATCH_SIZE = 500
+TOP_N = 5
+BIGGEST_PURCHASES = 3
+HIGHLIGHTS_WORKERS = int(os.getenv("HIGHLIGHTS_WORKERS", "0")) or os.cpu_count() or 1
+
+
+def parse_period(period):
+    """'2025' -> the year, '2025-03' -> the month; returns (first day, first day after)."""
+    try:
+        if len(period) == 4:
+            start = date(int(period), 1, 1)
+            return start, start.replace(year=start.year + 1)
+        start = datetime.strptime(period, "%Y-%m").date()
+    except (TypeError, ValueError):
+        raise ValueError("period must be a year (2025) or a month (2025-03).")
+    return start, (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+# --- 2. COLUMNAR SNAPSHOT ---
+def _read_api(first, last):
+    """Column lists of every transaction in [first, last), read from the API page by page."""
+    columns = {name: [] for name in SNAPSHOT_COLUMNS}
+    first, last = first.isoformat(), last.isoformat()
+    last_id = 0
+    while True:
+        # Keyset pagination: each page starts after the last id seen, so no page rescans earlier rows
+        rows = db.table('transaction').select(', '.join(SNAPSHOT_COLUMNS)) \
+            .gt('transaction_id', last_id) \
+            .gte('created_at', first) \
+            .lt('created_at', last) \
+            .order('transaction_id') \
+            .limit(SNAPSHOT_PAGE_SIZE) \
+            .execute().data or []
+        for row in rows:
+            for name in SNAPSHOT_COLUMNS:
+                columns[name].append(row.get(name))
+        if len(rows) < SNAPSHOT_PAGE_SIZE:
+            break
+        last_id = rows[-1]['transaction_id']
+    return columns
+
+
+def load_snapshot(start, end, source=None):
+    """
+    Every transaction between start and end (exclusive) as one DataFrame, from the Parquet
+    archive when source (default BATCH_TRANSACTION_SOURCE) is "archive", else from the API.
+    Repeated strings become categoricals and timestamps are reduced to local calendar days.
+    """
+    import pandas as pd
+
+    first = datetime.combine(start, datetime.min.time()).astimezone()
+    last = datetime.combine(end, datetime.min.time()).astimezone()
+    if use_archive(source):
+        frame = transaction_archive.read_table(start=first, end=last, columns=SNAPSHOT_COLUMNS).to_pandas()
+    else:
+        frame = pd.DataFrame(_read_api(first, last))
+    local_zone = datetime.now().astimezone().tzinfo
+    frame["day"] = pd.to_datetime(frame["created_at"], utc=True, format="ISO8601") \
+        .dt.tz_convert(local_zone).dt.tz_localize(None).dt.normalize()
+    frame["amount"] = pd.to_numeric(frame["amount"], errors="coerce").fillna(0.0)
+    frame["user_id"] = frame["user_id"].astype(str).astype("category")
+    frame["sender_name"] = frame["sender_name"].fillna("Unknown").astype("category")
+    frame["category"] = frame["category"].fillna("Uncategorized").astype("category")
+    frame["payment_type"] = frame["payment_type"].fillna("").astype("category")
+    return frame.drop(columns=["created_at"])
+
+
+# --- 3. HIGHLIGHTS ---
+def _ranked(expenses, column, spent):
+    """Top TOP_N values of 'column' per user by amount, with counts and share of spending."""
+    grouped = expenses.groupby(["user_id", column], observed=True)["amount"].agg(["sum", "count"]).reset_index()
+    grouped = grouped.sort_values(["user_id", "sum"], ascending=[True, False]).groupby("user_id", observed=True).head(TOP_N)
+    grouped["share"] = grouped["sum"] / grouped["user_id"].map(spent).astype(float)
+    result = {}
+    for user, name, amount, count, share in grouped[["user_id", column, "sum", "count", "share"]].itertuples(index=False):
+        result.setdefault(user, []).append({"name": name, "amount": round(amount, 2), "transactions": int(count),
+                                            "share": round(share, 4) if share == share else 0.0})
+    return result
+
+
+def _streaks(daily, start, end):
+    """Longest run of consecutive spending days and of days without spending, per user."""
+    daily = daily.sort_values(["user_id", "day"])
+    gap = daily.groupby("user_id", observed=True)["day"].diff().dt.days
+    run = (gap != 1).cumsum()  # A new run starts at each user's first day and after every gap
+    runs = daily.groupby(run).agg(user_id=("user_id", "first"), first=("day", "first"), length=("day", "size"))
+    longest = runs.sort_values("length", ascending=False).drop_duplicates("user_id").set_index("user_id")
+
+    # Days without spending: between spending days, and before the first / after the last one
+    quiet_inside = (gap - 1).groupby(daily["user_id"], observed=True).max().fillna(0)
+    bounds = daily.groupby("user_id", observed=True)["day"].agg(["min", "max"])
+    quiet_before = (bounds["min"] - start).dt.days
+    quiet_after = (end - bounds["max"]).dt.days - 1
+    quiet = quiet_inside.combine(quiet_before, max).combine(quiet_after, max)
+    return longest, quiet
+
+
+def compute_highlights(frame, start, end):
+    """
+    Highlights for every user in the snapshot, as {user_id: dict}. All aggregates are
+    group-bys over the whole frame; only the final assembly loops over users.
+    start/end are the period bounds, end exclusive; end is clamped to tomorrow so a
+    period in progress does not count future days as days without spending.
+    """
+    import pandas as pd
+
+    start = pd.Timestamp(start)
+    end = pd.Timestamp(min(end, date.today() + timedelta(days=1)))
+    expenses = frame[frame["payment_type"] == "expense"]
+    by_user = expenses.groupby("user_id", observed=True)
+    spent = by_user["amount"].sum()
+    counts = by_user.size()
+    vendors = by_user["sender_name"].nunique()
+    received = frame[frame["payment_type"] == "income"].groupby("user_id", observed=True)["amount"].sum()
+
+    top_vendors = _ranked(expenses, "sender_name", spent)
+    top_categories = _ranked(expenses, "category", spent)
+
+    daily = expenses.groupby(["user_id", "day"], observed=True)["amount"].sum().reset_index()
+    peak_days = daily.sort_values("amount", ascending=False).drop_duplicates("user_id").set_index("user_id")
+    weekdays = expenses.assign(weekday=expenses["day"].dt.day_name()) \
+        .groupby(["user_id", "weekday"], observed=True)["amount"].sum().reset_index() \
+        .sort_values("amount", ascending=False).drop_duplicates("user_id").set_index("user_id")
+    longest, quiet = _streaks(daily[["user_id", "day"]], start, end)
+    biggest = expenses.sort_values("amount", ascending=False).groupby("user_id", observed=True).head(BIGGEST_PURCHASES)
+    purchases = {}
+    for user, vendor, category, amount, day in biggest[["user_id", "sender_name", "category", "amount", "day"]] \
+            .itertuples(index=False):
+        purchases.setdefault(user, []).append({"vendor": vendor, "category": category, "amount": round(amount, 2),
+                                               "date": day.date().isoformat()})
+
+    days = max((end - start).days, 1)
+    results = {}
+    for user in frame["user_id"].unique():
+        total = float(spent.get(user, 0.0))
+        highlights = {
+            "total_spent": round(total, 2),
+            "total_received": round(float(received.get(user, 0.0)), 2),
+            "purchases": int(counts.get(user, 0)),
+            "distinct_vendors": int(vendors.get(user, 0)),
+            "average_daily_spend": round(total / days, 2),
+            "top_vendors": top_vendors.get(user, []),
+            "top_categories": top_categories.get(user, []),
+            "peak_day": None,
+            "favorite_weekday": None,
+            "longest_spending_streak": None,
+            "longest_no_spend_streak": int(quiet.get(user, days)),
+            "biggest_purchases": purchases.get(user, []),
+        }
+        if user in peak_days.index:
+            peak = peak_days.loc[user]
+            highlights["peak_day"] = {"date": peak["day"].date().isoformat(), "amount": round(float(peak["amount"]), 2)}
+            highlights["favorite_weekday"] = {"weekday": weekdays.loc[user, "weekday"],
+                                              "amount": round(float(weekdays.loc[user, "amount"]), 2)}
+            run = longest.loc[user]
+            highlights["longest_spending_streak"] = {"days": int(run["length"]),
+                                                     "start": run["first"].date().isoformat()}
+        results[str(user)] = highlights
+    return results
+
+
+# --- 4. PIPELINE ---
+def _partition(frame, parts):
+    """Splits the snapshot into 'parts' frames with disjoint users."""
+    buckets = frame["user_id"].cat.codes % parts
+    return [frame[buckets == i] for i in range(parts)]
+
+
+def generate_highlights(period, workers=HIGHLIGHTS_WORKERS, source=None):
+    """
+    Computes and stores the highlights of every user with transactions in 'period'.
+    The snapshot is read once, split by user across 'workers' processes, and the
+    results are upserted in batches. Returns run statistics.
+    """
+    started = time.perf_counter()
+    start, end = parse_period(period)
+    frame = load_snapshot(start, end, source)
+    loaded = time.perf_counter()
+    print(f"--- Highlights {period}: {len(frame)} transactions of {frame['user_id'].nunique()} users loaded ---")
+
+    results = {}
+    if len(frame):
+        parts = max(1, min(workers, frame["user_id"].nunique()))
+        if parts == 1:
+            results = compute_highlights(frame, start, end)
+        else:
+            with ProcessPoolExecutor(max_workers=parts) as pool:
+                for chunk in pool.map(compute_highlights, _partition(frame, parts), [start] * parts, [end] * parts):
+                    results.update(chunk)
+    computed = time.perf_counter()
+
+    generated_at = datetime.now(timezone.utc).isoformat()
+    rows = [{"user_id": user, "period": period, "generated_at": generated_at, "highlights": highlights}
+            for user, highlights in results.items()]
+    for i in range(0, len(rows), STORE_BATCH_SIZE):
+        db.table('highlights').upsert(rows[i:i + STORE_BATCH_SIZE], on_conflict='user_id,period').execute()
+    stored = time.perf_counter()
+    print(f"✅ Highlights {period}: stored for {len(rows)} users")
+    return {
+        "period": period,
+        "transactions": len(frame),
+        "users": len(rows),
+        "workers": workers,
+        "seconds": {"load": round(loaded - started, 2), "compute": round(computed - loaded, 2),
+                    "store": round(stored - computed, 2)},
+    }
+
+
+# --- 5. SERVING ---
+PERIOD_PATTERNS = {"year": "____", "month": "____-__"}  # LIKE patterns ('_' is any one character)
+
+
+def get_highlights(user_id, period=None, kind=None):
+    """
+    The stored highlights for a period, or else the most recently generated ones
+    (of 'kind' "year" or "month" if given); None if missing.
+    """
+    query = db.table('highlights').select('period, generated_at, highlights').eq('user_id', str(user_id))
+    if period:
+        query = query.eq('period', period)
+    elif kind:
+        query = query.ilike('period', PERIOD_PATTERNS[kind])
+    # Periods do not sort by recency as strings ("2026-09" > "2026"), so go by generation time
+    response = query.order('generated_at', desc=True).order('period', desc=True).limit(1).execute()
+    if not response.data:
+        return None
+    row = response.data[0]
+    highlights = row['highlights']
+    if isinstance(highlights, str):
+        highlights = json.loads(highlights)
+    return {"period": row['period'], "generated_at": row['generated_at'], **highlights}
@@ -0,0 +1,102 @@
+import sqlite3
+from datetime import datetime
+
+from core.setup import initialize_supabase
+from core.cache import table_cache
+from core.tracing import traced
+from services.amount_tokenizer import DEFAULT_CURRENCY
+from services.financial_context import invalidate_financial_context
+from services.refunds import refund_matcher
+from services.spending_cube import spending_cube
+from services.bills import bill_calendar
+
+# --- 1. SUPABASE INITIALIZATION ---
+db = initialize_supabase()
+
+
+# --- 2. ROW BUILDING ---
+def build_transaction_row(user_id, timestamp: str, parsed_details: dict, idempotency_key: str = None):
+    """
+    Assembles a 'transaction' row from parsed message details.
+    Raises ValueError if the timestamp is not ISO 8601.
+    """
+    try:
+        dt_object = datetime.fromisoformat(timestamp)
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid timestamp format: {timestamp}")
+
+    # Assemble the final dictionary to match your 'transaction' table schema
+    row = {
+        "user_id": user_id,
+        "created_at": timestamp,  # Use the full ISO string
+        "day": dt_object.strftime("%A"),  # e.g., "Monday"
+        "amount": parsed_details.get("amount"),
+        "currency": parsed_details.get("currency") or DEFAULT_CURRENCY,
+        "sender_name": parsed_details.get("sender_name"),
+        "payment_method": parsed_details.get("payment_method"),
+        "payment_type": parsed_details.get("payment_type"),
+        "category": parsed_details.get("category"),
+        "message": parsed_details.get("message"),  # This comes from parse_transaction
+        "anomaly": False  # Set a default value
+    }
+    if idempotency_key:
+        row["idempotency_key"] = idempotency_key
+    return row
+
+
+# --- 3. IDEMPOTENCY ---
+@traced()
+def find_existing(user_id, idempotency_keys):
+    """Returns {idempotency_key: row} for keys that were already recorded for this user."""
+    keys = [key for key in idempotency_keys if key]
+    if not keys:
+        return {}
+    response = db.table('transaction').select('*') \
+        .eq('user_id', user_id) \
+        .in_('idempotency_key', keys) \
+        .execute()
+    return {row['idempotency_key']: row for row in response.data or []}
+
+
+def is_duplicate_key_error(error):
+    """True for a unique-constraint violation (PostgREST code 23505, or the SQLite backend's)."""
+    return isinstance(error, sqlite3.IntegrityError) or getattr(error, "code", None) == "23505"
+
+
+# --- 4. WRITES ---
+@traced()
+def record_transactions(user_id, rows):
+    """
+    Inserts rows for one user in a single round trip and fires the invalidation hooks.
+    Refund credits that match a recent debit get 'refund_of' set before the insert
+    (best effort: a failing lookup never blocks the write).
+    Returns the inserted rows as stored by the database.
+    """
+    if not rows:
+        return []
+    try:
+        refund_matcher.tag_refunds(user_id, rows)
+    except Exception as e:
+        # Best effort: the transaction is stored without 'refund_of' rather than rejected
+        print(f"Refund matching failed for user {user_id}: {e}")
+        refund_matcher.invalidate(user_id)
+    try:
+        response = db.table('transaction').insert(rows).execute()
+    except Exception:
+        # The matched debits were taken out of the index; reload it on next use
+        refund_matcher.invalidate(user_id)
+        raise
+
+    if not response.data:
+        # This might happen if RLS fails, but .insert() usually errors
+        refund_matcher.invalidate(user_id)
+        raise Exception("No data returned from Supabase after insert.")
+    refund_matcher.add_debits(user_id, response.data)
+    spending_cube.add_transactions(user_id, response.data)
+    bill_calendar.mark_stale(user_id)
+
+    print(f"✅ DB Write: Successfully wrote {len(response.data)} transaction(s) for UserID '{user_id}'.")
+    # The new rows change the user's running totals in 'summary'
+    table_cache.invalidate('summary', user_id)
+    invalidate_financial_context(user_id)
+    return response.data
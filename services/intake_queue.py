@@ -0,0 +1,329 @@
+import os
+import time
+import uuid
+import random
+import socket
+import sqlite3
+import threading
+from collections import defaultdict
+
+from services.parsing_engine import parse_transactions, LLMRateLimitError
+from services.anomaly import detect_time_anomalies
+from services.summary import refresh_summary
+from services import intake as intake_service
+from core.metrics import registry
+from core.tracing import start_trace
+
+# --- 1. CONFIGURATION ---
+QUEUE_PATH = os.getenv("INTAKE_QUEUE_PATH", "intake_queue.db")
+MAX_DEPTH = int(os.getenv("INTAKE_QUEUE_MAX_DEPTH", "10000"))  # Backpressure threshold
+WORKERS = int(os.getenv("INTAKE_WORKERS", "2"))
+BATCH_SIZE = int(os.getenv("INTAKE_BATCH_SIZE", "50"))
+MAX_ATTEMPTS = int(os.getenv("INTAKE_MAX_ATTEMPTS", "5"))
+# A claimed job belongs to its worker until the lease expires; after that (worker crashed or
+# was killed) any process may claim it again. Must exceed the slowest batch, LLM calls included.
+LEASE_SECONDS = float(os.getenv("INTAKE_LEASE_SECONDS", "300"))
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 300.0
+IDLE_POLL_SECONDS = 0.5
+
+
+class QueueFullError(Exception):
+    """Raised by enqueue() when the queue is at MAX_DEPTH; callers should ask clients to retry later."""
+
+
+# --- 2. DURABLE QUEUE ---
+class IntakeQueue:
+    """
+    Durable FIFO of raw messages waiting to be parsed and stored, kept in a local SQLite file
+    so accepted messages survive restarts. Several app processes may share the file: a claim
+    is one UPDATE ... RETURNING, so each job goes to one worker, and it carries the claiming
+    queue's id and a lease. Finished jobs are deleted; failed jobs are kept with their last
+    error for inspection.
+
+    The file is opened on first use; the app lifespan calls connect() so that happens at startup.
+    """
+
+    def __init__(self, path=QUEUE_PATH, max_depth=MAX_DEPTH):
+        self.path = path
+        self.max_depth = max_depth
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.RLock()
+        self._conn = None
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+
+    def connect(self):
+        """Opens (and if needed creates or migrates) the queue file; returns the connection."""
+        with self._lock:
+            if self._conn is None:
+                conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+                conn.row_factory = sqlite3.Row
+                if self.path != ":memory:":
+                    conn.execute("PRAGMA journal_mode=WAL")
+                with conn:
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS intake_job (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            user_id NOT NULL,  -- no affinity, so integer ids come back as integers
+                            timestamp TEXT NOT NULL,
+                            raw_message TEXT NOT NULL,
+                            idempotency_key TEXT,
+                            status TEXT NOT NULL DEFAULT 'queued',
+                            attempts INTEGER NOT NULL DEFAULT 0,
+                            next_attempt_at REAL NOT NULL,
+                            enqueued_at REAL NOT NULL,
+                            error TEXT,
+                            claimed_by TEXT,
+                            lease_expires_at REAL
+                        )""")
+                    columns = {row["name"] for row in conn.execute("PRAGMA table_info(intake_job)")}
+                    for column, kind in (("claimed_by", "TEXT"), ("lease_expires_at", "REAL")):
+                        if column not in columns:  # Queue files created before leases existed
+                            conn.execute(f"ALTER TABLE intake_job ADD COLUMN {column} {kind}")
+                    conn.execute("CREATE INDEX IF NOT EXISTS ix_intake_job_ready ON intake_job (status, next_attempt_at)")
+                self._conn = conn
+            return self._conn
+
+    def depth(self):
+        with self._lock:
+            return self.connect().execute(
+                "SELECT COUNT(*) FROM intake_job WHERE status IN ('queued', 'processing')").fetchone()[0]
+
+    def enqueue(self, user_id, timestamp, raw_message, idempotency_key=None):
+        """Persists one message and returns its job id."""
+        with self._lock:
+            if self.depth() >= self.max_depth:
+                raise QueueFullError(f"Intake queue is full ({self.max_depth} jobs).")
+            now = time.time()
+            with self.connect() as conn:
+                cursor = conn.execute(
+                    "INSERT INTO intake_job (user_id, timestamp, raw_message, idempotency_key, next_attempt_at, enqueued_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", (user_id, timestamp, raw_message, idempotency_key, now, now))
+            return cursor.lastrowid
+
+    def claim(self, limit):
+        """
+        Marks up to 'limit' ready jobs as processing by this queue and returns them. Ready
+        means queued and due, or processing under an expired lease. The select and the
+        update are one statement, so concurrent processes never claim the same job.
+        """
+        now = time.time()
+        with self._lock, self.connect() as conn:
+            rows = conn.execute(
+                "UPDATE intake_job SET status = 'processing', claimed_by = ?, lease_expires_at = ? "
+                "WHERE id IN (SELECT id FROM intake_job "
+                "             WHERE (status = 'queued' AND next_attempt_at <= ?) "
+                "                OR (status = 'processing' AND lease_expires_at < ?) "
+                "             ORDER BY id LIMIT ?) "
+                "RETURNING *", (self.owner, now + LEASE_SECONDS, now, now, limit)).fetchall()
+        return sorted((dict(row) for row in rows), key=lambda job: job["id"])
+
+    def complete(self, job_ids):
+        """Deletes finished jobs, unless their lease ran out and another worker claimed them."""
+        if not job_ids:
+            return
+        with self._lock, self.connect() as conn:
+            cursor = conn.execute(
+                f"DELETE FROM intake_job WHERE claimed_by = ? AND id IN ({', '.join('?' for _ in job_ids)})",
+                [self.owner, *job_ids])
+            self.processed += cursor.rowcount
+
+    def fail(self, job, error, retryable=True):
+        """
+        Schedules a retry with exponential backoff and jitter, or marks the job failed for good.
+        Does nothing if the lease ran out and another worker claimed the job meanwhile.
+        """
+        attempts = job["attempts"] + 1
+        retry = retryable and attempts < MAX_ATTEMPTS
+        with self._lock, self.connect() as conn:
+            if retry:
+                delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+                delay *= random.uniform(0.5, 1.5)
+                cursor = conn.execute(
+                    "UPDATE intake_job SET status = 'queued', attempts = ?, next_attempt_at = ?, error = ?, "
+                    "claimed_by = NULL, lease_expires_at = NULL WHERE id = ? AND claimed_by = ?",
+                    (attempts, time.time() + delay, str(error), job["id"], self.owner))
+            else:
+                cursor = conn.execute(
+                    "UPDATE intake_job SET status = 'failed', attempts = ?, error = ?, "
+                    "claimed_by = NULL, lease_expires_at = NULL WHERE id = ? AND claimed_by = ?",
+                    (attempts, str(error), job["id"], self.owner))
+            if cursor.rowcount == 0:
+                print(f"⚠️ Intake job {job['id']}: lease lost before it could be failed, leaving it to its new owner")
+            elif retry:
+                self.retried += 1
+            else:
+                self.failed += 1
+
+    def get_job(self, job_id):
+        """
+        Returns the job row; {'status': 'done'} once it has been stored (finished jobs are
+        deleted); None for an id this queue never issued.
+        """
+        with self._lock:
+            conn = self.connect()
+            row = conn.execute(
+                "SELECT id, user_id, status, attempts, error, enqueued_at FROM intake_job WHERE id = ?",
+                (job_id,)).fetchone()
+            if row:
+                return dict(row)
+            # AUTOINCREMENT keeps the highest id ever issued here, even after its row is deleted
+            issued = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'intake_job'").fetchone()
+        if job_id < 1 or not issued or job_id > issued[0]:
+            return None
+        return {"id": job_id, "status": "done", "attempts": None, "error": None}
+
+    def stats(self):
+        """Queue depth and lag metrics."""
+        now = time.time()
+        with self._lock:
+            conn = self.connect()
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM intake_job GROUP BY status").fetchall())
+            oldest = conn.execute(
+                "SELECT MIN(enqueued_at) FROM intake_job WHERE status IN ('queued', 'processing')").fetchone()[0]
+        return {
+            "depth": counts.get("queued", 0) + counts.get("processing", 0),
+            "queued": counts.get("queued", 0),
+            "processing": counts.get("processing", 0),
+            "failed_stored": counts.get("failed", 0),
+            "max_depth": self.max_depth,
+            "lag_seconds": round(now - oldest, 3) if oldest else 0.0,
+            "processed_total": self.processed,
+            "failed_total": self.failed,
+            "retried_total": self.retried,
+        }
+
+
+# --- 3. BATCH PROCESSING ---
+def _flag_anomalies(rows):
+    """Runs the per-row anomaly checks on rows that are about to be inserted."""
+    candidates = [{**row, "transaction_id": index} for index, row in enumerate(rows)]
+    for index in detect_time_anomalies(candidates):
+        rows[index]["anomaly"] = True
+
+
+def _store(queue, user_id, items):
+    """
+    Inserts a user's (job, row) pairs with one insert. If that fails, each row is retried on
+    its own so a single bad message does not hold back the others; only the jobs whose row
+    cannot be stored are failed. Returns the jobs that were stored.
+    """
+    if not items:
+        return []
+    try:
+        intake_service.record_transactions(user_id, [row for _, row in items])
+        return [job for job, _ in items]
+    except Exception as e:
+        if len(items) == 1:
+            print(f"❌ Intake job {items[0][0]['id']} for UserID '{user_id}' failed, will retry: {e}")
+            queue.fail(items[0][0], e)
+            return []
+        print(f"❌ Intake batch for UserID '{user_id}' failed, storing its {len(items)} jobs one by one: {e}")
+    stored = []
+    for job, row in items:
+        stored += _store(queue, user_id, [(job, row)])
+    return stored
+
+
+def process_batch(queue, jobs):
+    """Parses a batch of jobs, then writes each user's rows with one insert and refreshes their summary."""
+    by_user = defaultdict(list)
+    # Regex misses across the whole batch share a few batched LLM calls
+    try:
+        parsed = parse_transactions([job["raw_message"] for job in jobs])
+    except LLMRateLimitError as e:
+        print(f"❌ Intake batch of {len(jobs)} jobs rate limited, will retry: {e}")
+        for job in jobs:
+            queue.fail(job, e)
+        return
+    for job, parsed_details in zip(jobs, parsed):
+        if not parsed_details:
+            queue.fail(job, "Failed to parse transaction from raw_message", retryable=False)
+            continue
+        try:
+            row = intake_service.build_transaction_row(
+                job["user_id"], job["timestamp"], parsed_details, job["idempotency_key"])
+        except ValueError as e:
+            queue.fail(job, e, retryable=False)
+            continue
+        by_user[job["user_id"]].append((job, row))
+
+    for user_id, items in by_user.items():
+        try:
+            existing = intake_service.find_existing(user_id, [job["idempotency_key"] for job, _ in items])
+        except Exception as e:
+            print(f"❌ Intake batch for UserID '{user_id}' failed, will retry: {e}")
+            for job, _ in items:
+                queue.fail(job, e)
+            continue
+        duplicates, pending, seen = [], [], set(existing)
+        for job, row in items:
+            key = job["idempotency_key"]
+            if key and key in seen:
+                duplicates.append(job)  # Retried message that is already stored (or queued twice)
+                continue
+            seen.add(key)
+            pending.append((job, row))
+        _flag_anomalies([row for _, row in pending])
+        stored = _store(queue, user_id, pending)
+        queue.complete([job["id"] for job in duplicates + stored])
+        if not stored:
+            continue
+        try:
+            refresh_summary(user_id)
+        except Exception as e:
+            # The transactions are stored; a stale summary is fixed by the next batch
+            print(f"Error refreshing summary for user {user_id}: {e}")
+
+
+# --- 4. WORKER POOL ---
+class IntakeWorkerPool:
+    """Background threads that drain the queue in batches."""
+
+    def __init__(self, queue, workers=WORKERS, batch_size=BATCH_SIZE):
+        self.queue = queue
+        self.workers = workers
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                jobs = self.queue.claim(self.batch_size)
+                if not jobs:
+                    self._stop.wait(IDLE_POLL_SECONDS)
+                    continue
+                # Jobs outlive the request that queued them, so each batch is its own trace
+                with start_trace("intake.batch", "worker", jobs=len(jobs)):
+                    process_batch(self.queue, jobs)
+            except Exception as e:
+                print(f"Intake worker error: {e}")
+                self._stop.wait(IDLE_POLL_SECONDS)
+
+    def start(self):
+        if self._threads or self.workers <= 0:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"intake-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"--- Started {self.workers} intake worker(s) ---")
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+
+# Shared instances used by the intake router and the app lifespan (which opens the queue)
+intake_queue = IntakeQueue()
+intake_workers = IntakeWorkerPool(intake_queue)
+
+registry.gauge("finsight_intake_queue_depth", "Intake jobs queued or being processed.", intake_queue.depth)
+registry.gauge("finsight_intake_queue_lag_seconds", "Age of the oldest unfinished intake job.",
+               lambda: intake_queue.stats()["lag_seconds"])
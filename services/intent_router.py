@@ -0,0 +1,192 @@
+import re
+from datetime import date, datetime, timedelta
+
+from core.tracing import traced
+from services.financial_context import get_financial_context
+from services.prediction import get_spending_prediction
+from services.spending_cube import spending_cube
+
+# --- 1. INTENT & SLOT DEFINITIONS ---
+# Questions containing any of these need reasoning, not a lookup; always leave them to the LLM
+OPEN_ENDED = re.compile(
+    r"\b(why|should|advice|advise|suggest|tips?|recommend|compare|explain|help me|how (?:can|do|to)|save more|plan)\b")
+
+# Order matters: the first intent whose pattern matches wins
+INTENTS = [
+    ("prediction", re.compile(r"\b(predict\w*|forecast\w*|expect\w*|projected|next (?:day|week|month))\b")),
+    ("subscriptions", re.compile(r"\b(subscriptions?|recurring|regular payments?|upcoming bills?)\b")),
+    ("pending", re.compile(r"\b(pending|owe|owes|owed|lent|borrowed|to give|to take)\b")),
+    ("limits", re.compile(r"\b(limits?|budgets?)\b")),
+    ("balance", re.compile(r"\b(balance|cash ?flow|net|left|remaining)\b")),
+    ("income", re.compile(r"\b(income|earn\w*|salary|received|credited)\b")),
+    ("spending", re.compile(r"\b(spen[dt]\w*|expenses?|paid|outgoing)\b")),
+]
+
+PERIODS = [
+    ("day", re.compile(r"\b(today|daily|day)\b")),
+    ("week", re.compile(r"\b(week|weekly)\b")),
+    ("year", re.compile(r"\b(year|yearly|annual\w*)\b")),
+    ("month", re.compile(r"\b(month|monthly)\b")),
+]
+# There is no yearly prediction; those questions go to the LLM
+PERIOD_TIMEFRAMES = {"day": "daily", "week": "weekly", "month": "monthly", "year": None}
+LIMIT_KEYS = {"day": "daily", "week": "weekly", "month": "monthly", "year": "yearly"}
+PERIOD_LABELS = {"day": "today", "week": "this week", "month": "this month", "year": "this year"}
+# The summary table only holds the current periods
+PAST_PERIOD = re.compile(r"\b(last|previous|yesterday|ago)\b")
+
+CATEGORIES = {
+    "Food": r"food|restaurant|dining|eat\w*|swiggy|zomato",
+    "Groceries": r"grocer\w*",
+    "Travel": r"travel|trip|uber|ola|cab|flight|train|fuel|petrol",
+    "Shopping": r"shopping|amazon|flipkart|clothes",
+    "Entertainment": r"entertainment|movies?|netflix|spotify",
+    "Bills": r"utilit\w*|electricity|recharge",
+    "Health": r"health|medic\w*|pharmacy|doctor",
+    "Rent": r"rent|housing",
+}
+CATEGORY_PATTERNS = {name: re.compile(rf"\b(?:{pattern})\b") for name, pattern in CATEGORIES.items()}
+
+
+def _inr(amount):
+    return f"₹{(amount or 0):,.2f}"
+
+
+def classify_intent(message: str):
+    """
+    Returns (intent, slots) for questions that can be answered from local data,
+    or (None, {}) for anything open-ended.
+    """
+    text = message.lower()
+    if OPEN_ENDED.search(text):
+        return None, {}
+
+    intent = next((name for name, pattern in INTENTS if pattern.search(text)), None)
+    if intent is None:
+        return None, {}
+
+    slots = {"period": next((name for name, pattern in PERIODS if pattern.search(text)), None),
+             "past": bool(PAST_PERIOD.search(text)),
+             "category": next((name for name, pattern in CATEGORY_PATTERNS.items() if pattern.search(text)), None)}
+    return intent, slots
+
+
+# --- 2. INTENT HANDLERS ---
+# Each handler returns an answer string, or None to fall back to the LLM.
+def _answer_summary(user_id, slots, kind):
+    if slots["past"]:
+        return None
+    period = slots["period"] or "month"
+    summary = get_financial_context(user_id).get("summary")
+    if not summary or summary.get(f"{period}_{kind}") is None:
+        return None
+    value = summary[f"{period}_{kind}"]
+    label = PERIOD_LABELS[period]
+    if kind == "out":
+        return f"You've spent {_inr(value)} {label}."
+    if kind == "in":
+        return f"Your income {label} is {_inr(value)}."
+    return f"Your cashflow {label} is {_inr(value)} (income {_inr(summary.get(f'{period}_in'))}, " \
+           f"expenses {_inr(summary.get(f'{period}_out'))})."
+
+
+def _period_start(period):
+    now = datetime.now()
+    if period == "day":
+        return now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "week":
+        return (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "year":
+        return now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _answer_category_spending(user_id, slots):
+    if slots["past"]:
+        return None
+    period = slots["period"] or "month"
+    # Read from the spending cube, which holds every expense of the period however many there are
+    categories = spending_cube.top_categories(user_id, _period_start(period).date(), date.today(), limit=None)
+    total = sum(item["amount"] for item in categories if item["category"].lower() == slots["category"].lower())
+    return f"You've spent {_inr(total)} on {slots['category']} {PERIOD_LABELS[period]}."
+
+
+def _answer_spending(user_id, slots):
+    if slots["category"]:
+        return _answer_category_spending(user_id, slots)
+    return _answer_summary(user_id, slots, "out")
+
+
+def _answer_prediction(user_id, slots):
+    timeframe = PERIOD_TIMEFRAMES[slots["period"] or "month"]
+    if timeframe is None:
+        return None
+    prediction = get_spending_prediction(user_id, timeframe)
+    if "message" in prediction:
+        return prediction["message"]
+    trend = prediction["trend"]
+    direction = "up" if trend > 0 else "down" if trend < 0 else "flat"
+    return f"Your predicted {timeframe} spending is {_inr(prediction['predicted_expense'])}, " \
+           f"trending {direction} {abs(trend)}% compared to the previous 30 days."
+
+
+def _answer_subscriptions(user_id, slots):
+    recurring = get_financial_context(user_id).get("recurring")
+    if recurring is None:
+        return None
+    if not recurring:
+        return "I couldn't detect any recurring payments yet."
+    lines = [f"- {r['recipient']}: ~{_inr(r['amount'])} {r['frequency']}" for r in recurring]
+    return "Here are your recurring payments:\n" + "\n".join(lines)
+
+
+def _answer_limits(user_id, slots):
+    limits = get_financial_context(user_id).get("limits")
+    if limits is None:
+        return None
+    limits = {k: v for k, v in limits.items() if v}
+    if not limits:
+        return "You haven't set any spending limits yet."
+    if slots["period"]:
+        key = LIMIT_KEYS[slots["period"]]
+        if key in limits:
+            return f"Your {key} limit is {_inr(limits[key])}."
+    return "Your spending limits: " + ", ".join(f"{k} {_inr(v)}" for k, v in limits.items()) + "."
+
+
+def _answer_pending(user_id, slots):
+    pending = get_financial_context(user_id).get("pending")
+    if pending is None:
+        return None
+    return f"You have to give {_inr(pending['to_give'])} and to take {_inr(pending['to_take'])} in pending payments."
+
+
+HANDLERS = {
+    "spending": _answer_spending,
+    "income": lambda user_id, slots: _answer_summary(user_id, slots, "in"),
+    "balance": lambda user_id, slots: _answer_summary(user_id, slots, "cashflow"),
+    "prediction": _answer_prediction,
+    "subscriptions": _answer_subscriptions,
+    "limits": _answer_limits,
+    "pending": _answer_pending,
+}
+
+
+# --- 3. ROUTER ---
+@traced()
+def route_intent(user_id, message: str):
+    """
+    Answers structured questions straight from the existing services.
+    Returns None when the question is open-ended or the data is missing, so the caller falls back to the LLM.
+    """
+    intent, slots = classify_intent(message)
+    if intent is None:
+        return None
+    try:
+        answer = HANDLERS[intent](user_id, slots)
+    except Exception as e:
+        print(f"Intent '{intent}' failed for user {user_id}, falling back to LLM: {e}")
+        return None
+    if answer:
+        print(f"--- Chat answered locally via intent '{intent}' ---")
+    return answer
@@ -1,46 +1,129 @@
+import os
 import re
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from datetime import datetime
+from typing import List
 from pydantic import BaseModel, Field
-from langchain_google_genai import ChatGoogleGenerativeAI
+from services.categorizer import categorize, MIN_CONFIDENCE, UNCATEGORIZED
+from services.amount_tokenizer import mask_amount, strip_amounts, DEFAULT_CURRENCY
+from core.llm import chat_model
+from core.metrics import timed, stage_timer
+from core.tracing import traced, propagate
 # Note: Removed 'supabase: Client' import. This file no longer knows about the DB.
 
 
-# --- 1. REGEX PATTERNS (Unchanged) ---
+# --- 1. REGEX PATTERNS ---
+# Patterns run on the message with its transaction amount replaced by <AMT>
+# (see services/amount_tokenizer.py), so they do not care about currencies or
+# number formats. A pattern is only tried when its lower-case 'keyword' occurs.
+# type 'auto' takes the direction from a Cr/Dr suffix; method 'auto' looks for UPI/Card.
+# The bank-specific patterns come first; the two generic ones after them read any
+# "<debit word> ... to/at <vendor>" or "<credit word> ... from/by <vendor>" message,
+# whichever kind of word comes first.
+_DEBIT_WORDS = r"debited|spent|paid|sent|payment\s+of|txn\s+of|transaction\s+of|used\s+for|purchase"
+_CREDIT_WORDS = r"credited|received|deposited"
+# Messages that mention a payment without being one (OTPs, collect requests, reminders)
+_NOT_A_TRANSACTION = re.compile(r"\b(?:otp|one time password|request(?:ed)?|due on|will be (?:debited|credited))\b")
+# A vendor ends at the next word that starts another clause, or at punctuation
+_VENDOR_END = (r"(?=\s+(?:on|via|in|is|has|for|from|using|with|credited|debited|UPI|Ref|Avl|A/c)\b"
+               r"|\s*[.;(\n]|\s+-|$)")
 TRANSACTION_PATTERNS = [
-    {"name": "P2P UPI Credit", "type": "credit", "method": "UPI",
-     "regex": r"(?P<vendor>.+?)\s+paid you\s+(?:₹|Rs\.?|INR)\s*(?P<amount>[\d,]+\.?\d{1,2})\.?"},
-    {"name": "BOI UPI Debit", "type": "debit", "method": "UPI",
-     "regex": r"(?:Rs\.?|INR)\s*(?P<amount>[\d,]+\.?\d{1,2})\s+debited\s+A/c(?P<account>\w*\d+)\s+and credited to\s+(?P<vendor>.+?)\s+via\s+UPI"},
-    {"name": "Credit Card Purchase", "type": "debit", "method": "Card",
-     "regex": r"Transaction\s+of\s+(?:Rs\.?|INR)\s*(?P<amount>[\d,]+\.?\d{1,2})\s+at\s+(?P<vendor>.+?)\s+on\s+.+Card\s+ending\s+(?P<account>\d{4})\."},
-    {"name": "UPI Debit", "type": "debit", "method": "UPI",
-     "regex": r"Paid\s+(?:Rs\.?|INR)\s*(?P<amount>[\d,]+\.?\d{1,2})\s+to\s+(?P<vendor>.+?)\s+from\s+.+a/c\s+via\s+UPI"},
+    {"name": "P2P UPI Credit", "type": "credit", "method": "UPI", "keyword": "paid you",
+     "regex": r"(?P<vendor>[^\n]+?)\s+paid you\s+<AMT>"},
+    {"name": "BOI UPI Debit", "type": "debit", "method": "UPI", "keyword": "credited to",
+     "regex": r"<AMT>\s+debited\s+A/c(?P<account>\w*\d+)\s+and credited to\s+(?P<vendor>.+?)\s+via\s+UPI"},
+    {"name": "Credit Card Purchase", "type": "debit", "method": "Card", "keyword": "transaction of",
+     "regex": r"Transaction\s+of\s+<AMT>\s+at\s+(?P<vendor>.+?)\s+on\s+.+Card\s+ending\s+(?P<account>\d{4})\."},
+    {"name": "UPI Debit", "type": "debit", "method": "UPI", "keyword": "paid",
+     "regex": r"Paid\s+<AMT>\s+to\s+(?P<vendor>.+?)\s+from\s+.+a/c\s+via\s+UPI"},
+    {"name": "UPI Sent", "type": "debit", "method": "UPI", "keyword": "sent",
+     "regex": r"Sent\s+<AMT>\s+from\s+[^\n]+?\s+to\s+(?P<vendor>[^\n]+?)\s+on\s"},
+    {"name": "UPI Transfer Debit", "type": "debit", "method": "UPI", "keyword": "trf to",
+     "regex": r"debited\s+by\s+<AMT>.*?\btrf\s+to\s+(?P<vendor>.+?)\s+Ref"},
+    {"name": "UPI Debit Credited", "type": "debit", "method": "UPI", "keyword": "debited for",
+     "regex": r"debited\s+for\s+<AMT>\s+on\s+\S+;\s+(?P<vendor>.+?)\s+credited"},
+    {"name": "UPI Merchant Debit", "type": "debit", "method": "UPI", "keyword": "upi/p2",
+     "regex": r"<AMT>\s+debited[\s\S]*?UPI/P2[AM]/\d+/(?P<vendor>[^\n/]+)"},
+    {"name": "Card Spent At", "type": "debit", "method": "Card", "keyword": "spent",
+     "regex": r"<AMT>\s+spent\s+(?:on|using)\s+[^\n]*?Card\s+\w+\s+(?:at|on\s+\S+\s+on)\s+(?P<vendor>[^\n]+?)(?:\s+on\s|\.\s|\.?$)"},
+    {"name": "Card Spent Multi-line", "type": "debit", "method": "Card", "keyword": "spent",
+     "regex": r"Spent\s+<AMT>\s+[^\n]*?Card\s+no\.\s*\w+\s+\S+\s+(?P<vendor>[^\n]+?)\s+Avl"},
+    {"name": "UPI Received", "type": "credit", "method": "UPI", "keyword": "received",
+     "regex": r"Received\s+<AMT>\s+from\s+(?P<vendor>.+?)\s+in\s+your"},
+    {"name": "Bank Transfer Credit", "type": "credit", "method": "Bank Account", "keyword": "credited",
+     "regex": r"credited\s+with\s+<AMT>\s+on\s+\S+\s+by\s+(?:NEFT|IMPS|RTGS)\s+from\s+(?P<vendor>.+?)\.\s"},
+    {"name": "Bank Transfer Credit (IMPS)", "type": "credit", "method": "Bank Account", "keyword": "credited",
+     "regex": r"<AMT>\s+has\s+been\s+credited\s+to\s+your\s+account\s+\S+\s+on\s+\S+\s+from\s+(?P<vendor>.+?)\s+via\s+(?:IMPS|NEFT|RTGS)"},
+    {"name": "Refund Credit", "type": "credit", "method": "auto", "keyword": "refund", "refund": True,
+     "regex": r"Refund\s+of\s+<AMT>\s+(?:from|by)\s+(?P<vendor>.+?)\s+(?:has\s+been\s+|is\s+)?(?:credited|processed|initiated)"},
+    {"name": "Refunded By", "type": "credit", "method": "auto", "keyword": "refunded", "refund": True,
+     "regex": r"<AMT>\s+(?:has\s+been\s+)?refunded\s+(?:by|from)\s+(?P<vendor>.+?)(?:\s+to\s|\s+on\s|[.;]|$)"},
+    {"name": "Dr/Cr Statement", "type": "auto", "method": "auto", "keyword": "<amt> ",
+     "regex": r"<AMT>\s+(?:Dr|Cr)\b[^\n]*?\b(?:to|from|at)\s+(?P<vendor>[^\n]+?)(?:\s+(?:on|via|UPI|Ref|Avl)\b|[.;]|$)"},
+    {"name": "Generic Debit", "type": "debit", "method": "auto", "keyword": "<amt>", "unless": _NOT_A_TRANSACTION,
+     "regex": rf"^(?:(?!\b(?:{_CREDIT_WORDS})\b)[\s\S])*?\b(?:{_DEBIT_WORDS})\b[\s\S]*?\b(?:to|at|towards)\s+"
+              rf"(?:UPI/(?:P2[AM]/)?\d+/)?(?P<vendor>\w[^\n]*?){_VENDOR_END}"},
+    {"name": "Generic Credit", "type": "credit", "method": "auto", "keyword": "<amt>", "unless": _NOT_A_TRANSACTION,
+     "regex": rf"^(?:(?!\b(?:{_DEBIT_WORDS})\b)[\s\S])*?\b(?:{_CREDIT_WORDS})\b[\s\S]*?"
+              rf"(?:\b(?:from|by)\s+|\bInfo:\s*(?:NEFT|IMPS|RTGS|UPI)[-/:])(?P<vendor>\w[^\n]*?){_VENDOR_END}"},
 ]
+for _pattern in TRANSACTION_PATTERNS:
+    _pattern["compiled"] = re.compile(_pattern["regex"], re.IGNORECASE)
 
 
-# --- 2. REGEX PARSER (Unchanged) ---
+def _auto_method(lowered: str):
+    if "upi" in lowered:
+        return "UPI"
+    if "card" in lowered:
+        return "Card"
+    return "Bank Account"
+
+
+# --- 2. REGEX PARSER ---
+@timed("regex_parse")
 def parse_with_regex(message: str):
     """
     Parses a message using a list of predefined regex patterns.
+    The category comes from the local categorizer; 'category_confidence' says how sure it is.
     """
+    masked, amount = mask_amount(message)
+    if amount is None:
+        return None
+    lowered = masked.lower()
     for pattern in TRANSACTION_PATTERNS:
-        match = re.search(pattern["regex"], message, re.IGNORECASE)
+        if pattern["keyword"] not in lowered or ("unless" in pattern and pattern["unless"].search(lowered)):
+            continue
+        match = pattern["compiled"].search(masked)
         if match:
             data = match.groupdict()
+            vendor = strip_amounts(data.get("vendor") or "Unknown").strip() or "Unknown"
+            direction = pattern["type"] if pattern["type"] != "auto" else amount.direction
+            if direction is None:
+                continue
+            category, confidence = categorize(vendor)
+            if pattern.get("refund"):
+                category, confidence = "Refund", 1.0
             return {
-                "amount": float(data.get("amount", "0").replace(",", "")),
-                "sender_name": data.get("vendor", "Unknown").strip(),
-                "payment_type": "income" if pattern["type"] == "credit" else "expense",
-                "payment_method": pattern.get("method", "Unknown"),
-                "category": "Uncategorized",
+                "amount": amount.value,
+                "currency": amount.currency or DEFAULT_CURRENCY,
+                "sender_name": vendor,
+                "payment_type": "income" if direction == "credit" else "expense",
+                "payment_method": pattern["method"] if pattern["method"] != "auto" else _auto_method(lowered),
+                "category": category if confidence >= MIN_CONFIDENCE else UNCATEGORIZED,
+                "category_confidence": round(confidence, 3),
             }
     return None
 
 
-# --- 3. LLM PARSER (Unchanged) ---
+# --- 3. LLM PARSER ---
 class TransactionDetails(BaseModel):
     amount: float = Field(description="The numeric amount of the transaction.")
+    currency: str = Field(default="INR", description="ISO code of the amount's currency (e.g., INR, USD, EUR).")
     sender_name: str = Field(description="The name of the person or vendor involved.")
     payment_method: str = Field(description="The method of payment (e.g., UPI, Card, Bank Account).")
     payment_type: str = Field(description="The type of transaction, either 'income' or 'expense'.")
@@ -52,11 +135,13 @@ def parse_with_llm(message: str):
     Parses a message using a structured output LLM.
     """
     # Assuming the Google API key is set in the environment variables
-    llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0)
+    llm = chat_model("gemini-1.5-flash", temperature=0)
     structured_llm = llm.with_structured_output(TransactionDetails)
     prompt = f"Analyze the following financial transaction message and extract the details. Message: \"{message}\""
     try:
-        response = structured_llm.invoke(prompt)
+        # Goes through the shared scheduler so single calls respect the same rate limit as batches
+        with stage_timer("llm_parse", "single"):
+            response = llm_scheduler.call(structured_llm.invoke, prompt)
         response_dict = response.dict()
         response_dict['message'] = message
         return response_dict
@@ -65,11 +150,140 @@ def parse_with_llm(message: str):
         return None
 
 
-# --- 4. HYBRID PARSER CONTROLLER (Unchanged) ---
+# --- 4. BATCHED LLM PARSER ---
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "25"))  # Messages packed into one request
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "4"))
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_RATE_LIMIT_RETRIES = 5
+
+
+class IndexedTransactionDetails(TransactionDetails):
+    index: int = Field(description="The number of the message these details were extracted from.")
+
+
+class TransactionDetailsList(BaseModel):
+    transactions: List[IndexedTransactionDetails] = Field(
+        description="Exactly one entry per message, in the same order.")
+
+
+class LLMRateLimitError(Exception):
+    """Raised by the batched parser when the LLM is still rate limited after every retry; try again later."""
+
+
+def _is_rate_limit(error):
+    text = f"{type(error).__name__} {error}".lower()
+    return "429" in text or "resourceexhausted" in text or "rate limit" in text or "quota" in text
+
+
+class LLMBatchScheduler:
+    """
+    Runs batched LLM calls with at most 'max_in_flight' requests at once and
+    no more than 'requests_per_minute' started per minute. Rate-limit errors
+    are retried with backoff instead of being treated as bad batches.
+    """
+
+    def __init__(self, max_in_flight=LLM_MAX_IN_FLIGHT, requests_per_minute=LLM_REQUESTS_PER_MINUTE):
+        self.max_in_flight = max(1, max_in_flight)
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._slots = threading.Semaphore(self.max_in_flight)
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def _wait_for_turn(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+    def call(self, fn, *args):
+        for attempt in range(LLM_RATE_LIMIT_RETRIES):
+            self._wait_for_turn()
+            with self._slots:
+                try:
+                    return fn(*args)
+                except Exception as e:
+                    if not _is_rate_limit(e) or attempt == LLM_RATE_LIMIT_RETRIES - 1:
+                        raise
+            delay = min(2 ** attempt, 30) * random.uniform(0.5, 1.5)
+            print(f"LLM rate limited, retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+    def map(self, fn, items):
+        """Applies fn to every item concurrently (bounded by max_in_flight) and keeps the order."""
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            return list(pool.map(propagate(fn), items))
+
+
+llm_scheduler = LLMBatchScheduler()
+
+
+def _invoke_batch(messages):
+    """One structured request for several messages; raises if the reply does not cover every message."""
+    llm = chat_model("gemini-1.5-flash", temperature=0)
+    structured_llm = llm.with_structured_output(TransactionDetailsList)
+    # JSON-quoted so multi-line SMS bodies stay on their own numbered line
+    numbered = "\n".join(f"{i}. {json.dumps(message, ensure_ascii=False)}" for i, message in enumerate(messages))
+    prompt = (
+        "Analyze each of the following financial transaction messages and extract the details. "
+        "Return exactly one entry per message and set 'index' to the message number.\n"
+        f"Messages:\n{numbered}"
+    )
+    with stage_timer("llm_parse", "batch"):
+        response = llm_scheduler.call(structured_llm.invoke, prompt)
+    by_index = {item.index: item for item in response.transactions}
+    if sorted(by_index) != list(range(len(messages))):
+        raise ValueError(f"Expected {len(messages)} results, got indices {sorted(by_index)}")
+    results = []
+    for i, message in enumerate(messages):
+        details = by_index[i].dict()
+        details.pop("index")
+        details["message"] = message
+        results.append(details)
+    return results
+
+
+def _parse_chunk(messages):
+    """
+    Parses a chunk, halving it on failure until single messages use the one-shot parser.
+    A chunk that is still rate limited after the scheduler's retries is not split, since
+    that would only send more requests while throttled; LLMRateLimitError is raised instead.
+    """
+    if len(messages) == 1:
+        return [parse_with_llm(messages[0])]
+    try:
+        return _invoke_batch(messages)
+    except Exception as e:
+        if _is_rate_limit(e):
+            raise LLMRateLimitError(f"LLM rate limited while parsing {len(messages)} messages: {e}") from e
+        print(f"Batched LLM parsing of {len(messages)} messages failed, splitting: {e}")
+        middle = len(messages) // 2
+        return _parse_chunk(messages[:middle]) + _parse_chunk(messages[middle:])
+
+
+def parse_batch_with_llm(messages: list, batch_size: int = LLM_BATCH_SIZE):
+    """
+    Parses many messages with a few structured LLM requests instead of one per message.
+    Returns one dictionary (or None) per message, in order. Raises LLMRateLimitError
+    when the LLM stays rate limited.
+    """
+    if not messages:
+        return []
+    chunks = [messages[i:i + batch_size] for i in range(0, len(messages), batch_size)]
+    results = []
+    for chunk_results in llm_scheduler.map(_parse_chunk, chunks):
+        results.extend(chunk_results)
+    return results
+
+
+# --- 5. HYBRID PARSER CONTROLLER ---
+@traced()
 def parse_transaction(message: str):
     """
     Parses a transaction message using a hybrid approach.
     First, it tries with regex. If that fails, it falls back to an LLM.
+    A regex hit whose category is uncertain asks the LLM for the category only.
     This function returns a dictionary (JSON) or None.
     """
     print("--- Attempting to parse with Regex... ---")
@@ -77,6 +291,11 @@ def parse_transaction(message: str):
     if result:
         print("--- Regex parsing successful. ---")
         result['message'] = message
+        if result.pop('category_confidence') < MIN_CONFIDENCE:
+            print("--- Low category confidence. Asking LLM for the category... ---")
+            llm_result = parse_with_llm(message)
+            if llm_result and llm_result.get('category'):
+                result['category'] = llm_result['category']
         return result
 
     print("--- Regex failed. Falling back to LLM parser... ---")
@@ -85,3 +304,41 @@ def parse_transaction(message: str):
         print("--- LLM parsing successful. ---")
     return result
 
+
+@traced()
+def parse_transactions(messages: list):
+    """
+    Batch version of parse_transaction for backfills and the intake queue:
+    regex first, then every miss (and every uncertain category) in batched LLM calls.
+    Returns one dictionary (or None) per message, in order. If the LLM stays rate limited,
+    regex results keep their local category and LLMRateLimitError is raised only when
+    some message could not be parsed at all.
+    """
+    results = []
+    needs_llm = []
+    for i, message in enumerate(messages):
+        result = parse_with_regex(message)
+        if result:
+            result['message'] = message
+            if result.pop('category_confidence') < MIN_CONFIDENCE:
+                needs_llm.append(i)
+        else:
+            needs_llm.append(i)
+        results.append(result)
+
+    if needs_llm:
+        print(f"--- Sending {len(needs_llm)} of {len(messages)} message(s) to the batched LLM parser... ---")
+        try:
+            llm_results = parse_batch_with_llm([messages[i] for i in needs_llm])
+        except LLMRateLimitError:
+            if any(results[i] is None for i in needs_llm):
+                raise
+            print("--- LLM rate limited; keeping the local categories. ---")
+            return results
+        for i, llm_result in zip(needs_llm, llm_results):
+            if results[i] is None:
+                results[i] = llm_result
+            elif llm_result and llm_result.get('category'):
+                results[i]['category'] = llm_result['category']
+    return results
+
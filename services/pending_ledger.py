@@ -0,0 +1,108 @@
+import time
+import threading
+from collections import defaultdict
+
+from core.setup import initialize_supabase
+
+# --- 1. SUPABASE INITIALIZATION ---
+db = initialize_supabase()
+
+# Balances are materialized per worker process; reloading them periodically bounds
+# the drift caused by writes that went through another worker.
+LEDGER_TTL_SECONDS = 5 * 60
+
+
+def _signed_amount(row):
+    """Receivables count positive (they owe you), payables negative (you owe them)."""
+    amount = float(row.get('amount') or 0)
+    return -amount if row.get('to_give') else amount
+
+
+# --- 2. MATERIALIZED LEDGER ---
+class PendingLedger:
+    """
+    Per-user, per-counterparty net balances of the 'pending' table.
+    Each user is loaded with one query on first access; after that, inserts and
+    deletes update the balances and the running totals in place, so the summary
+    is read in O(1) instead of summing every pending row.
+    """
+
+    def __init__(self):
+        self._balances = {}  # user_id -> {other_user: net amount}
+        self._totals = {}  # user_id -> {"to_give": x, "to_take": y}
+        self._loaded_at = {}
+        self._lock = threading.Lock()
+
+    def _load(self, user):
+        response = db.table('pending').select('amount, to_give, other_user').eq('user_id', user).execute()
+        balances = defaultdict(float)
+        for row in response.data or []:
+            balances[row.get('other_user') or 'Unknown'] += _signed_amount(row)
+        totals = {"to_give": 0.0, "to_take": 0.0}
+        for net in balances.values():
+            self._add_to_totals(totals, net, 1)
+        with self._lock:
+            self._balances[user] = balances
+            self._totals[user] = totals
+            self._loaded_at[user] = time.monotonic()
+        return balances, totals
+
+    @staticmethod
+    def _add_to_totals(totals, net, sign):
+        if net < 0:
+            totals["to_give"] += sign * -net
+        elif net > 0:
+            totals["to_take"] += sign * net
+
+    def _ensure_loaded(self, user):
+        """
+        Returns the user's (balances, totals), loading them if missing or expired. The pair is
+        read in one critical section, so a concurrent invalidate() cannot remove it halfway.
+        """
+        with self._lock:
+            loaded_at = self._loaded_at.get(user)
+            if loaded_at is not None and time.monotonic() - loaded_at <= LEDGER_TTL_SECONDS:
+                return self._balances[user], self._totals[user]
+        return self._load(user)
+
+    def apply(self, user_id, rows, sign=1):
+        """Applies inserted (sign=1) or deleted (sign=-1) pending rows to the balances."""
+        user = str(user_id)
+        with self._lock:
+            if user not in self._balances:
+                return  # Not materialized yet; the first read loads the current state
+            balances = self._balances[user]
+            totals = self._totals[user]
+            for row in rows:
+                counterparty = row.get('other_user') or 'Unknown'
+                old_net = balances.get(counterparty, 0.0)
+                new_net = old_net + sign * _signed_amount(row)
+                self._add_to_totals(totals, old_net, -1)
+                self._add_to_totals(totals, new_net, 1)
+                if abs(new_net) < 0.005:
+                    balances.pop(counterparty, None)
+                else:
+                    balances[counterparty] = new_net
+
+    def summary(self, user_id):
+        """Net balance per counterparty plus totals to give and to take."""
+        balances, totals = self._ensure_loaded(str(user_id))
+        with self._lock:  # apply() may be updating them in place
+            return {
+                "to_give": round(totals["to_give"], 2),
+                "to_take": round(totals["to_take"], 2),
+                "net": round(totals["to_take"] - totals["to_give"], 2),
+                "counterparties": {name: round(net, 2) for name, net in balances.items()},
+            }
+
+    def invalidate(self, user_id):
+        """Forgets a user's balances so the next read reloads them."""
+        with self._lock:
+            user = str(user_id)
+            self._balances.pop(user, None)
+            self._totals.pop(user, None)
+            self._loaded_at.pop(user, None)
+
+
+# Shared instance used by the pending-payments service
+pending_ledger = PendingLedger()
@@ -1,112 +1,117 @@
-from flask import Flask, request, jsonify
 from core.setup import initialize_supabase  # Using your custom initializer
+from services.financial_context import invalidate_financial_context
+from services.pending_ledger import pending_ledger
 
 # Note: datetime is no longer needed as Supabase handles timestamps
 
 # --- 1. SUPABASE INITIALIZATION ---
-# Initialize the Supabase client using your custom function
+# Shared client initialized once for the whole FastAPI process
 db = initialize_supabase()
 
-# --- 2. FLASK APPLICATION ---
-app = Flask(__name__)
+MAX_PAGE_SIZE = 500
 
 
-# --- 3. PENDING TRANSACTIONS API ENDPOINTS ---
+# --- 2. PENDING TRANSACTIONS SERVICE ---
 
-@app.route('/pending', methods=['POST'])
-def add_pending_item():
+def _to_row(user_id, description: str, amount: float, type: str, person_name: str):
+    """Maps API fields to the 'pending' table schema."""
+    return {
+        "user_id": user_id,
+        "reason": description,
+        "amount": float(amount),
+        # Map 'type' to the 'to_give' boolean
+        "to_give": True if type == 'payable' else False,
+        "other_user": person_name
+        # 'created_at' and 'pending_id' are handled automatically by Supabase
+    }
+
+
+def _to_item(row):
+    """Maps a 'pending' row back to the original JSON format."""
+    return {
+        "id": row['pending_id'],
+        "description": row['reason'],
+        "amount": row['amount'],
+        "person_name": row['other_user'],
+        "type": 'payable' if row['to_give'] else 'receivable',
+        "created_at": row['created_at']
+    }
+
+
+def add_pending_item(user_id, description: str, amount: float, type: str, person_name: str):
     """
-    Adds a new pending transaction for a user.
-    Expects JSON: {"UserID", "description", "amount", "type", "person_name"}
+    Adds a new pending transaction for a user and returns its pending_id.
     'type' should be 'payable' (you owe) or 'receivable' (you are owed).
     """
-    if not db: return jsonify({"error": "Supabase not initialized"}), 500
-
-    data = request.get_json()
-    required_fields = ["UserID", "description", "amount", "type", "person_name"]
-    if not data or not all(field in data for field in required_fields):
-        return jsonify({"error": "Missing required fields: UserID, description, amount, type, person_name"}), 400
-
-    user_id = data["UserID"]
-
-    # --- Map incoming JSON to your Supabase schema ---
-    try:
-        new_item = {
-            "user_id": user_id,
-            "reason": data["description"],
-            "amount": float(data["amount"]),
-            # Map 'type' to the 'to_give' boolean
-            "to_give": True if data["type"] == 'payable' else False,
-            "other_user": data["person_name"]
-            # 'created_at' and 'pending_id' are handled automatically by Supabase
-        }
-    except ValueError:
-        return jsonify({"error": "Invalid amount. Must be a number."}), 400
-
-    try:
-        # Insert the new record into the 'pending' table
-        response = db.table('pending').insert(new_item).execute()
-
-        if not response.data:
-            raise Exception("Failed to insert data or no data returned.")
-
-        # Get the new ID from the returned data
-        new_id = response.data[0]['pending_id']
-
-        return jsonify({"status": "success", "id": new_id}), 201
-    except Exception as e:
-        return jsonify({"error": f"Failed to add pending item: {e}"}), 500
-
-
-@app.route('/pending/<user_id>', methods=['GET'])
-def get_pending_items(user_id):
+    return add_pending_items(user_id, [(description, amount, type, person_name)])[0]
+
+
+def add_pending_items(user_id, items):
     """
-    Retrieves all pending items for a given UserID.
+    Adds several pending transactions in one round trip and returns their pending_ids.
+    Each item is a (description, amount, type, person_name) tuple.
     """
-    if not db: return jsonify({"error": "Supabase not initialized"}), 500
+    rows = [_to_row(user_id, *item) for item in items]
 
-    try:
-        # Select all items from 'pending' table for the user
-        response = db.table('pending').select('*').eq('user_id', user_id).execute()
+    # Insert the new records into the 'pending' table
+    response = db.table('pending').insert(rows).execute()
 
-        pending_list = []
+    if not response.data:
+        raise Exception("Failed to insert data or no data returned.")
 
-        # --- Map Supabase columns back to original JSON format ---
-        for item in response.data:
-            pending_list.append({
-                "id": item['pending_id'],
-                "description": item['reason'],
-                "amount": item['amount'],
-                "person_name": item['other_user'],
-                "type": 'payable' if item['to_give'] else 'receivable',
-                "created_at": item['created_at']
-            })
+    pending_ledger.apply(user_id, response.data, sign=1)
+    invalidate_financial_context(user_id)
+    # Get the new IDs from the returned data
+    return [row['pending_id'] for row in response.data]
 
-        return jsonify(pending_list)
-    except Exception as e:
-        return jsonify({"error": f"Failed to retrieve items: {e}"}), 500
 
+def get_pending_items(user_id, limit: int = 100, offset: int = 0, person_name: str = None):
+    """
+    Retrieves one page of pending items for a given UserID, newest first.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = db.table('pending').select('*').eq('user_id', user_id)
+    if person_name:
+        query = query.eq('other_user', person_name)
+    response = query.order('created_at', desc=True) \
+        .range(offset, offset + limit - 1) \
+        .execute()
 
-@app.route('/pending/<user_id>/<item_id>', methods=['DELETE'])
-def delete_pending_item(user_id, item_id):
+    return [_to_item(item) for item in response.data]
+
+
+def get_pending_balances(user_id):
     """
-    Deletes a specific pending item by its ID.
+    Returns net balances per counterparty and totals to give / to take from the materialized ledger.
     """
-    if not db: return jsonify({"error": "Supabase not initialized"}), 500
+    return pending_ledger.summary(user_id)
 
-    try:
-        # Delete from 'pending' table where user_id and pending_id match
-        db.table('pending').delete() \
-            .eq('user_id', user_id) \
-            .eq('pending_id', item_id) \
-            .execute()
 
-        return jsonify({"success": True, "message": f"Item {item_id} deleted successfully."})
-    except Exception as e:
-        return jsonify({"error": f"Failed to delete item: {e}"}), 500
+def delete_pending_item(user_id, item_id):
+    """
+    Deletes a specific pending item by its ID.
+    """
+    return settle_pending_items(user_id, item_ids=[item_id])
 
 
-# --- 4. MAIN EXECUTION BLOCK ---
-if __name__ == '__main__':
-    # Running on port 5001 (as in your original file)
-    app.run(debug=True, port=5001)
\ No newline at end of file
+def settle_pending_items(user_id, item_ids=None, person_name: str = None):
+    """
+    Settles (deletes) several pending items in one round trip, either by ID or
+    every item with one counterparty. Returns the number of settled items.
+    """
+    if not item_ids and not person_name:
+        raise ValueError("Either item_ids or person_name must be provided.")
+
+    # Delete from 'pending' table where user_id and pending_id / other_user match
+    query = db.table('pending').delete().eq('user_id', user_id)
+    if item_ids:
+        query = query.in_('pending_id', list(item_ids))
+    if person_name:
+        query = query.eq('other_user', person_name)
+    response = query.execute()
+
+    # Deleted rows are returned by PostgREST, so balances are updated without re-reading the table
+    deleted = response.data or []
+    pending_ledger.apply(user_id, deleted, sign=-1)
+    invalidate_financial_context(user_id)
+    return len(deleted)
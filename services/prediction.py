@@ -1,11 +1,29 @@
 from core.setup import initialize_supabase  # Using your custom initializer
 from datetime import datetime, timedelta
 from collections import defaultdict
-import numpy as np
-from dateutil.parser import parse as parse_datetime  # For parsing ISO timestamps
+from core.timestamps import parse_datetime  # ISO fast path, dateutil fallback
+from core.metrics import timed
+from services.transaction_archive import transaction_archive, use_archive
 
 
-def get_spending_prediction(user_id: str, timeframe: str):
+def _fetch_transactions(db, user_id, since, columns, payment_type=None, source='api'):
+    """
+    A user's transactions since 'since' from Supabase, or from the Parquet archive for
+    batch callers that pass source="archive" (the archive lags the live table).
+    """
+    if use_archive(source):
+        return transaction_archive.read_transactions(user_id=user_id, start=since, payment_type=payment_type,
+                                                     columns=columns)
+    query = db.table('transaction').select(', '.join(columns)) \
+        .eq('user_id', user_id) \
+        .gte('created_at', since.isoformat())
+    if payment_type:
+        query = query.eq('payment_type', payment_type)
+    return query.execute().data
+
+
+@timed("aggregation")
+def get_spending_prediction(user_id: str, timeframe: str, source: str = 'api'):
     """
     Predicts future expenses based on historical data from Supabase.
     """
@@ -15,15 +33,9 @@ def get_spending_prediction(user_id: str, timeframe: str):
             raise Exception("Supabase client not initialized")
 
         # Fetch last 90 days of transactions for the user
-        ninety_days_ago = (datetime.now() - timedelta(days=90)).isoformat()
-
-        # Query the 'transaction' table
-        response = db.table('transaction').select('created_at, amount, payment_type') \
-            .eq('user_id', user_id) \
-            .gte('created_at', ninety_days_ago) \
-            .execute()
-
-        transactions = response.data
+        ninety_days_ago = datetime.now() - timedelta(days=90)
+        transactions = _fetch_transactions(db, user_id, ninety_days_ago, ['created_at', 'amount', 'payment_type'],
+                                           source=source)
 
         if len(transactions) < 15:
             return {"message": "Not enough data for a reliable prediction."}
@@ -80,25 +92,20 @@ def get_spending_prediction(user_id: str, timeframe: str):
         return {"message": "An error occurred during prediction."}
 
 
-def get_cashflow_prediction(user_id: str, timeframe: str):
+@timed("aggregation")
+def get_cashflow_prediction(user_id: str, timeframe: str, source: str = 'api'):
     """
     Predicts future cashflow based on historical data from Supabase.
     """
     try:
-        db = initialize_firebase()
+        db = initialize_supabase()
         if not db:
             raise Exception("Supabase client not initialized")
 
         # Fetch last 90 days of transactions for the user
-        ninety_days_ago = (datetime.now() - timedelta(days=90)).isoformat()
-
-        # Query the 'transaction' table
-        response = db.table('transaction').select('created_at, amount, payment_type') \
-            .eq('user_id', user_id) \
-            .gte('created_at', ninety_days_ago) \
-            .execute()
-
-        transactions = response.data
+        ninety_days_ago = datetime.now() - timedelta(days=90)
+        transactions = _fetch_transactions(db, user_id, ninety_days_ago, ['created_at', 'amount', 'payment_type'],
+                                           source=source)
 
         if len(transactions) < 15:
             return {"message": "Not enough data for a reliable prediction."}
@@ -145,26 +152,19 @@ def get_cashflow_prediction(user_id: str, timeframe: str):
         return {"message": "An error occurred during prediction."}
 
 
-def get_daily_spending_trend(user_id: str):
+@timed("aggregation")
+def get_daily_spending_trend(user_id: str, source: str = 'api'):
     """
     Gets the daily spending trend for the last 7 days from Supabase.
     """
     try:
-        db = initialize_firebase()
+        db = initialize_supabase()
         if not db:
             raise Exception("Supabase client not initialized")
 
-        # Fetch last 7 days of transactions for the user
-        seven_days_ago = (datetime.now() - timedelta(days=7)).isoformat()
-
-        # Query for 'expense' types
-        response = db.table('transaction').select('created_at, amount') \
-            .eq('user_id', user_id) \
-            .gte('created_at', seven_days_ago) \
-            .eq('payment_type', 'expense') \
-            .execute()
-
-        transactions = response.data
+        # Fetch last 7 days of 'expense' transactions for the user
+        seven_days_ago = datetime.now() - timedelta(days=7)
+        transactions = _fetch_transactions(db, user_id, seven_days_ago, ['created_at', 'amount'], 'expense', source)
 
         daily_spending = defaultdict(float)
         for tx in transactions:
@@ -183,26 +183,19 @@ def get_daily_spending_trend(user_id: str):
         return {"message": "An error occurred while fetching daily trend."}
 
 
-def get_monthly_spending_trend(user_id: str):
+@timed("aggregation")
+def get_monthly_spending_trend(user_id: str, source: str = 'api'):
     """
     Gets the monthly spending trend for the last 12 months from Supabase.
     """
     try:
-        db = initialize_firebase()
+        db = initialize_supabase()
         if not db:
             raise Exception("Supabase client not initialized")
 
-        # Fetch last 12 months of transactions for the user
-        twelve_months_ago = (datetime.now() - timedelta(days=365)).isoformat()
-
-        # Query for 'expense' types
-        response = db.table('transaction').select('created_at, amount') \
-            .eq('user_id', user_id) \
-            .gte('created_at', twelve_months_ago) \
-            .eq('payment_type', 'expense') \
-            .execute()
-
-        transactions = response.data
+        # Fetch last 12 months of 'expense' transactions for the user
+        twelve_months_ago = datetime.now() - timedelta(days=365)
+        transactions = _fetch_transactions(db, user_id, twelve_months_ago, ['created_at', 'amount'], 'expense', source)
 
         monthly_spending = defaultdict(float)
         for tx in transactions:
@@ -0,0 +1,195 @@
+import json
+import base64
+
+from core.setup import initialize_supabase
+
+# --- 1. SUPABASE INITIALIZATION ---
+db = initialize_supabase()
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+EXPORT_PAGE_SIZE = 1000  # Rows fetched per round trip while streaming an export
+
+# --- 2. TABLE WHITELIST ---
+# Only these tables and columns can be read through the generic API.
+# 'key' is a unique column used as the keyset tie-breaker.
+TABLES = {
+    "transaction": {
+        "key": "transaction_id",
+        "columns": {"transaction_id", "user_id", "created_at", "day", "amount", "sender_name",
+                    "payment_method", "payment_type", "category", "message", "anomaly", "idempotency_key",
+                    "refund_of", "currency"},
+    },
+    "limit": {
+        "key": "id",
+        "columns": {"id", "user_id", "daily", "weekly", "monthly", "yearly"},
+    },
+    "pending": {
+        "key": "pending_id",
+        "columns": {"pending_id", "user_id", "created_at", "reason", "amount", "to_give", "other_user"},
+    },
+    "summary": {
+        "key": "user_id",
+        "columns": {"user_id"} | {f"{period}_{kind}" for period in ("day", "week", "month", "year")
+                                  for kind in ("out", "in", "cashflow")},
+    },
+    "chat_history": {
+        "key": "user_id",
+        "columns": {"user_id", "chat_history"},
+    },
+}
+
+FILTER_OPERATORS = {"eq", "neq", "gt", "gte", "lt", "lte", "in"}
+RESERVED_PARAMS = {"select", "order", "limit", "cursor"}
+
+
+class QueryError(ValueError):
+    """Raised for requests that are not allowed by the whitelist or are malformed."""
+
+
+# --- 3. QUERY PARSING ---
+def _check_column(table, column):
+    if column not in TABLES[table]["columns"]:
+        raise QueryError(f"Unknown column '{column}' for table '{table}'.")
+    return column
+
+
+def parse_query(table: str, params):
+    """
+    Parses PostgREST-style query parameters (a dict, or (name, value) pairs when a
+    column is filtered more than once) into a query spec:
+        select=amount,category        column projection
+        order=created_at.desc         ordering (the table key breaks ties, nulls sort last)
+        amount=gte.100                filters: eq, neq, gt, gte, lt, lte, in (comma separated)
+        amount=gte.100&amount=lte.500 several filters on one column are ANDed
+        limit=100&cursor=...          keyset pagination
+    """
+    if table not in TABLES:
+        raise QueryError(f"Table '{table}' is not available.")
+    key = TABLES[table]["key"]
+    pairs = list(params.items()) if isinstance(params, dict) else list(params)
+    params = dict(pairs)  # Reserved parameters take their last value
+
+    columns = None
+    if params.get("select"):
+        columns = [_check_column(table, c.strip()) for c in params["select"].split(",") if c.strip()]
+
+    order_column, desc = key, False
+    if params.get("order"):
+        order_column, _, direction = params["order"].partition(".")
+        _check_column(table, order_column)
+        if direction not in ("", "asc", "desc"):
+            raise QueryError("Order direction must be 'asc' or 'desc'.")
+        desc = direction == "desc"
+
+    try:
+        limit = int(params.get("limit") or DEFAULT_PAGE_SIZE)
+    except ValueError:
+        raise QueryError("limit must be an integer.")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    filters = []
+    for column, expression in pairs:
+        if column in RESERVED_PARAMS:
+            continue
+        _check_column(table, column)
+        operator, _, value = expression.partition(".")
+        if operator not in FILTER_OPERATORS or not value:
+            raise QueryError(f"Invalid filter '{column}={expression}'. Use <operator>.<value>.")
+        filters.append((column, operator, value.split(",") if operator == "in" else value))
+
+    return {
+        "table": table,
+        "key": key,
+        "columns": columns,
+        "order": order_column,
+        "desc": desc,
+        "limit": limit,
+        "filters": filters,
+        "cursor": decode_cursor(params["cursor"]) if params.get("cursor") else None,
+    }
+
+
+def encode_cursor(row, spec):
+    payload = [row.get(spec["order"]), row.get(spec["key"])]
+    return base64.urlsafe_b64encode(json.dumps(payload, default=str).encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        order_value, key_value = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return order_value, key_value
+    except Exception:
+        raise QueryError("Invalid cursor.")
+
+
+# --- 4. EXECUTION ---
+def _quote(value):
+    """Quotes a value for a PostgREST or=() expression (timestamps contain ':' and '+')."""
+    return '"' + str(value).replace('"', '\\"') + '"'
+
+
+def _build(spec, cursor, limit):
+    columns = spec["columns"]
+    selected = None
+    if columns is not None:
+        # The cursor columns must always be fetched, even if they are not projected
+        selected = list(dict.fromkeys(columns + [spec["order"], spec["key"]]))
+    query = db.table(spec["table"]).select(",".join(selected) if selected else "*")
+
+    for column, operator, value in spec["filters"]:
+        query = getattr(query, "in_" if operator == "in" else operator)(column, value)
+
+    if cursor is not None:
+        order_value, key_value = cursor
+        comparison = "lt" if spec["desc"] else "gt"
+        if spec["order"] == spec["key"]:
+            query = getattr(query, comparison)(spec["key"], key_value)
+        elif order_value is None:
+            # Nulls sort last in both directions, so only nulls with a later key remain
+            query = getattr(query.is_(spec["order"], "null"), comparison)(spec["key"], key_value)
+        else:
+            query = query.or_(
+                f"{spec['order']}.{comparison}.{_quote(order_value)},"
+                f"and({spec['order']}.eq.{_quote(order_value)},{spec['key']}.{comparison}.{_quote(key_value)}),"
+                f"{spec['order']}.is.null")
+
+    query = query.order(spec["order"], desc=spec["desc"], nullsfirst=False)
+    if spec["order"] != spec["key"]:
+        query = query.order(spec["key"], desc=spec["desc"])
+    return query.limit(limit)
+
+
+def _project(rows, spec):
+    columns = spec["columns"]
+    if columns is None:
+        return rows
+    return [{column: row.get(column) for column in columns} for row in rows]
+
+
+def fetch_page(spec):
+    """Returns one page of rows plus the cursor of the next page (None on the last page)."""
+    rows = _build(spec, spec["cursor"], spec["limit"] + 1).execute().data or []
+    has_more = len(rows) > spec["limit"]
+    rows = rows[:spec["limit"]]
+    next_cursor = encode_cursor(rows[-1], spec) if has_more and rows else None
+    return {"data": _project(rows, spec), "next_cursor": next_cursor}
+
+
+def stream_ndjson(spec):
+    """
+    Yields every matching row as one JSON line, walking the table page by page with the
+    keyset cursor. Only one page is held in memory at a time, whatever the table size.
+    'limit' sets the page size here, not the total.
+    """
+    cursor = spec["cursor"]
+    page_size = max(spec["limit"], EXPORT_PAGE_SIZE)
+    while True:
+        rows = _build(spec, cursor, page_size).execute().data or []
+        if not rows:
+            return
+        for row in _project(rows, spec):
+            yield json.dumps(row, default=str) + "\n"
+        if len(rows) < page_size:
+            return
+        cursor = (rows[-1].get(spec["order"]), rows[-1].get(spec["key"]))
@@ -1,13 +1,16 @@
+import calendar
 from collections import defaultdict
 from datetime import date, timedelta
-import numpy as np
 from core.setup import initialize_supabase  # Using your custom initializer
-from dateutil.parser import parse as parse_datetime  # For parsing timestamps
+from core.timestamps import parse_datetime  # ISO fast path, dateutil fallback
+from core.metrics import timed
+from services.transaction_archive import transaction_archive, use_archive
 
 # --- 1. SUPABASE INITIALIZATION ---
 DB = initialize_supabase()
 MIN_TRANSACTIONS = 3  # Minimum number of transactions to be considered a potential subscription
 TOLERANCE_PERCENT = 0.10  # Amount can vary by +/- 10%
+INCOME_TOLERANCE_PERCENT = 0.25  # Salaries vary more (bonuses, overtime, tax changes)
 
 # Define intervals in days and their tolerance
 INTERVALS = {
@@ -19,20 +22,26 @@ INTERVALS = {
 
 
 # --- 2. DATA FETCHING (MODIFIED FOR SUPABASE) ---
-def _fetch_user_transactions(user_id):
-    """Fetches all expense transactions for a given user from Supabase."""
+def _fetch_user_transactions(user_id, payment_type='expense', source='api'):
+    """
+    Fetches all transactions of one payment type ('expense' or 'income') for a given user from Supabase.
+    Batch callers pass source="archive" to read the Parquet archive instead (it lags the live table).
+    """
     try:
-        # Query the 'transaction' table for 'expense' types
-        response = DB.table('transaction').select('*') \
-            .eq('user_id', user_id) \
-            .eq('payment_type', 'expense') \
-            .execute()
+        if use_archive(source):
+            rows = transaction_archive.read_transactions(user_id=user_id, payment_type=payment_type)
+        else:
+            # Query the 'transaction' table for the requested type
+            rows = DB.table('transaction').select('*') \
+                .eq('user_id', user_id) \
+                .eq('payment_type', payment_type) \
+                .execute().data
 
         transactions = []
-        if not response.data:
+        if not rows:
             return []
 
-        for data in response.data:
+        for data in rows:
             # Ensure transaction has the necessary fields
             if all(k in data for k in ['created_at', 'amount', 'sender_name']):
                 try:
@@ -48,24 +57,35 @@ def _fetch_user_transactions(user_id):
         return []
 
 
-# --- 3. RECURRING DETECTION (LOGIC UNCHANGED) ---
-def detect_recurring(user_id):
+# --- 3. RECURRING DETECTION ---
+MONTHS_PER_PERIOD = {"monthly": 1, "quarterly": 3, "yearly": 12}
+
+
+def project_next_date(last_date, frequency):
     """
-    Analyzes a user's transactions to detect recurring payments.
-    This logic is database-agnostic and remains unchanged.
+    The next occurrence after last_date. Monthly, quarterly and yearly payments keep
+    their day of the month (clamped to the month's length); weekly ones add 7 days.
     """
-    transactions = _fetch_user_transactions(user_id)
-    if not transactions:
-        print(f"No transactions found for user {user_id} to analyze.")
-        return []
+    months = MONTHS_PER_PERIOD.get(frequency)
+    if months is None:
+        return last_date + timedelta(days=round(INTERVALS[frequency][0]))
+    year, month = divmod(last_date.year * 12 + last_date.month - 1 + months, 12)
+    return date(year, month + 1, min(last_date.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def _find_streams(transactions, tolerance_percent):
+    """
+    Groups transactions by counterparty and yields (counterparty, median amount,
+    frequency, count, last date) for every group with a consistent amount and a
+    regular interval from INTERVALS. Shared by the subscription and income detectors.
+    """
+    import numpy as np  # Deferred: only needed once there are transactions to analyze
 
     # Group transactions by recipient (sender_name)
     grouped_by_recipient = defaultdict(list)
     for tx in transactions:
         grouped_by_recipient[tx['sender_name']].append(tx)
 
-    detected_recurring = []
-
     for recipient, tx_list in grouped_by_recipient.items():
         if len(tx_list) < MIN_TRANSACTIONS:
             continue
@@ -73,8 +93,8 @@ def detect_recurring(user_id):
         # --- 1. Check for consistent amount ---
         amounts = [tx['amount'] for tx in tx_list]
         median_amount = np.median(amounts)
-        lower_bound = median_amount * (1 - TOLERANCE_PERCENT)
-        upper_bound = median_amount * (1 + TOLERANCE_PERCENT)
+        lower_bound = median_amount * (1 - tolerance_percent)
+        upper_bound = median_amount * (1 + tolerance_percent)
 
         consistent_amounts = [a for a in amounts if lower_bound <= a <= upper_bound]
 
@@ -94,17 +114,58 @@ def detect_recurring(user_id):
         for name, (avg_days, tolerance) in INTERVALS.items():
             if abs(median_delta - avg_days) <= tolerance:
                 # We found a matching interval
-                detected_recurring.append({
-                    "recipient": recipient,
-                    "amount": round(median_amount, 2),
-                    "frequency": name,
-                    "transaction_count": len(tx_list)
-                })
+                yield recipient, median_amount, name, len(tx_list), tx_list[-1]['tx_date']
                 break  # Move to the next recipient
 
+
+@timed("aggregation")
+def detect_recurring(user_id, source='api'):
+    """
+    Analyzes a user's transactions to detect recurring payments.
+    """
+    transactions = _fetch_user_transactions(user_id, source=source)
+    if not transactions:
+        print(f"No transactions found for user {user_id} to analyze.")
+        return []
+
+    detected_recurring = []
+    for recipient, amount, frequency, count, last_date in _find_streams(transactions, TOLERANCE_PERCENT):
+        detected_recurring.append({
+            "recipient": recipient,
+            "amount": round(amount, 2),
+            "frequency": frequency,
+            "transaction_count": count,
+            "last_paid": last_date.isoformat(),
+            "next_due": project_next_date(last_date, frequency).isoformat(),
+        })
     return detected_recurring
 
 
+@timed("aggregation")
+def detect_income_streams(user_id, source='api'):
+    """
+    Detects periodic income (salary, rent received, stipends...) with the same interval
+    machinery as detect_recurring. Refund credits are not income and are skipped.
+    """
+    transactions = [tx for tx in _fetch_user_transactions(user_id, payment_type='income', source=source)
+                    if not tx.get('refund_of')]
+    if not transactions:
+        print(f"No income transactions found for user {user_id} to analyze.")
+        return []
+
+    streams = []
+    for payer, amount, frequency, count, last_date in _find_streams(transactions, INCOME_TOLERANCE_PERCENT):
+        streams.append({
+            "source": payer,
+            "amount": round(float(amount), 2),
+            "frequency": frequency,
+            "transaction_count": count,
+            "last_received": last_date.isoformat(),
+            "next_expected": project_next_date(last_date, frequency).isoformat(),
+        })
+    return streams
+
+
 # --- 4. EXECUTION (UNCHANGED) ---
 if __name__ == '__main__':
     print("--- Starting Recurring Transaction Detector ---")
@@ -0,0 +1,156 @@
+import time
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from core.setup import initialize_supabase
+from services.categorizer import normalize_vendor
+
+# --- 1. SUPABASE INITIALIZATION ---
+db = initialize_supabase()
+
+REFUND_WINDOW_DAYS = 60  # A credit can refund a debit made up to this long before it
+REFUND_CATEGORY = "Refund"  # Set by the parser's refund patterns; only these credits are matched
+# Like the pending ledger, the index is per worker process and reloaded periodically
+INDEX_TTL_SECONDS = 10 * 60
+
+
+def _parse_time(value):
+    """ISO string -> aware UTC datetime (naive values are taken as UTC)."""
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return dt.astimezone(timezone.utc) if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def refund_key(vendor, amount):
+    """Hash key of a debit/credit pair: the normalized vendor and the amount in paise."""
+    return (normalize_vendor(vendor), round(float(amount or 0) * 100))
+
+
+def is_refund(row):
+    """True for credits the parser recognised as refunds (not transfers from people or income)."""
+    return row.get('payment_type') == 'income' and str(row.get('category') or '').lower() == REFUND_CATEGORY.lower()
+
+
+# --- 2. REFUND INDEX ---
+class RefundMatcher:
+    """
+    Per-user hash index of recent, not yet refunded debits keyed by (vendor, amount).
+    Each user is loaded with one query on first use; afterwards new debits are added
+    as they are recorded and an incoming refund is matched with a single dict lookup.
+    Refunds often name the merchant more briefly ("Amazon") than the debit ("Amazon Pay
+    India"), so when the full name misses, a debit whose vendor starts with the refund's
+    words is used if exactly one vendor qualifies.
+    """
+
+    def __init__(self, window_days=REFUND_WINDOW_DAYS):
+        self.window = timedelta(days=window_days)
+        self._index = {}  # user_id -> {key: [(created_at, transaction_id), ...] oldest first}
+        self._loaded_at = {}
+        self._lock = threading.Lock()
+
+    def _load(self, user):
+        since = (datetime.now(timezone.utc) - self.window).isoformat()
+        response = db.table('transaction') \
+            .select('transaction_id, created_at, amount, sender_name, payment_type, refund_of') \
+            .eq('user_id', user) \
+            .gte('created_at', since) \
+            .order('created_at') \
+            .execute()
+        rows = response.data or []
+        refunded = {row['refund_of'] for row in rows if row.get('refund_of')}
+        index = defaultdict(list)
+        for row in rows:
+            if row.get('payment_type') == 'expense' and row.get('transaction_id') not in refunded:
+                try:
+                    index[refund_key(row.get('sender_name'), row.get('amount'))].append(
+                        (_parse_time(row['created_at']), row['transaction_id']))
+                except (ValueError, TypeError, KeyError):
+                    continue
+        with self._lock:
+            self._index[user] = index
+            self._loaded_at[user] = time.monotonic()
+
+    def _ensure_loaded(self, user):
+        loaded_at = self._loaded_at.get(user)
+        if loaded_at is None or time.monotonic() - loaded_at > INDEX_TTL_SECONDS:
+            self._load(user)
+
+    def add_debits(self, user_id, rows):
+        """Indexes stored expense rows (they must carry their transaction_id)."""
+        user = str(user_id)
+        with self._lock:
+            index = self._index.get(user)
+            if index is None:
+                return  # Not loaded yet; the first match loads the current state
+            for row in rows:
+                if row.get('payment_type') != 'expense' or not row.get('transaction_id'):
+                    continue
+                try:
+                    entry = (_parse_time(row['created_at']), row['transaction_id'])
+                except (ValueError, TypeError, KeyError):
+                    continue
+                index[refund_key(row.get('sender_name'), row.get('amount'))].append(entry)
+
+    def match(self, user_id, vendor, amount, created_at):
+        """
+        Returns the transaction_id of the latest debit this credit refunds, or None.
+        The matched debit is removed so it cannot be refunded twice.
+        """
+        user = str(user_id)
+        try:
+            when = _parse_time(created_at)
+        except (ValueError, TypeError):
+            return None
+        key = refund_key(vendor, amount)
+        while True:
+            self._ensure_loaded(user)
+            with self._lock:
+                index = self._index.get(user)
+                if index is not None:
+                    return self._take(index, key, when)
+            # Invalidated between the load and the lock; load again
+
+    def _take(self, index, key, when):
+        """Pops the latest debit under 'key' (or its one prefixed vendor) made by 'when'. Caller holds the lock."""
+        candidates = index.get(key)
+        if not candidates and key[0]:
+            prefixed = {other for other in index
+                        if other[1] == key[1] and index[other] and other[0].startswith(key[0] + " ")}
+            candidates = index[prefixed.pop()] if len(prefixed) == 1 else None
+        if not candidates:
+            return None
+        # Drop debits that fell out of the window
+        while candidates and when - candidates[0][0] > self.window:
+            candidates.pop(0)
+        for i in range(len(candidates) - 1, -1, -1):
+            debit_time, transaction_id = candidates[i]
+            if debit_time <= when:
+                candidates.pop(i)
+                return transaction_id
+        return None
+
+    def tag_refunds(self, user_id, rows):
+        """Sets 'refund_of' on refund credits that match a recent debit. Returns how many matched."""
+        matched = 0
+        for row in rows:
+            if not is_refund(row) or row.get('refund_of'):
+                continue
+            transaction_id = self.match(user_id, row.get('sender_name'), row.get('amount'), row.get('created_at'))
+            if transaction_id is not None:
+                row['refund_of'] = transaction_id
+                matched += 1
+        return matched
+
+    def invalidate(self, user_id):
+        """Forgets a user's index so the next match reloads it."""
+        with self._lock:
+            user = str(user_id)
+            self._index.pop(user, None)
+            self._loaded_at.pop(user, None)
+
+
+# Shared instance used by the intake service
+refund_matcher = RefundMatcher()
@@ -0,0 +1,212 @@
+import os
+import re
+import math
+import time
+import threading
+from datetime import date
+from collections import OrderedDict
+
+from core.data_version import get_data_version
+
+# --- 1. CONFIGURATION ---
+MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "2048"))
+SIMILARITY_THRESHOLD = float(os.getenv("CHAT_CACHE_SIMILARITY", "0.8"))
+# Data versions are per process, so a write handled by another worker is not seen here;
+# the TTL bounds how long such an answer can be served.
+TTL_SECONDS = int(os.getenv("CHAT_CACHE_TTL_SECONDS", "300"))
+MIN_CONTENT_TOKENS = 1  # Follow-ups like "and last week?" have no content words and depend on history, never cache them
+
+STOPWORDS = {
+    "a", "an", "the", "i", "me", "my", "mine", "we", "our", "you", "your", "is", "are", "was", "were",
+    "be", "been", "do", "does", "did", "have", "has", "had", "how", "what", "whats", "which", "who",
+    "much", "many", "on", "in", "at", "for", "of", "to", "from", "with", "by", "about", "and", "or",
+    "can", "could", "would", "please", "tell", "show", "give", "so", "far", "it", "that", "there",
+    "money",
+}
+SYNONYMS = {"spent": "spend", "spending": "spend", "paid": "pay", "paying": "pay", "subs": "subscription"}
+# Words that change the meaning of a question; two questions only match if these are identical
+GUARD_WORDS = {
+    "today", "yesterday", "tomorrow", "day", "daily", "week", "weekly", "month", "monthly", "year",
+    "yearly", "this", "last", "next", "previous", "income", "expense", "expenses", "not", "no",
+}
+
+
+# --- 2. NORMALIZATION & SIMILARITY ---
+def _stem(token):
+    """Very small plural/verb-ending stripper so 'subscriptions' matches 'subscription'."""
+    for suffix in ("ies", "es", "s"):
+        if len(token) > 4 and token.endswith(suffix):
+            return token[: -len(suffix)] + ("y" if suffix == "ies" else "")
+    return token
+
+
+def normalize_question(question: str):
+    """Lowercases, strips punctuation and stopwords, and returns (normalized_key, content_tokens, guard_tokens)."""
+    raw_tokens = re.findall(r"[a-z0-9₹]+", question.lower().replace("'", ""))
+    content = []
+    guards = set()
+    for token in raw_tokens:
+        if token in GUARD_WORDS or token.isdigit():
+            guards.add(token)
+        elif token not in STOPWORDS:
+            content.append(SYNONYMS.get(token) or _stem(token))
+    key = " ".join(sorted(set(content))) + " | " + " ".join(sorted(guards))
+    return key, frozenset(content), frozenset(guards)
+
+
+def _jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def _load_local_embedder():
+    """
+    Loads an optional local sentence-embedding model when CHAT_CACHE_EMBEDDING_MODEL is set.
+    Falls back to lexical similarity if the model or library is unavailable.
+    """
+    model_name = os.getenv("CHAT_CACHE_EMBEDDING_MODEL")
+    if not model_name:
+        return None
+    try:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_name)
+        print(f"--- Chat cache using local embedding model '{model_name}' ---")
+        return lambda text: list(model.encode(text, normalize_embeddings=True))
+    except Exception as e:
+        print(f"Could not load embedding model '{model_name}', using lexical similarity: {e}")
+        return None
+
+
+# --- 3. CACHE ---
+class ResponseCache:
+    """
+    LRU cache of chatbot answers keyed on (user_id, data version and day, normalized question).
+    Lookups first try an exact normalized match, then the most similar cached question
+    of the same user and version. Bumping a user's data version, or the date changing
+    (answers about "today" or "this month" roll over), makes all their entries
+    unreachable; they are dropped on the next write and eventually by LRU eviction.
+    Entries also expire after 'ttl' seconds.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, similarity_threshold=SIMILARITY_THRESHOLD, embedder=None,
+                 ttl=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.embedder = embedder
+        self._entries = OrderedDict()  # (user_id, version, key) -> entry dict
+        self._by_user = {}  # user_id -> (version, set of keys)
+        self._lock = threading.Lock()
+        self.hits_exact = 0
+        self.hits_similar = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _version(user_id):
+        return f"{get_data_version(user_id)}:{date.today().isoformat()}"
+
+    def _similarity(self, entry, content, vector):
+        if vector is not None and entry.get("vector") is not None:
+            return _cosine(vector, entry["vector"])
+        return _jaccard(content, entry["content"])
+
+    def get(self, user_id, question):
+        """Returns a cached answer for an equivalent question, or None."""
+        user = str(user_id)
+        version = self._version(user_id)
+        key, content, guards = normalize_question(question)
+        if len(content) < MIN_CONTENT_TOKENS:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((user, version, key))
+            if entry is not None and entry["expires_at"] > now:
+                self._entries.move_to_end((user, version, key))
+                self.hits_exact += 1
+                return entry["response"]
+
+            bucket = self._by_user.get(user)
+            candidates = bucket[1] if bucket and bucket[0] == version else ()
+            candidates = [(k, self._entries[(user, version, k)]) for k in candidates]
+            candidates = [(k, candidate) for k, candidate in candidates if candidate["expires_at"] > now]
+
+        vector = self.embedder(question) if self.embedder and candidates else None
+        best_key, best_entry, best_score = None, None, 0.0
+        for candidate_key, candidate in candidates:
+            if candidate["guards"] != guards:
+                continue
+            score = self._similarity(candidate, content, vector)
+            if score > best_score:
+                best_key, best_entry, best_score = candidate_key, candidate, score
+
+        with self._lock:
+            if best_entry is not None and best_score >= self.similarity_threshold \
+                    and (user, version, best_key) in self._entries:
+                self._entries.move_to_end((user, version, best_key))
+                self.hits_similar += 1
+                return best_entry["response"]
+            self.misses += 1
+            return None
+
+    def put(self, user_id, question, response):
+        """Stores an answer under the user's current data version and today's date."""
+        user = str(user_id)
+        version = self._version(user_id)
+        key, content, guards = normalize_question(question)
+        if len(content) < MIN_CONTENT_TOKENS:
+            return
+        vector = self.embedder(question) if self.embedder else None
+
+        with self._lock:
+            bucket = self._by_user.get(user)
+            if bucket and bucket[0] != version:
+                # The user's data (or the date) changed: everything cached for the old version is stale
+                for stale_key in bucket[1]:
+                    self._entries.pop((user, bucket[0], stale_key), None)
+                bucket = None
+            if bucket is None:
+                bucket = (version, set())
+                self._by_user[user] = bucket
+
+            self._entries[(user, version, key)] = {
+                "response": response, "content": content, "guards": guards, "vector": vector,
+                "expires_at": time.monotonic() + self.ttl,
+            }
+            self._entries.move_to_end((user, version, key))
+            bucket[1].add(key)
+
+            while len(self._entries) > self.max_entries:
+                (old_user, old_version, old_key), _ = self._entries.popitem(last=False)
+                old_bucket = self._by_user.get(old_user)
+                if old_bucket and old_bucket[0] == old_version:
+                    old_bucket[1].discard(old_key)
+                    if not old_bucket[1]:
+                        del self._by_user[old_user]
+                self.evictions += 1
+
+    def stats(self):
+        """Hit-rate metrics for monitoring."""
+        hits = self.hits_exact + self.hits_similar
+        lookups = hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits_exact": self.hits_exact,
+            "hits_similar": self.hits_similar,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Shared instance used by the chatbot service
+response_cache = ResponseCache(embedder=_load_local_embedder())
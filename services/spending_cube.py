@@ -0,0 +1,252 @@
+import os
+import time
+import threading
+from array import array
+from datetime import date, datetime, timedelta
+
+from core.setup import initialize_supabase
+from core.metrics import timed
+from core.timestamps import parse_datetime
+
+# --- 1. SUPABASE INITIALIZATION ---
+db = initialize_supabase()
+
+CUBE_DAYS = int(os.getenv("SPENDING_CUBE_DAYS", "400"))  # Covers "this year" plus a month of last year
+# Like the pending ledger, cubes are per worker process and reloaded periodically
+CUBE_TTL_SECONDS = 60 * 60
+GRANULARITIES = ("day", "week", "month")
+LOAD_PAGE_SIZE = 1000  # PostgREST returns at most 1000 rows per request by default
+UNCATEGORIZED = "Uncategorized"
+
+
+def _local_day(value):
+    """Transaction timestamp -> calendar day in local time (the same days the summary uses)."""
+    dt = parse_datetime(value)
+    return (dt.astimezone() if dt.tzinfo else dt).date()
+
+
+# --- 2. CUBE ---
+class _UserCube:
+    """
+    One user's spending by category and day. For every category the cube keeps running
+    (prefix) sums over the days since 'origin': prefix[i] is the spending on days before
+    origin + i. Any day range of any category is then a single subtraction, and weeks and
+    months are just day ranges. Each category is one array of doubles (8 bytes per day).
+    """
+
+    def __init__(self, origin, days):
+        self.origin = origin
+        self.days = days
+        self.prefix = {}  # category -> array('d') of length days + 1
+
+    @classmethod
+    def from_daily(cls, origin, days, daily):
+        """Builds a cube from {category: per-day spending list} with one pass per category."""
+        cube = cls(origin, days)
+        for category, amounts in daily.items():
+            sums = cube.prefix[category] = array('d', bytes(8 * (days + 1)))
+            for i, amount in enumerate(amounts):
+                sums[i + 1] = sums[i] + amount
+        return cube
+
+    def _grow(self, day_index):
+        """Extends every category up to day_index when the calendar moves past the end."""
+        if day_index < self.days:
+            return
+        extra = day_index - self.days + 1
+        for sums in self.prefix.values():
+            sums.extend([sums[-1]] * extra)
+        self.days += extra
+
+    def add(self, category, day, amount):
+        index = (day - self.origin).days
+        if index < 0:
+            return  # Older than the cube window
+        self._grow(index)
+        sums = self.prefix.get(category)
+        if sums is None:
+            sums = self.prefix[category] = array('d', bytes(8 * (self.days + 1)))
+        # New transactions are recorded for today, so this usually touches one or two cells
+        for i in range(index + 1, self.days + 1):
+            sums[i] += amount
+
+    def total(self, category, start, end):
+        """Spending of one category on days start..end (inclusive), clamped to the cube."""
+        sums = self.prefix.get(category)
+        if sums is None:
+            return 0.0
+        first = max((start - self.origin).days, 0)
+        last = min((end - self.origin).days, self.days - 1)
+        if last < first:
+            return 0.0
+        return sums[last + 1] - sums[first]
+
+
+def _period_ranges(start, end, granularity):
+    """Splits start..end into (label, first day, last day) buckets of the given granularity."""
+    ranges = []
+    cursor = start
+    while cursor <= end:
+        if granularity == "day":
+            period_end, label = cursor, cursor.isoformat()
+        elif granularity == "week":
+            period_end = cursor + timedelta(days=6 - cursor.weekday())  # Weeks run Monday to Sunday
+            label = (cursor - timedelta(days=cursor.weekday())).isoformat()
+        else:
+            next_month = (cursor.replace(day=28) + timedelta(days=4)).replace(day=1)
+            period_end, label = next_month - timedelta(days=1), cursor.strftime("%Y-%m")
+        ranges.append((label, cursor, min(period_end, end)))
+        cursor = period_end + timedelta(days=1)
+    return ranges
+
+
+class SpendingCube:
+    """
+    Per-user category x day spending cubes. Each user is loaded on first use (and after
+    CUBE_TTL_SECONDS, which also picks up writes made outside the app); afterwards intake adds new expenses in place, and slice queries read
+    precomputed prefix sums instead of scanning transactions.
+    """
+
+    def __init__(self, days=CUBE_DAYS):
+        self.window = days
+        self._cubes = {}
+        self._loaded_at = {}
+        self._loading = {}  # user -> [rows added while that load ran], one list per load in progress
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _apply(cube, rows):
+        for row in rows:
+            if row.get('payment_type') != 'expense':
+                continue
+            try:
+                cube.add(row.get('category') or UNCATEGORIZED, _local_day(row['created_at']),
+                         float(row.get('amount') or 0))
+            except (ValueError, TypeError, KeyError):
+                continue
+
+    @timed("aggregation", "spending_cube_load")
+    def _load(self, user):
+        """
+        Reads the user's expenses page by page without holding the lock. Rows that intake
+        adds meanwhile are buffered and replayed into the new cube before it replaces the
+        old one, unless a page already returned them.
+        """
+        added = []
+        with self._lock:
+            self._loading.setdefault(user, []).append(added)
+        try:
+            cube, loaded_ids = self._read(user)
+        except Exception:
+            with self._lock:
+                self._stop_buffering(user, added)
+            raise
+        with self._lock:
+            self._stop_buffering(user, added)
+            self._apply(cube, [row for row in added if row.get('transaction_id') not in loaded_ids])
+            self._cubes[user] = cube
+            self._loaded_at[user] = time.monotonic()
+
+    def _stop_buffering(self, user, added):
+        # By identity: two loads' empty buffers compare equal
+        buffers = [other for other in self._loading[user] if other is not added]
+        if buffers:
+            self._loading[user] = buffers
+        else:
+            del self._loading[user]
+
+    def _read(self, user):
+        """Builds a cube from the database; returns it with the transaction_ids it holds."""
+        today = date.today()
+        origin = today - timedelta(days=self.window - 1)
+        since = datetime.combine(origin, datetime.min.time()).isoformat()
+        daily = {}  # category -> spending per day since origin
+        later = []  # Rows dated after today (clock skew); added afterwards so the cube grows
+        last_id = 0
+        loaded_ids = set()
+        while True:
+            # Keyset pagination: a page holds at most LOAD_PAGE_SIZE rows, whatever the user's history
+            rows = db.table('transaction').select('transaction_id, amount, category, created_at') \
+                .eq('user_id', user) \
+                .eq('payment_type', 'expense') \
+                .gte('created_at', since) \
+                .gt('transaction_id', last_id) \
+                .order('transaction_id') \
+                .limit(LOAD_PAGE_SIZE) \
+                .execute().data or []
+            for row in rows:
+                loaded_ids.add(row['transaction_id'])
+                try:
+                    index = (_local_day(row['created_at']) - origin).days
+                    amount = float(row.get('amount') or 0)
+                except (ValueError, TypeError, KeyError):
+                    continue
+                category = row.get('category') or UNCATEGORIZED
+                if 0 <= index < self.window:
+                    daily.setdefault(category, [0.0] * self.window)[index] += amount
+                elif index >= self.window:
+                    later.append((category, origin + timedelta(days=index), amount))
+            if len(rows) < LOAD_PAGE_SIZE:
+                break
+            last_id = rows[-1]['transaction_id']
+        cube = _UserCube.from_daily(origin, self.window, daily)
+        for category, day, amount in later:
+            cube.add(category, day, amount)
+        return cube, loaded_ids
+
+    def _cube(self, user_id):
+        user = str(user_id)
+        loaded_at = self._loaded_at.get(user)
+        if loaded_at is None or time.monotonic() - loaded_at > CUBE_TTL_SECONDS:
+            self._load(user)
+        return self._cubes[user]
+
+    def add_transactions(self, user_id, rows):
+        """Adds stored expense rows to the user's cube, if it is loaded."""
+        user = str(user_id)
+        with self._lock:
+            for added in self._loading.get(user, ()):
+                added.extend(rows)  # A load is reading the table; it may have passed these rows
+            cube = self._cubes.get(user)
+            if cube is None:
+                return  # Not loaded yet; the first query loads the current state
+            self._apply(cube, rows)
+
+    def slice(self, user_id, start, end, granularity="month", categories=None):
+        """
+        Spending per category and period between two dates (inclusive), e.g. Food per
+        month this year. Every cell costs one subtraction.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}.")
+        if end < start:
+            raise ValueError("end must not be before start.")
+        cube = self._cube(user_id)
+        ranges = _period_ranges(start, end, granularity)
+        with self._lock:
+            names = categories or sorted(cube.prefix)
+            series = {name: [round(cube.total(name, first, last), 2) for _, first, last in ranges] for name in names}
+        return {
+            "granularity": granularity,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "periods": [label for label, _, _ in ranges],
+            "series": series,
+            "totals": {name: round(sum(values), 2) for name, values in series.items()},
+            "window_start": cube.origin.isoformat(),  # Days before this are not in the cube
+        }
+
+    def top_categories(self, user_id, start, end, limit=5):
+        """Categories ranked by spending between two dates, e.g. the top 5 of the last 30 days."""
+        cube = self._cube(user_id)
+        with self._lock:
+            totals = {name: cube.total(name, start, end) for name in cube.prefix}
+        ranked = sorted(((name, amount) for name, amount in totals.items() if amount > 0.005),
+                        key=lambda item: item[1], reverse=True)[:limit]
+        grand_total = sum(totals.values())
+        return [{"category": name, "amount": round(amount, 2),
+                 "share": round(amount / grand_total, 4) if grand_total else 0.0} for name, amount in ranked]
+
+
+# Shared instance used by the intake service and the insights router
+spending_cube = SpendingCube()
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+from core.setup import initialize_supabase
+from core.cache import table_cache
+from core.metrics import timed
+
+# --- 1. SUPABASE INITIALIZATION ---
+db = initialize_supabase()
+
+
+def _local(timestamp: str):
+    """Parses an ISO timestamp into naive local time so it compares with datetime.now()."""
+    dt = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    return dt.astimezone().replace(tzinfo=None) if dt.tzinfo else dt
+
+
+@timed("aggregation")
+def refresh_summary(user_id):
+    """
+    Recomputes the user's 'summary' row (day/week/month/year in, out and cashflow)
+    from this year's transactions with one query, and upserts it.
+    """
+    now = datetime.now()
+    starts = {
+        "day": now.replace(hour=0, minute=0, second=0, microsecond=0),
+        "week": (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0),
+        "month": now.replace(day=1, hour=0, minute=0, second=0, microsecond=0),
+        "year": now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0),
+    }
+    # The week can start in the previous year
+    since = min(starts.values())
+
+    response = db.table('transaction').select('amount, payment_type, created_at') \
+        .eq('user_id', user_id) \
+        .gte('created_at', since.isoformat()) \
+        .execute()
+
+    summary = {f"{period}_{kind}": 0.0 for period in starts for kind in ("out", "in")}
+    for tx in response.data or []:
+        try:
+            tx_time = _local(tx['created_at'])
+        except (ValueError, TypeError, KeyError):
+            continue
+        kind = "in" if tx.get('payment_type') == 'income' else "out"
+        for period, start in starts.items():
+            if tx_time >= start:
+                summary[f"{period}_{kind}"] += tx.get('amount') or 0
+
+    row = {"user_id": user_id}
+    for period in starts:
+        row[f"{period}_out"] = round(summary[f"{period}_out"], 2)
+        row[f"{period}_in"] = round(summary[f"{period}_in"], 2)
+        row[f"{period}_cashflow"] = round(summary[f"{period}_in"] - summary[f"{period}_out"], 2)
+
+    db.table('summary').upsert(row, on_conflict='user_id').execute()
+    table_cache.invalidate('summary', user_id)
+    return row
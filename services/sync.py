@@ -0,0 +1,77 @@
+from services.parsing_engine import parse_transactions
+from services import intake as intake_service
+from services import query as query_service
+
+
+# --- 1. CLIENT -> SERVER ---
+def apply_changes(user_id, changes):
+    """
+    Records a batch of offline messages. Keys that were already recorded are reported
+    as duplicates instead of being inserted again, so retried batches are safe, even
+    when two retries of the same batch race each other.
+    Everything new is written in one insert.
+    """
+    existing = intake_service.find_existing(user_id, [change.idempotency_key for change in changes])
+
+    duplicates, rejected, rows, new, seen = [], [], [], [], set()
+    for change in changes:
+        key = change.idempotency_key
+        if key in existing or key in seen:
+            duplicates.append(key)
+            continue
+        seen.add(key)
+        new.append(change)
+
+    # Regex misses share a few batched LLM calls instead of one request per message
+    for change, parsed_details in zip(new, parse_transactions([change.raw_message for change in new])):
+        key = change.idempotency_key
+        if not parsed_details:
+            rejected.append({"idempotency_key": key, "error": "Failed to parse transaction from raw_message"})
+            continue
+        try:
+            rows.append(intake_service.build_transaction_row(user_id, change.timestamp, parsed_details, key))
+        except ValueError as e:
+            rejected.append({"idempotency_key": key, "error": str(e)})
+
+    inserted = []
+    while rows:
+        try:
+            inserted = intake_service.record_transactions(user_id, rows)
+            break
+        except Exception as e:
+            if not intake_service.is_duplicate_key_error(e):
+                raise
+            # A concurrent retry of this batch stored some of the keys first
+            stored = intake_service.find_existing(user_id, [row["idempotency_key"] for row in rows])
+            if not stored:
+                raise
+            duplicates += [row["idempotency_key"] for row in rows if row["idempotency_key"] in stored]
+            rows = [row for row in rows if row["idempotency_key"] not in stored]
+    accepted = [{"idempotency_key": row.get("idempotency_key"), "transaction_id": row.get("transaction_id")}
+                for row in inserted]
+    return {"accepted": accepted, "duplicates": duplicates, "rejected": rejected}
+
+
+# --- 2. SERVER -> CLIENT ---
+def changes_since(user_id, cursor, limit):
+    """
+    Returns the user's transactions recorded after 'cursor', oldest first.
+    The cursor is a keyset position on transaction_id, which only grows, so rows with
+    backdated timestamps are still picked up. The returned cursor is stored by the client
+    for the next sync.
+    """
+    params = {"user_id": f"eq.{user_id}", "order": "transaction_id.asc", "limit": str(limit)}
+    if cursor:
+        params["cursor"] = cursor
+    spec = query_service.parse_query("transaction", params)
+    page = query_service.fetch_page(spec)
+    rows = page["data"]
+    new_cursor = query_service.encode_cursor(rows[-1], spec) if rows else cursor
+    return {"changes": rows, "cursor": new_cursor, "has_more": page["next_cursor"] is not None}
+
+
+def sync(request):
+    """One round trip: push the client's delta batch, then pull everything the client has not seen."""
+    result = apply_changes(request.user_id, request.changes)
+    result.update(changes_since(request.user_id, request.cursor, request.limit))
+    return result
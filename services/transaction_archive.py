@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import shutil
+import threading
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from core.setup import initialize_supabase
+
+# Columnar archive of the 'transaction' table for batch and analytics jobs, which
+# otherwise pull every row as JSON through PostgREST. The archive is a Parquet dataset
+# partitioned by month and user bucket:
+#   <TRANSACTION_ARCHIVE_PATH>/month=2025-03/bucket=7/part-<first id>-<last id>.parquet
+# so a job reading one user or a few months only opens the matching files. Files are
+# sorted by user and time, and their row-group statistics let filters on user_id or
+# created_at skip data inside a file too. Files are memory-mapped when read.
+# scripts/export_transactions.py appends new rows incrementally (by transaction_id);
+# --refresh-months rewrites recent months to pick up edits and deletes. A run writes
+# its files to a staging directory, records them in the watermark, then moves them in;
+# a run that dies before that record is discarded, one that dies after it is finished
+# by the next run, so every transaction is archived exactly once.
+# pyarrow is optional: without it (or with BATCH_TRANSACTION_SOURCE=api) jobs use the API.
+
+# --- 1. SUPABASE INITIALIZATION ---
+db = initialize_supabase()
+
+ARCHIVE_PATH = os.getenv("TRANSACTION_ARCHIVE_PATH", "archive/transactions")
+ARCHIVE_USER_BUCKETS = int(os.getenv("ARCHIVE_USER_BUCKETS", "16"))
+BATCH_TRANSACTION_SOURCE = os.getenv("BATCH_TRANSACTION_SOURCE", "api").lower()  # "api" or "archive"
+EXPORT_PAGE_SIZE = 1000  # PostgREST returns at most 1000 rows per request by default
+EXPORT_FLUSH_ROWS = 250_000  # Buffered rows are written out at this size, bounding memory on a first export
+WATERMARK_FILE = "_watermark.json"  # Leading '_' keeps it out of the dataset
+STAGING_DIR = ".staging"  # Leading '.' too
+COLUMNS = {
+    "transaction_id": "int64", "user_id": "string", "created_at": "timestamp", "day": "string",
+    "amount": "float64", "sender_name": "string", "payment_method": "string", "payment_type": "string",
+    "category": "string", "message": "string", "anomaly": "bool", "refund_of": "int64",
+}
+
+
+def user_bucket(user_id):
+    """Stable bucket of a user id (crc32, so every process and run agrees)."""
+    return zlib.crc32(str(user_id).encode()) % ARCHIVE_USER_BUCKETS
+
+
+def _month(value):
+    return value.strftime("%Y-%m")
+
+
+def _schema():
+    import pyarrow as pa
+    types = {"int64": pa.int64(), "string": pa.string(), "float64": pa.float64(), "bool": pa.bool_(),
+             "timestamp": pa.timestamp("us", tz="UTC")}
+    return pa.schema([(name, types[kind]) for name, kind in COLUMNS.items()])
+
+
+def _partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    return ds.partitioning(pa.schema([("month", pa.string()), ("bucket", pa.int32())]), flavor="hive")
+
+
+# --- 2. ARCHIVE ---
+class TransactionArchive:
+    """Writes and reads the Parquet dataset rooted at 'path'."""
+
+    def __init__(self, path=ARCHIVE_PATH):
+        self.path = path
+        self._dataset = None
+        self._dataset_version = None
+        self._lock = threading.Lock()
+
+    def available(self):
+        """True when pyarrow is installed and an export has run."""
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return False
+        return os.path.exists(os.path.join(self.path, WATERMARK_FILE))
+
+    # --- Watermark ---
+    def _read_watermark(self):
+        try:
+            with open(os.path.join(self.path, WATERMARK_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"last_transaction_id": 0}
+
+    def _write_watermark(self, state):
+        target = os.path.join(self.path, WATERMARK_FILE)
+        with open(target + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(target + ".tmp", target)
+
+    # --- Writing ---
+    def _pages(self, query_for):
+        """Keyset-paginates a query builder (query_for(last_id)) by transaction_id."""
+        last_id = 0
+        while True:
+            rows = query_for(last_id).order('transaction_id').limit(EXPORT_PAGE_SIZE).execute().data or []
+            yield rows
+            if len(rows) < EXPORT_PAGE_SIZE:
+                return
+            last_id = rows[-1]['transaction_id']
+
+    def _partitioned(self, rows):
+        """Groups API rows by (month, bucket); created_at becomes a UTC datetime."""
+        from core.timestamps import parse_datetime
+        partitions = {}
+        for row in rows:
+            created_at = parse_datetime(row['created_at'])
+            created_at = (created_at if created_at.tzinfo else created_at.astimezone()).astimezone(timezone.utc)
+            record = {name: row.get(name) for name in COLUMNS}
+            record['created_at'] = created_at
+            record['user_id'] = str(record['user_id'])
+            partitions.setdefault((_month(created_at), user_bucket(record['user_id'])), []).append(record)
+        return partitions
+
+    def _write_file(self, root, month, bucket, records):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        records.sort(key=lambda record: (record['user_id'], record['created_at']))  # Tight row-group min/max
+        table = pa.Table.from_pylist(records, schema=_schema())
+        directory = os.path.join(root, f"month={month}", f"bucket={bucket}")
+        os.makedirs(directory, exist_ok=True)
+        ids = [record['transaction_id'] for record in records]
+        target = os.path.join(directory, f"part-{min(ids)}-{max(ids)}.parquet")
+        pq.write_table(table, target + ".tmp", compression="zstd", row_group_size=64 * 1024)
+        os.replace(target + ".tmp", target)  # Readers never see a half-written file
+
+    def _high_water_mark(self):
+        response = db.table('transaction').select('transaction_id').order('transaction_id', desc=True).limit(1).execute()
+        return response.data[0]['transaction_id'] if response.data else 0
+
+    def _publish(self, pending):
+        """
+        Moves a committed run's staged files into the dataset and advances the watermark.
+        Idempotent, so a run that died half way through is finished by the next one.
+        """
+        staging = os.path.join(self.path, STAGING_DIR)
+        for month in pending["refreshed_months"]:
+            # A refreshed month is staged as a whole (possibly empty) directory and swapped in
+            staged = os.path.join(staging, f"month={month}")
+            live = os.path.join(self.path, f"month={month}")
+            retired = os.path.join(self.path, f".retired-{month}")
+            if os.path.exists(staged):
+                if os.path.exists(live):
+                    os.replace(live, retired)
+                os.replace(staged, live)
+            shutil.rmtree(retired, ignore_errors=True)
+        # Everything else in staging is new files for months that are kept
+        for directory, _, files in os.walk(staging):
+            target = os.path.join(self.path, os.path.relpath(directory, staging))
+            for name in files:
+                os.makedirs(target, exist_ok=True)
+                os.replace(os.path.join(directory, name), os.path.join(target, name))
+        shutil.rmtree(staging, ignore_errors=True)
+        self._write_watermark({"last_transaction_id": pending["last_transaction_id"],
+                               "exported_at": pending["exported_at"]})
+
+    def _recover(self):
+        """Finishes a committed run that died while publishing, or discards an uncommitted one."""
+        state = self._read_watermark()
+        if "pending" in state:
+            print(f"⚠️ Transaction archive: finishing the interrupted export up to "
+                  f"{state['pending']['last_transaction_id']}")
+            self._publish(state["pending"])
+        else:
+            shutil.rmtree(os.path.join(self.path, STAGING_DIR), ignore_errors=True)
+
+    def export(self, refresh_months=0):
+        """
+        Appends transactions added since the last export and rewrites the last
+        'refresh_months' months in full. Everything up to the transaction_id seen at the
+        start is exported exactly once; later rows go to the next run. Returns statistics.
+        """
+        started = time.perf_counter()
+        os.makedirs(self.path, exist_ok=True)
+        self._recover()
+        state = self._read_watermark()
+        low, high = state["last_transaction_id"], self._high_water_mark()
+        staging = os.path.join(self.path, STAGING_DIR)
+        today = datetime.now(timezone.utc)  # Partitions use UTC months
+        refreshed = set()
+        for i in range(refresh_months):
+            month_index = today.year * 12 + today.month - 1 - i
+            refreshed.add(f"{month_index // 12:04d}-{month_index % 12 + 1:02d}")
+
+        # 1. New rows, except those of months that are rewritten below
+        appended = 0
+        pending = {}
+        for rows in self._pages(lambda last_id: db.table('transaction').select(', '.join(COLUMNS))
+                                .gt('transaction_id', max(last_id, low)).lte('transaction_id', high)):
+            for key, records in self._partitioned(rows).items():
+                if key[0] not in refreshed:
+                    pending.setdefault(key, []).extend(records)
+                    appended += len(records)
+            if sum(len(records) for records in pending.values()) >= EXPORT_FLUSH_ROWS:
+                for (month, bucket), records in pending.items():
+                    self._write_file(staging, month, bucket, records)
+                pending = {}
+        for (month, bucket), records in pending.items():
+            self._write_file(staging, month, bucket, records)
+
+        # 2. Refreshed months are staged in full
+        rewritten = 0
+        for month in sorted(refreshed):
+            first = datetime.strptime(month, "%Y-%m").replace(tzinfo=timezone.utc)
+            following = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+            os.makedirs(os.path.join(staging, f"month={month}"), exist_ok=True)
+            by_bucket = {}
+            for rows in self._pages(lambda last_id: db.table('transaction').select(', '.join(COLUMNS))
+                                    .gt('transaction_id', last_id).lte('transaction_id', high)
+                                    .gte('created_at', first.isoformat()).lt('created_at', following.isoformat())):
+                for (row_month, bucket), records in self._partitioned(rows).items():
+                    if row_month == month:
+                        by_bucket.setdefault(bucket, []).extend(records)
+            for bucket, records in by_bucket.items():
+                self._write_file(staging, month, bucket, records)
+                rewritten += len(records)
+
+        # 3. Commit: once the watermark names the staged run, it is published even if we die now
+        committed = {"last_transaction_id": max(low, high), "refreshed_months": sorted(refreshed),
+                     "exported_at": datetime.now(timezone.utc).isoformat()}
+        self._write_watermark({**state, "pending": committed})
+        self._publish(committed)
+        print(f"✅ Transaction archive: {appended} rows appended, {rewritten} rewritten in {len(refreshed)} months")
+        return {"appended": appended, "refreshed_months": sorted(refreshed), "rewritten": rewritten,
+                "last_transaction_id": max(low, high), "seconds": round(time.perf_counter() - started, 2)}
+
+    # --- Reading ---
+    def dataset(self):
+        """The pyarrow dataset, memory-mapped; rediscovered after each export."""
+        import pyarrow.dataset as ds
+        from pyarrow import fs
+        version = os.path.getmtime(os.path.join(self.path, WATERMARK_FILE))
+        with self._lock:
+            if self._dataset is None or self._dataset_version != version:
+                self._dataset = ds.dataset(self.path, format="parquet", partitioning=_partitioning(),
+                                           filesystem=fs.LocalFileSystem(use_mmap=True))
+                self._dataset_version = version
+            return self._dataset
+
+    def read_table(self, user_id=None, start=None, end=None, payment_type=None, columns=None):
+        """
+        Rows matching the filters as a pyarrow Table. start/end (datetimes, end exclusive)
+        prune month partitions, user_id prunes buckets, and every filter is pushed down
+        to the Parquet row groups.
+        """
+        import pyarrow.dataset as ds
+        conditions = []
+        if user_id is not None:
+            conditions += [ds.field("bucket") == user_bucket(user_id), ds.field("user_id") == str(user_id)]
+        if start is not None:
+            start = start if start.tzinfo else start.astimezone()
+            conditions += [ds.field("month") >= _month(start.astimezone(timezone.utc)), ds.field("created_at") >= start]
+        if end is not None:
+            end = end if end.tzinfo else end.astimezone()
+            conditions += [ds.field("month") <= _month(end.astimezone(timezone.utc)), ds.field("created_at") < end]
+        if payment_type is not None:
+            conditions.append(ds.field("payment_type") == payment_type)
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return self.dataset().to_table(columns=list(columns) if columns else list(COLUMNS), filter=expression)
+
+    def read_transactions(self, user_id=None, start=None, end=None, payment_type=None, columns=None):
+        """Same as read_table, as a list of dicts shaped like the API rows (ISO created_at)."""
+        import pyarrow.compute as pc
+        table = self.read_table(user_id, start, end, payment_type, columns)
+        if "created_at" in table.column_names:
+            # Formatted by Arrow in one pass; far cheaper than datetime.isoformat() per row
+            index = table.schema.get_field_index("created_at")
+            table = table.set_column(index, "created_at",
+                                     pc.strftime(table.column(index), format="%Y-%m-%dT%H:%M:%S%z"))
+        return table.to_pylist()
+
+
+# Shared instance used by the export script and the batch jobs
+transaction_archive = TransactionArchive()
+
+
+def use_archive(source=None):
+    """Whether a batch job should read the archive: 'source' overrides BATCH_TRANSACTION_SOURCE."""
+    if (source or BATCH_TRANSACTION_SOURCE) != "archive":
+        return False
+    if not transaction_archive.available():
+        print(f"⚠️ Transaction archive unavailable at {transaction_archive.path} (pyarrow missing or never exported), "
+              "using the API.")
+        return False
+    return True
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Offline settings, applied before any app module (and its module-level clients) is imported
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", ":memory:")
+os.environ.setdefault("INTAKE_QUEUE_PATH", ":memory:")
+os.environ.setdefault("INTAKE_WORKERS", "0")
+os.environ.setdefault("LLM_BACKEND", "fake")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,87 @@
+import pytest
+
+from services import intake_queue as queue_module
+from services.intake_queue import IntakeQueue
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "queue.db")
+
+
+def _enqueue(queue, count):
+    return [queue.enqueue(1, "2025-03-12T10:00:00+05:30", f"message {i}") for i in range(count)]
+
+
+def _job(queue, job_id):
+    row = queue.connect().execute("SELECT * FROM intake_job WHERE id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def test_claims_do_not_overlap_across_processes(path):
+    # Two queues on one file stand in for two app processes
+    first, second = IntakeQueue(path), IntakeQueue(path)
+    ids = _enqueue(first, 10)
+    claimed_first = [job["id"] for job in first.claim(6)]
+    claimed_second = [job["id"] for job in second.claim(10)]
+    assert claimed_first == ids[:6]
+    assert claimed_second == ids[6:]
+    assert first.claim(10) == [] and second.claim(10) == []
+
+
+def test_live_lease_is_not_reclaimed(path):
+    first, second = IntakeQueue(path), IntakeQueue(path)
+    _enqueue(first, 1)
+    assert len(first.claim(1)) == 1
+    assert second.claim(1) == []
+
+
+def test_expired_lease_is_reclaimed_and_the_old_owner_cannot_finish(path, monkeypatch):
+    first, second = IntakeQueue(path), IntakeQueue(path)
+    [job_id] = _enqueue(first, 1)
+    monkeypatch.setattr(queue_module, "LEASE_SECONDS", -1)  # Every lease is already expired
+    [stale] = first.claim(1)
+    [job] = second.claim(1)
+    assert job["id"] == job_id and job["claimed_by"] == second.owner
+
+    # The worker that lost its lease finishes late: neither outcome may touch the job
+    first.complete([job_id])
+    first.fail(stale, "late failure")
+    assert _job(first, job_id)["claimed_by"] == second.owner
+    assert (first.processed, first.retried, first.failed) == (0, 0, 0)
+
+    second.complete([job_id])
+    assert _job(second, job_id) is None
+    assert second.processed == 1
+
+
+def test_fail_retries_with_backoff_then_gives_up(path, monkeypatch):
+    queue = IntakeQueue(path)
+    [job_id] = _enqueue(queue, 1)
+    monkeypatch.setattr(queue_module, "MAX_ATTEMPTS", 2)
+
+    [job] = queue.claim(1)
+    queue.fail(job, "database down")
+    row = _job(queue, job_id)
+    assert (row["status"], row["attempts"], row["claimed_by"]) == ("queued", 1, None)
+    assert queue.claim(1) == []  # Backing off
+
+    monkeypatch.setattr(queue_module, "BACKOFF_BASE_SECONDS", 0)
+    queue.connect().execute("UPDATE intake_job SET next_attempt_at = 0 WHERE id = ?", (job_id,))
+    [job] = queue.claim(1)
+    queue.fail(job, "database still down")
+    row = _job(queue, job_id)
+    assert (row["status"], row["attempts"], row["error"]) == ("failed", 2, "database still down")
+    assert (queue.retried, queue.failed) == (1, 1)
+    assert queue.claim(1) == []
+
+
+def test_job_status_distinguishes_done_from_unknown(path):
+    queue = IntakeQueue(path)
+    done, waiting = _enqueue(queue, 2)
+    [job] = queue.claim(1)
+    queue.complete([job["id"]])
+    assert queue.get_job(done)["status"] == "done"
+    assert queue.get_job(waiting)["status"] == "queued"
+    assert queue.get_job(waiting + 1) is None
+    assert queue.get_job(0) is None